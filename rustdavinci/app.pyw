@@ -1,6 +1,10 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import time
+
+_startup_start = time.perf_counter()
+
 from PyQt6 import QtCore
 from PyQt6 import QtWidgets
 
@@ -24,8 +28,15 @@ def run():
 
     main = MainWindow()
     main.show()
+
+    # Heavy modules (numba, OpenCV, pyautogui, pynput) are loaded on first use, see lib/lazy_import.py
+    startup_time = time.perf_counter() - _startup_start
+    main.ui.log_TextEdit.append(f"Startup time: {startup_time:.2f} s")
     sys.exit(app.exec())
 
 
 if __name__ == "__main__":
+    # Worker processes (mosaic planning) must not start the app again in the PyInstaller build
+    import multiprocessing
+    multiprocessing.freeze_support()
     run()
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Blend calibration for Rust Painter.
+The solver and the simulation blend a layer as base * (1 - opacity) + color * opacity
+with the opacity level the painting sets. The game does not blend at exactly that
+opacity, so a grid of test swatches (one row per opacity level, one column per test
+color) is painted the way the painting paints, captured and measured. An effective
+opacity is fitted per level and the solver and the simulation blend with the
+effective opacities, while the painting still sets the nominal levels.
+"""
+
+from dataclasses import dataclass
+
+import json
+import os
+import time
+
+import numpy as np
+from PIL import Image
+
+
+DEFAULT_CALIBRATION_PATH = os.path.join(os.path.expanduser("~"), ".rustdavinci", "blend_calibration.json")
+DEFAULT_CAPTURE_DIRECTORY = os.path.join(os.path.expanduser("~"), ".rustdavinci", "calibration")
+
+# Palette indices of the test colors: black, gray, orange, yellow, green, blue, magenta, red
+CALIBRATION_COLORS = (0, 1, 6, 10, 22, 42, 54, 62)
+
+# Channel differences between a test color and the background below this carry too
+# little signal to measure an opacity with
+MIN_CONTRAST = 40
+
+
+@dataclass(frozen=True)
+class SwatchLayout:
+    """Grid of test swatches, one row per opacity level and one column per test color"""
+
+    color_indices: tuple
+    opacity_values: tuple
+    swatch_size: int = 12
+    gap: int = 4        # Background pixels between two swatches and around the grid
+
+    @property
+    def size(self):
+        """(width, height) of the canvas area the swatches need"""
+        pitch = self.swatch_size + self.gap
+        return (self.gap + len(self.color_indices) * pitch, self.gap + len(self.opacity_values) * pitch)
+
+    def swatches(self):
+        """
+        Returns:
+            list: (color_idx, opacity_idx, x0, y0, x1, y1) of every swatch, row by row
+        """
+        pitch = self.swatch_size + self.gap
+        swatches = []
+        for opacity_idx in range(len(self.opacity_values)):
+            for column, color_idx in enumerate(self.color_indices):
+                x0 = self.gap + column * pitch
+                y0 = self.gap + opacity_idx * pitch
+                swatches.append((color_idx, opacity_idx, x0, y0, x0 + self.swatch_size, y0 + self.swatch_size))
+        return swatches
+
+    def to_dict(self):
+        return {
+            "color_indices": list(self.color_indices),
+            "opacity_values": list(self.opacity_values),
+            "swatch_size": self.swatch_size,
+            "gap": self.gap,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(tuple(data["color_indices"]), tuple(data["opacity_values"]), data["swatch_size"], data["gap"])
+
+
+def measure_swatches(capture, layout, margin=3):
+    """
+    Measure the painted color of every swatch.
+
+    Args:
+        capture: PIL Image of the canvas area, the top left pixel is the top left of the layout
+        layout: SwatchLayout that was painted
+        margin: Pixels left out at the swatch borders (brush edges)
+
+    Returns:
+        numpy.ndarray: (swatch count, 3) median RGB of every swatch, in layout.swatches() order
+    """
+    pixels = np.asarray(capture.convert("RGB"), dtype=np.float64)
+    if pixels.shape[1] < layout.size[0] or pixels.shape[0] < layout.size[1]:
+        raise ValueError(f"The capture is {pixels.shape[1]}x{pixels.shape[0]}, the swatches need "
+                         f"{layout.size[0]}x{layout.size[1]}")
+    margin = min(margin, (layout.swatch_size - 1) // 2)
+    return np.array([
+        np.median(pixels[y0 + margin:y1 - margin, x0 + margin:x1 - margin].reshape(-1, 3), axis=0)
+        for _, _, x0, y0, x1, y1 in layout.swatches()
+    ])
+
+
+def fit_blend_coefficients(measured, layout, background_color, palette_colors):
+    """
+    Least squares fit of the opacity that explains the measured swatches of every level,
+    measured = background + opacity * (color - background) over all colors and channels.
+
+    Args:
+        measured: Swatch colors as returned by measure_swatches
+        layout: SwatchLayout that was painted
+        background_color: RGB tuple of the background the swatches were painted on
+        palette_colors: List of base RGB colors
+
+    Returns:
+        dict: 'opacity_values' nominal levels, 'effective' fitted opacity per level (None if no
+              swatch of the level had enough contrast), 'rms_error' RGB error of the fit per level,
+              'background_color', 'samples' channels used per level
+    """
+    background = np.asarray(background_color, dtype=np.float64)
+    effective, rms_error, samples = [], [], []
+    swatches = layout.swatches()
+    for opacity_idx in range(len(layout.opacity_values)):
+        rows = [i for i, swatch in enumerate(swatches) if swatch[1] == opacity_idx]
+        contrast = np.array([palette_colors[swatches[i][0]] for i in rows], dtype=np.float64) - background
+        change = measured[rows] - background
+        used = np.abs(contrast) >= MIN_CONTRAST
+        if not used.any():
+            effective.append(None)
+            rms_error.append(None)
+            samples.append(0)
+            continue
+        opacity = float(np.clip((change[used] * contrast[used]).sum() / (contrast[used] ** 2).sum(), 0.0, 1.0))
+        effective.append(round(opacity, 4))
+        rms_error.append(round(float(np.sqrt(np.mean((change[used] - opacity * contrast[used]) ** 2))), 2))
+        samples.append(int(used.sum()))
+    return {
+        "opacity_values": list(layout.opacity_values),
+        "effective": effective,
+        "rms_error": rms_error,
+        "background_color": list(background_color),
+        "samples": samples,
+    }
+
+
+def calibrated_opacities(opacity_values, calibration):
+    """
+    Opacities the layers of every level blend with, interpolated between the measured
+    levels for levels that were not measured.
+
+    Args:
+        opacity_values: Nominal opacity levels of the painting
+        calibration: Result of fit_blend_coefficients (None for no calibration)
+
+    Returns:
+        list: Effective opacity per level, the nominal levels if there is no calibration
+    """
+    if not calibration:
+        return list(opacity_values)
+    measured = {
+        nominal: effective
+        for nominal, effective in zip(calibration["opacity_values"], calibration["effective"])
+        if effective is not None
+    }
+    if not measured:
+        return list(opacity_values)
+    measured.setdefault(0.0, 0.0)
+    measured.setdefault(1.0, 1.0)
+    nominal = sorted(measured)
+    return [float(np.interp(level, nominal, [measured[n] for n in nominal])) for level in opacity_values]
+
+
+def save_calibration(calibration, path=DEFAULT_CALIBRATION_PATH):
+    """Store a calibration, see load_calibration"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(dict(calibration, created=time.strftime("%Y-%m-%dT%H:%M:%S")), f, indent=1)
+
+
+def load_calibration(path=DEFAULT_CALIBRATION_PATH):
+    """
+    Returns:
+        dict: The stored calibration, None if there is none or it can not be read
+    """
+    try:
+        with open(path, "r") as f:
+            calibration = json.load(f)
+        if len(calibration["opacity_values"]) != len(calibration["effective"]):
+            return None
+        return calibration
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def save_capture(capture, layout, background_color, directory=DEFAULT_CAPTURE_DIRECTORY):
+    """
+    Keep a capture of painted swatches for fitting again later without the game.
+
+    Returns:
+        str: Path of the capture PNG, the layout is stored next to it as <name>.json
+    """
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, time.strftime("swatches_%Y%m%d_%H%M%S.png"))
+    capture.save(path)
+    with open(os.path.splitext(path)[0] + ".json", "w") as f:
+        json.dump({"layout": layout.to_dict(), "background_color": list(background_color)}, f, indent=1)
+    return path
+
+
+def load_capture(path):
+    """
+    Read a capture stored by save_capture.
+
+    Returns:
+        tuple: (PIL Image, SwatchLayout, background RGB tuple)
+    """
+    with open(os.path.splitext(path)[0] + ".json", "r") as f:
+        data = json.load(f)
+    with Image.open(path) as image:
+        capture = image.convert("RGB")
+    return capture, SwatchLayout.from_dict(data["layout"]), tuple(data["background_color"])
@@ -2,7 +2,7 @@
 # -*- coding: utf-8 -*-
 
 from pynput import keyboard
-from PIL import Image, ImageTk
+from PIL import ImageTk
 
 import tkinter as tk
 import pyautogui
@@ -10,6 +10,8 @@ import win32api
 import time
 import numpy as np
 
+from lib.preview_pyramid import PreviewPyramid
+
 abort_capturing_mode = False
 
 
@@ -58,6 +60,10 @@ def capture_area(preview_image=None):
     pressed, active = False, False
     area_TL = (0, 0)  # Top-left coordinates
     photo_image = None  # Will hold the Tkinter photo image
+    preview_size = None  # Size the preview was last drawn at
+    
+    # Pre-scaled preview levels, so resizing while dragging stays cheap
+    pyramid = PreviewPyramid(preview_image) if preview_image is not None else None
     
     # Moving and resizing state
     drag_start_x, drag_start_y = 0, 0
@@ -65,39 +71,15 @@ def capture_area(preview_image=None):
     
     # Function to update the preview image in the selection area
     def update_preview(width, height):
-        nonlocal photo_image
+        nonlocal photo_image, preview_size
         
-        if preview_image is not None and width > 10 and height > 10:
+        if pyramid is not None and width > 10 and height > 10:
+            if preview_size == (width, height):
+                return  # Nothing changed since the last draw
             try:
-                # Calculate the aspect ratio of the original image
-                orig_width, orig_height = preview_image.size
-                orig_aspect = orig_width / orig_height
-                
-                # Calculate the aspect ratio of the selection area
-                selection_aspect = width / height
-                
-                # Determine the size to resize the image while maintaining aspect ratio
-                if orig_aspect > selection_aspect:
-                    # Image is wider than the selection area
-                    resize_width = width
-                    resize_height = int(width / orig_aspect)
-                else:
-                    # Image is taller than the selection area
-                    resize_height = height
-                    resize_width = int(height * orig_aspect)
-                
-                # Resize the preview image to fit the current selection area
-                resized_img = preview_image.copy().resize((resize_width, resize_height), Image.LANCZOS)
-                
-                # Create a centered image with background color
-                centered_img = Image.new("RGB", (width, height), (50, 50, 50))
-                
-                # Calculate position to paste the resized image (center it)
-                paste_x = (width - resize_width) // 2
-                paste_y = (height - resize_height) // 2
-                
-                # Paste the resized image onto the centered image
-                centered_img.paste(resized_img, (paste_x, paste_y))
+                # Fit the preview into the selection area, centered on a background color
+                centered_img = pyramid.fit(width, height)
+                preview_size = (width, height)
                 
                 # Convert to PhotoImage for display
                 photo_image = ImageTk.PhotoImage(centered_img)
@@ -9,14 +9,196 @@ to achieve a target color using Rust's painting system.
 
 import numpy as np
 import time
-from collections import defaultdict
+import zlib
 from lib.color_functions import hex_to_rgb, rgb_to_hex
 from lib.rustPaletteData import rust_palette
+from lib.profiling import profiler
 import numba as nb
 
 # Global variable for cancellation support across processes
 _cancel_processing = False
 
+
+def create_solution_cache(opacity_values=None):
+    """
+    Create an empty solution cache that can be kept between solves.
+    Solutions are keyed by color and background color, never by pixel position,
+    so they stay valid when the canvas size changes and only the entries for a
+    new background color have to be calculated when the background changes.
+    Solutions of another opacity set are never valid, see 'opacity_values'.
+    
+    Args:
+        opacity_values: Opacity levels the cached solutions are solved with
+    
+    Returns:
+        dict: 'opacity_values' tuple of the opacity levels of the solutions (None if not given),
+              'color_cache' exact layers keyed by (target_color, background_color),
+              'bucket_layers' background_color -> {bucket_key: layers},
+              'lattice_layers' (background_color, max_layers) -> dithering candidates, see lattice_layers,
+              'image_key' (size, checksum) of the image the unique colors belong to,
+              'unique_colors' result of extract_unique_colors() for that image,
+              'last_stats' solved/reused counters of the latest solve
+    """
+    return {
+        'opacity_values': tuple(opacity_values) if opacity_values is not None else None,
+        'color_cache': {},
+        'bucket_layers': {},
+        'lattice_layers': {},
+        'image_key': None,
+        'unique_colors': None,
+        'last_stats': {'solved': 0, 'reused': 0}
+    }
+
+
+def _image_key(image):
+    """Cheap fingerprint of the pixel data, used to detect an unchanged image"""
+    return (image.size, zlib.crc32(image.tobytes()))
+
+
+def extract_unique_colors(image):
+    """
+    Find every distinct color of an image in one vectorized pass.
+    RGB values are packed into uint32 and run through np.unique, so each color is
+    listed exactly once and the inverse index maps every pixel back to its color.
+    
+    Args:
+        image: PIL Image object
+        
+    Returns:
+        tuple: (unique_colors, inverse, counts) where unique_colors is an (N, 3) int32 array,
+               inverse is a flat int array with the unique color index of each pixel (row-major)
+               and counts holds how many pixels use each unique color
+    """
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    pixels = np.asarray(image, dtype=np.uint8).reshape(-1, 3)
+    
+    packed = (pixels[:, 0].astype(np.uint32) << 16) | (pixels[:, 1].astype(np.uint32) << 8) | pixels[:, 2]
+    unique_packed, inverse, counts = np.unique(packed, return_inverse=True, return_counts=True)
+    
+    unique_colors = np.empty((len(unique_packed), 3), dtype=np.int32)
+    unique_colors[:, 0] = (unique_packed >> 16) & 0xFF
+    unique_colors[:, 1] = (unique_packed >> 8) & 0xFF
+    unique_colors[:, 2] = unique_packed & 0xFF
+    
+    return unique_colors, inverse.reshape(-1), counts
+
+
+def _group_unique_colors(unique_colors, counts):
+    """
+    Group unique colors into buckets of similar colors.
+    
+    Returns:
+        tuple: (bucket_keys, bucket_colors, bucket_index) where bucket_keys and bucket_colors are
+               lists with the key and pixel-weighted average color of each bucket and
+               bucket_index holds the bucket of every unique color
+    """
+    # Quantize the color into buckets (reduces color space)
+    # Smaller divisor = finer buckets = better color accuracy but more calculation
+    buckets = unique_colors // 5
+    packed = (buckets[:, 0] << 16) | (buckets[:, 1] << 8) | buckets[:, 2]
+    unique_buckets, bucket_index = np.unique(packed, return_inverse=True)
+    bucket_index = bucket_index.reshape(-1)
+    
+    # Use the average color in each bucket, weighted by how many pixels use each color
+    weights = np.bincount(bucket_index, weights=counts)
+    bucket_colors = []
+    averages = [
+        (np.bincount(bucket_index, weights=unique_colors[:, channel] * counts) / weights).astype(int)
+        for channel in range(3)
+    ]
+    for i in range(len(unique_buckets)):
+        bucket_colors.append((int(averages[0][i]), int(averages[1][i]), int(averages[2][i])))
+    
+    bucket_keys = [
+        (int(key >> 16), int((key >> 8) & 0xFF), int(key & 0xFF)) for key in unique_buckets
+    ]
+    return bucket_keys, bucket_colors, bucket_index
+
+
+def _dilate_mask(mask, radius):
+    """Grow a boolean mask by radius pixels in every direction (square structuring element)"""
+    dilated = mask.copy()
+    for shift in range(1, radius + 1):
+        dilated[:, shift:] |= mask[:, :-shift]
+        dilated[:, :-shift] |= mask[:, shift:]
+    grown = dilated.copy()
+    for shift in range(1, radius + 1):
+        grown[shift:, :] |= dilated[:-shift, :]
+        grown[:-shift, :] |= dilated[shift:, :]
+    return grown
+
+
+def compute_importance_mask(image, threshold=30, dilation=0):
+    """
+    Find the important pixels (high contrast areas) of the whole image at once.
+    A pixel is important when the perceptual distance to one of its four neighbors
+    exceeds the threshold. Distances are calculated on shifted copies of the pixel
+    array instead of fetching the neighbors of every pixel one by one.
+    
+    Args:
+        image: PIL Image object or (H, W, 3) array
+        threshold: Weighted color distance that counts as high contrast
+        dilation: Number of pixels to grow the mask by, to also cover pixels next to edges
+        
+    Returns:
+        numpy.ndarray: (H, W) boolean mask, True for important pixels
+    """
+    if not isinstance(image, np.ndarray):
+        image = np.asarray(image.convert("RGB") if image.mode != "RGB" else image)
+    pixels = image.astype(np.float32)
+    height, width = pixels.shape[:2]
+    mask = np.zeros((height, width), dtype=bool)
+    if width < 3 or height < 3:
+        return mask
+    
+    # Weights based on human perception (R:G:B ≈ 3:6:1), compared squared to skip the sqrt
+    weights = np.array([0.3, 0.6, 0.1], dtype=np.float32)
+    limit = float(threshold) ** 2
+    
+    horizontal = ((pixels[:, 1:] - pixels[:, :-1]) ** 2) @ weights > limit
+    vertical = ((pixels[1:, :] - pixels[:-1, :]) ** 2) @ weights > limit
+    
+    # An edge between two pixels makes both of them important
+    mask[:, :-1] |= horizontal
+    mask[:, 1:] |= horizontal
+    mask[:-1, :] |= vertical
+    mask[1:, :] |= vertical
+    
+    # Border pixels keep the bucket solution
+    mask[0, :] = False
+    mask[-1, :] = False
+    mask[:, 0] = False
+    mask[:, -1] = False
+    
+    if dilation > 0:
+        mask = _dilate_mask(mask, int(dilation))
+    
+    return mask
+
+
+def _collect_unique_colors(image, solution_cache):
+    """
+    Extract and group the unique colors of the image.
+    The result is reused from the solution cache when the image is unchanged,
+    e.g. when only the background color changed since the last solve.
+    
+    Returns:
+        tuple: (unique_colors, inverse, counts, bucket_keys, bucket_colors, bucket_index)
+    """
+    image_key = _image_key(image)
+    if solution_cache['image_key'] == image_key and solution_cache['unique_colors'] is not None:
+        return solution_cache['unique_colors']
+    
+    with profiler.span("unique_colors", "solve"):
+        unique_colors, inverse, counts = extract_unique_colors(image)
+        bucket_keys, bucket_colors, bucket_index = _group_unique_colors(unique_colors, counts)
+    
+    solution_cache['image_key'] = image_key
+    solution_cache['unique_colors'] = (unique_colors, inverse, counts, bucket_keys, bucket_colors, bucket_index)
+    return solution_cache['unique_colors']
+
+
 def alpha_blend(base_color, top_color, opacity):
     """
     Blend two colors according to the opacity of the top color.
@@ -65,7 +247,7 @@ def color_distance(color1, color2):
     return np.sqrt(np.sum(weights * (delta ** 2)))
 
 # JIT-compiled versions of the core color functions
-@nb.jit(nopython=True)
+@nb.jit(nopython=True, cache=True)
 def alpha_blend_numba(base_color, top_color, opacity):
     """
     JIT-compiled version of alpha_blend.
@@ -81,7 +263,7 @@ def alpha_blend_numba(base_color, top_color, opacity):
     return (r, g, b)
 
 
-@nb.jit(nopython=True)
+@nb.jit(nopython=True, cache=True)
 def color_distance_numba(color1, color2):
     """
     JIT-compiled version of color_distance.
@@ -100,7 +282,13 @@ def color_distance_numba(color1, color2):
     return np.sqrt(dr + dg + db)
 
 
-@nb.jit(nopython=True)
+@nb.jit(
+    nb.types.Tuple((nb.float64, nb.int64, nb.int64, nb.types.UniTuple(nb.int64, 3)))(
+        nb.types.UniTuple(nb.int64, 3), nb.types.UniTuple(nb.int64, 3),
+        nb.int32[:, :], nb.float32[:], nb.float64
+    ),
+    nopython=True, cache=True
+)
 def find_best_layer_numba(current_color, target_color, base_colors, opacity_levels, improvement_threshold):
     """
     JIT-optimized helper function to find the best layer combination.
@@ -267,11 +455,13 @@ def find_optimal_layers_numba(target_color, background_color, base_colors, opaci
     base_colors_array = np.array(base_colors, dtype=np.int32)
     opacity_levels_array = np.array(opacity_levels, dtype=np.float32)
     
-    current_color = background_color
+    # Plain int tuples match the compiled signature of find_best_layer_numba
+    current_color = (int(background_color[0]), int(background_color[1]), int(background_color[2]))
+    target_rgb = (int(target_color[0]), int(target_color[1]), int(target_color[2]))
     layers = []
     
     # Initial distance to target using numba version
-    initial_distance = color_distance_numba(current_color, target_color)
+    initial_distance = color_distance_numba(current_color, target_rgb)
     
     # Early termination if colors are very close already
     if initial_distance < 1.0:
@@ -285,14 +475,14 @@ def find_optimal_layers_numba(target_color, background_color, base_colors, opaci
         # Use the JIT-compiled helper function to find the best layer
         best_distance, best_color_idx, best_opacity_idx, best_result = find_best_layer_numba(
             current_color, 
-            target_color,
+            target_rgb,
             base_colors_array,
             opacity_levels_array,
             improvement_threshold
         )
         
         # If we found a layer that improves the result
-        if best_color_idx >= 0 and best_distance < color_distance_numba(current_color, target_color) - improvement_threshold:
+        if best_color_idx >= 0 and best_distance < color_distance_numba(current_color, target_rgb) - improvement_threshold:
             layers.append((best_color_idx, best_opacity_idx))
             current_color = best_result
             
@@ -311,101 +501,68 @@ def find_optimal_layers_numba(target_color, background_color, base_colors, opaci
     return layers
 
 
-def create_layered_colors_map(image, background_color, palette_colors, opacity_values, max_layers=2, update_callback=None):
+def _solve_layered_colors(image, background_color, max_layers, update_callback, solution_cache,
+                          find_layers, palette_arg, opacity_arg, importance_threshold, importance_dilation,
+                          importance_mask=None):
     """
-    Process an entire image to find the optimal color layering for each pixel.
-    
-    Args:
-        image: PIL Image object
-        background_color: RGB tuple of background color
-        palette_colors: List of base RGB colors
-        opacity_values: List of opacity values (0-1)
-        max_layers: Maximum number of layers to apply
-        update_callback: Function to call with progress updates (percentage, time_elapsed, time_remaining)
-        
-    Returns:
-        dict: A dictionary mapping pixel coordinates to layers list
+    Shared implementation of create_layered_colors_map and create_layered_colors_map_numba.
+    Unique colors are solved once per bucket, pixels in high contrast areas get the exact
+    solution of their own color, and the results are broadcast back through the inverse index.
     """
     # Reset cancellation flag
     global _cancel_processing
     _cancel_processing = False
     
     width, height = image.size
-    pixel_data = image.load()
     layered_colors = {}
     
-    # Cache for already calculated color mappings
-    color_cache = {}
+    # Cache for already calculated color mappings, kept between solves if provided
+    if solution_cache is None:
+        solution_cache = create_solution_cache()
+    color_cache = solution_cache['color_cache']
+    cached_bucket_layers = solution_cache['bucket_layers'].setdefault(background_color, {})
+    solved = reused = 0
     
     # Performance metrics
-    total_pixels = width * height
-    processed_pixels = 0
     start_time = time.time()
-    update_interval = max(1, total_pixels // 100)  # Update every 1% of pixels
     last_update_time = start_time
     
-    # Color similarity bucketing for faster processing
-    # Group similar colors together to avoid recalculating
-    color_groups = defaultdict(list)
-    
-    # Use downsampling for large images to reduce computation time
-    # Adjusted to smaller downsampling factor for better color fidelity
-    downsample = max(1, min(width, height) // 800)  # Less aggressive downsampling for better quality
-    downsample_active = total_pixels > 200000  # Only downsample larger images
-    
-    # First pass - identify unique colors and build color groups
-    unique_colors = set()
-    for y in range(0, height, 1 + (downsample if downsample_active else 0)):
-        for x in range(0, width, 1 + (downsample if downsample_active else 0)):
-            unique_colors.add(pixel_data[x, y])
-    
-    # Create color buckets (group similar colors)
-    # Using finer buckets (smaller bucket size) for better color accuracy
-    for color in unique_colors:
-        # Quantize the color into buckets (reduces color space)
-        # Smaller divisor = finer buckets = better color accuracy but more calculation
-        bucket_key = (color[0]//5, color[1]//5, color[2]//5)  # Smaller bucket size for better fidelity
-        color_groups[bucket_key].append(color)
+    # First pass - every distinct color of the image, grouped into buckets of similar colors
+    unique_colors, inverse, counts, bucket_keys, bucket_colors, bucket_index = _collect_unique_colors(image, solution_cache)
     
     # Calculate optimal layers for each color bucket (not individual pixels)
-    bucket_layers = {}
-    bucket_count = len(color_groups)
-    bucket_processed = 0
+    bucket_layers = []
+    bucket_count = len(bucket_keys)
     
-    for bucket_key, colors in color_groups.items():
+    for bucket_processed, bucket_key in enumerate(bucket_keys):
         # Check for cancellation
         if _cancel_processing:
             if update_callback:
                 update_callback(0, 0, 0)  # Reset progress
             return {}  # Return empty result
         
-        # Use the average color in this bucket
-        r_sum = g_sum = b_sum = 0
-        for color in colors:
-            r_sum += color[0]
-            g_sum += color[1]
-            b_sum += color[2]
-        avg_color = (
-            int(r_sum / len(colors)),
-            int(g_sum / len(colors)),
-            int(b_sum / len(colors))
-        )
+        # Re-map the solution of a previous solve with the same background color
+        if bucket_key in cached_bucket_layers:
+            bucket_layers.append(cached_bucket_layers[bucket_key])
+            reused += 1
+            continue
         
-        # Calculate layers for this color
-        bucket_layers[bucket_key] = find_optimal_layers(
-            avg_color,
+        layers = find_layers(
+            bucket_colors[bucket_processed],
             background_color,
-            palette_colors,
-            opacity_values,
+            palette_arg,
+            opacity_arg,
             max_layers,
             color_cache
         )
+        bucket_layers.append(layers)
+        cached_bucket_layers[bucket_key] = layers
+        solved += 1
         
         # Update progress for bucket calculations
-        bucket_processed += 1
         if update_callback and time.time() - last_update_time > 0.25:
             last_update_time = time.time()
-            bucket_percent = int((bucket_processed / bucket_count) * 50)  # First 50% of progress
+            bucket_percent = int(((bucket_processed + 1) / bucket_count) * 50)  # First 50% of progress
             elapsed = time.time() - start_time
             remaining = (elapsed / bucket_percent) * (100 - bucket_percent) if bucket_percent > 0 else 0
             stop_processing = update_callback(bucket_percent, elapsed, remaining)
@@ -413,66 +570,81 @@ def create_layered_colors_map(image, background_color, palette_colors, opacity_v
                 _cancel_processing = True
                 return {}  # Return empty result
     
-    # Second pass - assign colors to pixels using the pre-calculated bucket values
-    for y in range(height):
-        for x in range(width):
-            # Check for cancellation periodically
-            if _cancel_processing:
-                return {}  # Return empty result
-                
-            color = pixel_data[x, y]
-            bucket_key = (color[0]//5, color[1]//5, color[2]//5)  # Match bucket size from above
-            
-            # Get layers from bucket or calculate directly for better accuracy if needed
-            layers = bucket_layers.get(bucket_key, [])
-            
-            # For important colors (high contrast areas), recalculate exactly
-            # This improves color accuracy for important details
-            is_important_pixel = False
-            if x > 0 and y > 0 and x < width-1 and y < height-1:
-                # Check surrounding pixels for color contrast (edge detection)
-                neighbors = [
-                    pixel_data[x-1, y],
-                    pixel_data[x+1, y],
-                    pixel_data[x, y-1],
-                    pixel_data[x, y+1]
-                ]
-                
-                for neighbor in neighbors:
-                    if color_distance(color, neighbor) > 30:  # High contrast threshold
-                        is_important_pixel = True
-                        break
-            
-            # For important pixels, calculate exact layers
-            if is_important_pixel:
-                layers = find_optimal_layers(
-                    color,
+    # Second pass - find the important pixels (high contrast areas), unless the caller computed them
+    if importance_mask is None:
+        importance_mask = compute_importance_mask(image, importance_threshold, importance_dilation)
+    important = np.asarray(importance_mask, dtype=bool).reshape(-1)
+    
+    if update_callback:
+        elapsed = time.time() - start_time
+        if update_callback(75, elapsed, elapsed / 3):
+            _cancel_processing = True
+            return {}  # Return empty result
+    
+    # Broadcast the solutions back to the pixels through the inverse index.
+    # Important pixels get the exact solution of their own color, calculated once per color.
+    unique_layers = [bucket_layers[bucket] for bucket in bucket_index]
+    exact_layers = {}
+    has_layers = np.array([len(layers) > 0 for layers in unique_layers], dtype=bool)
+    paint_pixels = np.flatnonzero(important | has_layers[inverse])
+    
+    for pixel_idx in paint_pixels:
+        if _cancel_processing:
+            return {}
+        
+        color_idx = inverse[pixel_idx]
+        if important[pixel_idx]:
+            layers = exact_layers.get(color_idx)
+            if layers is None:
+                layers = find_layers(
+                    tuple(int(c) for c in unique_colors[color_idx]),
                     background_color,
-                    palette_colors,
-                    opacity_values,
+                    palette_arg,
+                    opacity_arg,
                     max_layers,
                     color_cache
                 )
-            
-            if layers:  # Only store pixels that need painting
-                layered_colors[(x, y)] = layers
-            
-            # Update progress
-            processed_pixels += 1
-            if update_callback and processed_pixels % update_interval == 0:
-                # Scale from 50% to 100% for the second phase
-                percent = 50 + int((processed_pixels / total_pixels) * 50)
-                elapsed = time.time() - start_time
-                remaining = (elapsed / percent) * (100 - percent) if percent > 0 else 0
-                stop_processing = update_callback(percent, elapsed, remaining)
-                if stop_processing:
-                    _cancel_processing = True
-                    return {}  # Return empty result
+                exact_layers[color_idx] = layers
+        else:
+            layers = unique_layers[color_idx]
+        
+        if layers:  # Only store pixels that need painting
+            layered_colors[(int(pixel_idx % width), int(pixel_idx // width))] = layers
     
+    solution_cache['last_stats'] = {'solved': solved, 'reused': reused}
     return layered_colors
 
 
-def create_layered_colors_map_numba(image, background_color, palette_colors, opacity_values, max_layers=2, update_callback=None):
+def create_layered_colors_map(image, background_color, palette_colors, opacity_values, max_layers=2, update_callback=None, solution_cache=None,
+                              importance_threshold=30, importance_dilation=0, importance_mask=None):
+    """
+    Process an entire image to find the optimal color layering for each pixel.
+    
+    Args:
+        image: PIL Image object
+        background_color: RGB tuple of background color
+        palette_colors: List of base RGB colors
+        opacity_values: List of opacity values (0-1)
+        max_layers: Maximum number of layers to apply
+        update_callback: Function to call with progress updates (percentage, time_elapsed, time_remaining)
+        solution_cache: Optional cache from create_solution_cache() that is reused between solves
+        importance_threshold: Color distance to a neighbor that marks a pixel as important
+        importance_dilation: Number of pixels the importance mask is grown by
+        importance_mask: Optional precomputed (H, W) boolean mask that replaces the threshold/dilation
+                         mask, e.g. one cut from a larger image (see tiled_processing)
+        
+    Returns:
+        dict: A dictionary mapping pixel coordinates to layers list
+    """
+    return _solve_layered_colors(
+        image, background_color, max_layers, update_callback, solution_cache,
+        find_optimal_layers, palette_colors, opacity_values,
+        importance_threshold, importance_dilation, importance_mask
+    )
+
+
+def create_layered_colors_map_numba(image, background_color, palette_colors, opacity_values, max_layers=2, update_callback=None, solution_cache=None,
+                                    importance_threshold=30, importance_dilation=0, importance_mask=None):
     """
     Numba-optimized version of create_layered_colors_map.
     Uses JIT-compiled functions for the most intensive calculations.
@@ -484,166 +656,307 @@ def create_layered_colors_map_numba(image, background_color, palette_colors, opa
         opacity_values: List of opacity values (0-1)
         max_layers: Maximum number of layers to apply
         update_callback: Function to call with progress updates (percentage, time_elapsed, time_remaining)
+        solution_cache: Optional cache from create_solution_cache() that is reused between solves
+        importance_threshold: Color distance to a neighbor that marks a pixel as important
+        importance_dilation: Number of pixels the importance mask is grown by
+        importance_mask: Optional precomputed (H, W) boolean mask that replaces the threshold/dilation
+                         mask, e.g. one cut from a larger image (see tiled_processing)
         
     Returns:
         dict: A dictionary mapping pixel coordinates to layers list
     """
-    # Reset cancellation flag
-    global _cancel_processing
-    _cancel_processing = False
-    
     # Convert inputs to numpy arrays for Numba compatibility
     base_colors_array = np.array(palette_colors, dtype=np.int32)
     opacity_array = np.array(opacity_values, dtype=np.float32)
     
-    width, height = image.size
-    pixel_data = image.load()
-    layered_colors = {}
-    
-    # Cache for already calculated color mappings
-    color_cache = {}
+    return _solve_layered_colors(
+        image, background_color, max_layers, update_callback, solution_cache,
+        find_optimal_layers_numba, base_colors_array, opacity_array,
+        importance_threshold, importance_dilation, importance_mask
+    )
+
+
+# Error diffusion kernels as (row offset, column offset, weight)
+DITHER_KERNELS = {
+    'floyd-steinberg': [(0, 1, 7 / 16), (1, -1, 3 / 16), (1, 0, 5 / 16), (1, 1, 1 / 16)],
+    'atkinson': [(0, 1, 1 / 8), (0, 2, 1 / 8), (1, -1, 1 / 8), (1, 0, 1 / 8), (1, 1, 1 / 8), (2, 0, 1 / 8)],
+}
+
+# 4x4 Bayer threshold matrix used for ordered dithering
+BAYER_MATRIX = np.array([
+    [0, 8, 2, 10],
+    [12, 4, 14, 6],
+    [3, 11, 1, 9],
+    [15, 7, 13, 5]
+], dtype=np.float32)
+
+DITHER_MODES = ['none', 'floyd-steinberg', 'atkinson', 'bayer']
+
+
+@nb.jit(
+    nb.int64(nb.float64, nb.float64, nb.float64, nb.float32[:, :], nb.int64, nb.int64, nb.float64),
+    nopython=True, cache=True
+)
+def _closest_achievable_numba(r, g, b, achievable, left_idx, up_idx, isolation_penalty):
+    """
+    JIT-compiled search for the achievable color closest to (r, g, b).
+    Candidates that differ from the left/upper neighbor's choice get the isolation
+    penalty added, which keeps line runs long at the cost of a small color error.
+    """
+    best_idx = 0
+    best_score = np.inf
+    for k in range(achievable.shape[0]):
+        dr = r - achievable[k, 0]
+        dg = g - achievable[k, 1]
+        db = b - achievable[k, 2]
+        score = np.sqrt(dr * dr * 0.3 + dg * dg * 0.6 + db * db * 0.1)
+        if left_idx >= 0 and k != left_idx:
+            score += isolation_penalty
+        if up_idx >= 0 and k != up_idx:
+            score += isolation_penalty * 0.5
+        if score < best_score:
+            best_score = score
+            best_idx = k
+    return best_idx
+
+
+@nb.jit(
+    nb.int32[:, :](nb.float32[:, :, :], nb.float32[:, :], nb.int64[:], nb.int64[:], nb.float32[:], nb.float32),
+    nopython=True, cache=True
+)
+def _error_diffusion_numba(pixels, achievable, kernel_dy, kernel_dx, kernel_weights, isolation_penalty):
+    """
+    JIT-compiled error diffusion. Every pixel is mapped to the closest achievable color
+    and the remaining error is spread to the unprocessed neighbors with the kernel weights.
     
-    # Performance metrics
-    total_pixels = width * height
-    processed_pixels = 0
-    start_time = time.time()
-    update_interval = max(1, total_pixels // 100)  # Update every 1% of pixels
-    last_update_time = start_time
+    Returns:
+        (H, W) int32 array with the index of the chosen achievable color
+    """
+    height, width = pixels.shape[0], pixels.shape[1]
+    error = np.zeros((height, width, 3), dtype=np.float32)
+    result = np.empty((height, width), dtype=np.int32)
     
-    # Color similarity bucketing for faster processing
-    color_groups = defaultdict(list)
+    for y in range(height):
+        for x in range(width):
+            r = min(max(pixels[y, x, 0] + error[y, x, 0], 0.0), 255.0)
+            g = min(max(pixels[y, x, 1] + error[y, x, 1], 0.0), 255.0)
+            b = min(max(pixels[y, x, 2] + error[y, x, 2], 0.0), 255.0)
+            
+            left_idx = result[y, x - 1] if x > 0 else -1
+            up_idx = result[y - 1, x] if y > 0 else -1
+            best_idx = _closest_achievable_numba(r, g, b, achievable, left_idx, up_idx, isolation_penalty)
+            result[y, x] = best_idx
+            
+            er = r - achievable[best_idx, 0]
+            eg = g - achievable[best_idx, 1]
+            eb = b - achievable[best_idx, 2]
+            for i in range(kernel_weights.shape[0]):
+                ny = y + kernel_dy[i]
+                nx = x + kernel_dx[i]
+                if 0 <= ny < height and 0 <= nx < width:
+                    error[ny, nx, 0] += er * kernel_weights[i]
+                    error[ny, nx, 1] += eg * kernel_weights[i]
+                    error[ny, nx, 2] += eb * kernel_weights[i]
+    
+    return result
+
+
+@nb.jit(
+    nb.int32[:, :](nb.float32[:, :, :], nb.float32[:, :], nb.float32[:, :], nb.float32, nb.float32),
+    nopython=True, cache=True
+)
+def _ordered_dither_numba(pixels, achievable, bayer_matrix, spread, isolation_penalty):
+    """
+    JIT-compiled ordered (Bayer) dithering. A position dependent threshold is added
+    to every pixel before it is mapped to the closest achievable color.
     
-    # Use downsampling for large images to reduce computation time
-    downsample = max(1, min(width, height) // 800)
-    downsample_active = total_pixels > 200000  # Only downsample larger images
+    Returns:
+        (H, W) int32 array with the index of the chosen achievable color
+    """
+    height, width = pixels.shape[0], pixels.shape[1]
+    result = np.empty((height, width), dtype=np.int32)
+    size = bayer_matrix.shape[0]
+    levels = size * size
     
-    # First pass - identify unique colors and build color groups
-    unique_colors = set()
-    for y in range(0, height, 1 + (downsample if downsample_active else 0)):
-        for x in range(0, width, 1 + (downsample if downsample_active else 0)):
-            unique_colors.add(pixel_data[x, y])
+    for y in range(height):
+        for x in range(width):
+            offset = ((bayer_matrix[y % size, x % size] + 0.5) / levels - 0.5) * spread
+            r = min(max(pixels[y, x, 0] + offset, 0.0), 255.0)
+            g = min(max(pixels[y, x, 1] + offset, 0.0), 255.0)
+            b = min(max(pixels[y, x, 2] + offset, 0.0), 255.0)
+            
+            left_idx = result[y, x - 1] if x > 0 else -1
+            up_idx = result[y - 1, x] if y > 0 else -1
+            result[y, x] = _closest_achievable_numba(r, g, b, achievable, left_idx, up_idx, isolation_penalty)
     
-    # Create color buckets (group similar colors)
-    for color in unique_colors:
-        # Quantize the color into buckets (reduces color space)
-        bucket_key = (color[0]//5, color[1]//5, color[2]//5)  # Bucket size for better fidelity
-        color_groups[bucket_key].append(color)
+    return result
+
+
+def build_achievable_colors(background_color, palette_colors, opacity_values, candidate_layers):
+    """
+    Build the set of colors that can be produced on the canvas together with the layers
+    that produce them: the bare background, every single layer on the background and
+    every candidate layer combination (typically the solutions of find_optimal_layers).
     
-    # Calculate optimal layers for each color bucket (not individual pixels)
-    bucket_layers = {}
-    bucket_count = len(color_groups)
-    bucket_processed = 0
+    Args:
+        background_color: RGB tuple of background color
+        palette_colors: List of base RGB colors
+        opacity_values: List of opacity values (0-1)
+        candidate_layers: Iterable of layers lists
+        
+    Returns:
+        tuple: ((K, 3) float32 array of achievable colors, list of K layers lists)
+    """
+    achievable = {tuple(background_color): []}
     
-    # Pre-compile JIT functions by calling them once (this improves first-run performance)
-    _ = color_distance_numba((0, 0, 0), (255, 255, 255))
-    _ = alpha_blend_numba((0, 0, 0), (255, 255, 255), 0.5)
+    def add(layers):
+        color = background_color
+        for color_idx, opacity_idx in layers:
+            color = alpha_blend(color, palette_colors[color_idx], opacity_values[opacity_idx])
+        # Keep the combination with the fewest layers for every color
+        if color not in achievable or len(layers) < len(achievable[color]):
+            achievable[color] = list(layers)
+    
+    for color_idx in range(len(palette_colors)):
+        for opacity_idx in range(len(opacity_values)):
+            add([(color_idx, opacity_idx)])
+    for layers in candidate_layers:
+        if layers:
+            add(layers)
+    
+    colors = np.array(list(achievable.keys()), dtype=np.float32)
+    return colors, list(achievable.values())
+
+
+# Channel step of the RGB lattice whose layer solutions are the colors the dithering can choose from
+ACHIEVABLE_LATTICE_STEP = 17
+
+
+def lattice_layers(background_color, palette_colors, opacity_values, max_layers=2, step=ACHIEVABLE_LATTICE_STEP):
+    """
+    Layer combinations the solver picks for an even lattice of RGB colors. They only depend
+    on the background, the palette and the opacity levels, not on what was solved before.
     
-    for bucket_key, colors in color_groups.items():
-        # Check for cancellation
-        if _cancel_processing:
-            if update_callback:
-                update_callback(0, 0, 0)  # Reset progress
-            return {}  # Return empty result
+    Args:
+        background_color: RGB tuple of background color
+        palette_colors: List of base RGB colors
+        opacity_values: List of opacity values (0-1)
+        max_layers: Maximum number of layers to apply
+        step: Channel step of the lattice
         
-        # Use the average color in this bucket
-        if len(colors) > 0:
-            # Vectorized calculation of average color using numpy
-            colors_array = np.array(colors)
-            avg_color = tuple(np.mean(colors_array, axis=0).astype(int))
-            
-            # Calculate layers for this color using Numba-optimized function
-            bucket_layers[bucket_key] = find_optimal_layers_numba(
-                avg_color,
-                background_color,
-                base_colors_array,
-                opacity_array,
-                max_layers,
-                color_cache
-            )
+    Returns:
+        list: Layers lists, one per lattice color that needs painting
+    """
+    levels = list(range(0, 256, step))
+    if levels[-1] != 255:
+        levels.append(255)
+    candidate_layers = []
+    for r in levels:
+        for g in levels:
+            for b in levels:
+                layers = find_optimal_layers_numba((r, g, b), background_color, palette_colors, opacity_values, max_layers)
+                if layers:
+                    candidate_layers.append(layers)
+    return candidate_layers
+
+
+def create_dithered_colors_map(image, background_color, palette_colors, opacity_values, max_layers=2, method='floyd-steinberg',
+                               isolation_penalty=0.0, update_callback=None, solution_cache=None, bayer_spread=32.0,
+                               importance_threshold=30, importance_dilation=0):
+    """
+    Layered color solve with error diffusion, to avoid banding in gradients.
+    The achievable color set is every single layer and the solutions of an RGB lattice
+    (see lattice_layers), and the dithering distributes the color error over it. The image
+    is solved normally as well, important pixels (see compute_importance_mask) keep their
+    exact solution instead of a dithered one.
+    
+    Args:
+        image: PIL Image object
+        background_color: RGB tuple of background color
+        palette_colors: List of base RGB colors
+        opacity_values: List of opacity values (0-1)
+        max_layers: Maximum number of layers to apply
+        method: 'floyd-steinberg', 'atkinson' or 'bayer'
+        isolation_penalty: Color distance added for choosing a different color than the neighbors,
+                           higher values give longer line runs (fewer strokes) at the cost of quality
+        update_callback: Function to call with progress updates (percentage, time_elapsed, time_remaining)
+        solution_cache: Optional cache from create_solution_cache() that is reused between solves
+        bayer_spread: Strength of the threshold added by ordered dithering
+        importance_threshold: Color distance to a neighbor that marks a pixel as important
+        importance_dilation: Number of pixels the importance mask is grown by
         
-        # Update progress for bucket calculations
-        bucket_processed += 1
-        if update_callback and time.time() - last_update_time > 0.25:
-            last_update_time = time.time()
-            bucket_percent = int((bucket_processed / bucket_count) * 50)  # First 50% of progress
-            elapsed = time.time() - start_time
-            remaining = (elapsed / bucket_percent) * (100 - bucket_percent) if bucket_percent > 0 else 0
-            stop_processing = update_callback(bucket_percent, elapsed, remaining)
-            if stop_processing:
-                _cancel_processing = True
-                return {}  # Return empty result
+    Returns:
+        dict: A dictionary mapping pixel coordinates to layers list
+    """
+    global _cancel_processing
+    if method not in DITHER_KERNELS and method != 'bayer':
+        raise ValueError(f"Unknown dithering method: {method}")
     
-    # Second pass - assign colors to pixels using the pre-calculated bucket values
-    # Use numpy arrays for more efficient neighbor checking
-    # Create a list to store important pixel coordinates for batch processing
-    important_pixels = []
+    if solution_cache is None:
+        solution_cache = create_solution_cache()
+    start_time = time.time()
     
-    # First identify all important pixels (high contrast areas)
-    for y in range(height):
-        for x in range(width):
-            # Check for cancellation periodically
-            if _cancel_processing:
-                return {}  # Return empty result
-                
-            color = pixel_data[x, y]
-            bucket_key = (color[0]//5, color[1]//5, color[2]//5)
-            
-            # Get layers from bucket or calculate directly for better accuracy if needed
-            layers = bucket_layers.get(bucket_key, [])
-            
-            # For important colors (high contrast areas), we'll recalculate exactly
-            is_important_pixel = False
-            if x > 0 and y > 0 and x < width-1 and y < height-1:
-                # Check surrounding pixels for color contrast using JIT-optimized function
-                neighbors = [
-                    pixel_data[x-1, y],
-                    pixel_data[x+1, y],
-                    pixel_data[x, y-1],
-                    pixel_data[x, y+1]
-                ]
-                
-                for neighbor in neighbors:
-                    if color_distance_numba(color, neighbor) > 30:  # High contrast threshold
-                        is_important_pixel = True
-                        break
-            
-            # For important pixels, calculate exact layers or add to list for batch processing
-            if is_important_pixel:
-                important_pixels.append((x, y, color))
-            elif layers:  # Only store pixels that need painting
-                layered_colors[(x, y)] = layers
-            
-            # Update progress
-            processed_pixels += 1
-            if update_callback and processed_pixels % update_interval == 0:
-                # Scale from 50% to 100% for the second phase
-                percent = 50 + int((processed_pixels / total_pixels) * 50)
-                elapsed = time.time() - start_time
-                remaining = (elapsed / percent) * (100 - percent) if percent > 0 else 0
-                stop_processing = update_callback(percent, elapsed, remaining)
-                if stop_processing:
-                    _cancel_processing = True
-                    return {}  # Return empty result
-    
-    # Process important pixels
-    for x, y, color in important_pixels:
-        if _cancel_processing:
+    # The regular solve takes the first 70% of the progress
+    def solve_progress(percent, elapsed, remaining):
+        if update_callback:
+            return update_callback(int(percent * 0.7), elapsed, remaining)
+        return False
+    
+    importance_mask = compute_importance_mask(image, importance_threshold, importance_dilation)
+    layered_colors = create_layered_colors_map_numba(
+        image, background_color, palette_colors, opacity_values, max_layers,
+        solve_progress, solution_cache, importance_mask=importance_mask
+    )
+    if _cancel_processing:
+        return {}
+    
+    # The lattice solutions only depend on the solve settings, they are kept in the solution cache
+    lattice_key = (tuple(background_color), max_layers)
+    lattice_cache = solution_cache.setdefault('lattice_layers', {})
+    if lattice_key not in lattice_cache:
+        lattice_cache[lattice_key] = lattice_layers(
+            background_color, np.array(palette_colors, dtype=np.int32), np.array(opacity_values, dtype=np.float32),
+            max_layers
+        )
+    achievable, achievable_layers = build_achievable_colors(
+        background_color, palette_colors, opacity_values, lattice_cache[lattice_key]
+    )
+    
+    if update_callback:
+        elapsed = time.time() - start_time
+        if update_callback(70, elapsed, elapsed * 0.3):
+            _cancel_processing = True
             return {}
-            
-        # Calculate exact layers using Numba-optimized function
-        layers = find_optimal_layers_numba(
-            color,
-            background_color,
-            base_colors_array,
-            opacity_array,
-            max_layers,
-            color_cache
+    
+    pixels = np.asarray(image.convert("RGB") if image.mode != "RGB" else image, dtype=np.float32)
+    if method == 'bayer':
+        indices = _ordered_dither_numba(pixels, achievable, BAYER_MATRIX, np.float32(bayer_spread),
+                                        np.float32(isolation_penalty))
+    else:
+        kernel = DITHER_KERNELS[method]
+        indices = _error_diffusion_numba(
+            pixels,
+            achievable,
+            np.array([k[0] for k in kernel], dtype=np.int64),
+            np.array([k[1] for k in kernel], dtype=np.int64),
+            np.array([k[2] for k in kernel], dtype=np.float32),
+            np.float32(isolation_penalty)
         )
-        
-        if layers:  # Only store pixels that need painting
-            layered_colors[(x, y)] = layers
     
-    return layered_colors
+    dithered_colors = {}
+    has_layers = np.array([len(layers) > 0 for layers in achievable_layers], dtype=bool)
+    for y, x in zip(*np.nonzero(has_layers[indices] & ~importance_mask)):
+        dithered_colors[(int(x), int(y))] = achievable_layers[indices[y, x]]
+    for y, x in zip(*np.nonzero(importance_mask)):
+        layers = layered_colors.get((int(x), int(y)))
+        if layers:
+            dithered_colors[(int(x), int(y))] = layers
+    
+    if update_callback:
+        elapsed = time.time() - start_time
+        update_callback(100, elapsed, 0)
+    
+    return dithered_colors
 
 
 def simulate_layered_image(image, background_color, palette_colors, opacity_values, layered_colors):
@@ -773,69 +1086,36 @@ def _process_color_chunk(chunk_data):
         )
     return local_results
 
-def _process_image_strip(strip_data):
-    """Process an image strip for multiprocessing"""
-    # Unpack the arguments from the tuple
-    strip_bounds, image_data, width, height, bucket_layers, background_color, palette_colors, opacity_values, max_layers = strip_data
-    
-    # Check for cancellation
-    global _cancel_processing
-    if _cancel_processing:
-        return {}
-    
-    local_results = {}
-    local_cache = {}  # Local cache for this process
-    start_x, end_x, start_y, end_y = strip_bounds
-    
-    for y in range(start_y, end_y):
-        for x in range(start_x, end_x):
-            # Check for cancellation periodically
-            if _cancel_processing:
-                return {}
-                
-            # Get pixel color from the serialized image data
-            if 0 <= x < width and 0 <= y < height:
-                color = image_data[y * width + x]
-                
-                bucket_key = (color[0]//5, color[1]//5, color[2]//5)
-                
-                # Get layers from bucket or calculate directly
-                layers = bucket_layers.get(bucket_key, [])
-                
-                # Check if this is an important pixel (high contrast area)
-                is_important_pixel = False
-                if x > 0 and y > 0 and x < width-1 and y < height-1:
-                    neighbors = []
-                    # Get the four surrounding pixels
-                    if x > 0:
-                        neighbors.append(image_data[y * width + (x-1)])
-                    if x < width-1:
-                        neighbors.append(image_data[y * width + (x+1)])
-                    if y > 0:
-                        neighbors.append(image_data[(y-1) * width + x])
-                    if y < height-1:
-                        neighbors.append(image_data[(y+1) * width + x])
-                    
-                    for neighbor in neighbors:
-                        if color_distance(color, neighbor) > 30:
-                            is_important_pixel = True
-                            break
-                
-                # For important pixels, calculate exact layers
-                if is_important_pixel:
-                    layers = find_optimal_layers(
-                        color,
-                        background_color,
-                        palette_colors,
-                        opacity_values,
-                        max_layers,
-                        local_cache
-                    )
-                
-                if layers:  # Only store pixels that need painting
-                    local_results[(x, y)] = layers
+def warm_up_kernels():
+    """
+    Compile every JIT kernel (or load it from numba's on-disk cache) with small inputs,
+    so the first solve runs at full speed. Safe to call from a background thread.
     
-    return local_results
+    Returns:
+        float: Seconds spent compiling/loading the kernels
+    """
+    start_time = time.time()
+    palette = np.array(rust_palette[:4], dtype=np.int32)
+    opacities = np.array([1.0, 0.5], dtype=np.float32)
+    achievable = palette.astype(np.float32)
+    pixels = np.zeros((2, 2, 3), dtype=np.float32)
+    kernel = DITHER_KERNELS['floyd-steinberg']
+    
+    # Generic helpers are called from Python with tuples and with palette rows
+    color_distance_numba((0, 0, 0), (255, 255, 255))
+    alpha_blend_numba((0, 0, 0), (255, 255, 255), 0.5)
+    alpha_blend_numba((0, 0, 0), palette[0], opacities[1])
+    
+    find_best_layer_numba((0, 0, 0), (255, 255, 255), palette, opacities, 0.05)
+    _error_diffusion_numba(
+        pixels, achievable,
+        np.array([k[0] for k in kernel], dtype=np.int64),
+        np.array([k[1] for k in kernel], dtype=np.int64),
+        np.array([k[2] for k in kernel], dtype=np.float32),
+        np.float32(0.0)
+    )
+    _ordered_dither_numba(pixels, achievable, BAYER_MATRIX, np.float32(32.0), np.float32(0.0))
+    return time.time() - start_time
 
 def set_cancel_flag(cancel=True):
     """Set the global cancellation flag that all processes will check"""
@@ -843,12 +1123,15 @@ def set_cancel_flag(cancel=True):
     _cancel_processing = cancel
     print(f"Cancellation flag set to: {_cancel_processing}")
 
-def create_layered_colors_map_parallel(image, background_color, palette_colors, opacity_values, max_layers=2, update_callback=None):
+def create_layered_colors_map_parallel(image, background_color, palette_colors, opacity_values, max_layers=2, update_callback=None, solution_cache=None,
+                                       importance_threshold=30, importance_dilation=0, importance_mask=None):
     """Replaced with Numba-optimized version for better single-core performance"""
     print("Multiprocessing version has been replaced with Numba-optimized single process version")
-    return create_layered_colors_map_optimized(image, background_color, palette_colors, opacity_values, max_layers, update_callback)
+    return create_layered_colors_map_optimized(image, background_color, palette_colors, opacity_values, max_layers, update_callback, solution_cache,
+                                               importance_threshold, importance_dilation, importance_mask)
 
-def create_layered_colors_map_optimized(image, background_color, palette_colors, opacity_values, max_layers=2, update_callback=None):
+def create_layered_colors_map_optimized(image, background_color, palette_colors, opacity_values, max_layers=2, update_callback=None, solution_cache=None,
+                                        importance_threshold=30, importance_dilation=0, importance_mask=None):
     """
     Smart wrapper for color map creation that uses the Numba-optimized implementation.
     This is intended to replace the multiprocessing version with a highly optimized single-process version.
@@ -860,4 +1143,5 @@ def create_layered_colors_map_optimized(image, background_color, palette_colors,
         dict: A dictionary mapping pixel coordinates to layers list
     """
     print("Using Numba JIT optimization for color processing")
-    return create_layered_colors_map_numba(image, background_color, palette_colors, opacity_values, max_layers, update_callback)
\ No newline at end of file
+    return create_layered_colors_map_numba(image, background_color, palette_colors, opacity_values, max_layers, update_callback, solution_cache,
+                                           importance_threshold, importance_dilation, importance_mask)
\ No newline at end of file
@@ -3,6 +3,8 @@
 
 from math import sqrt
 
+import numpy as np
+
 from lib.rustPaletteData import rust_palette
 
 
@@ -27,3 +29,22 @@ def closest_color(rgb):
         color_diff = sqrt(abs(r - cr)**2 + abs(g - cg)**2 + abs(b - cb)**2)
         color_diffs.append((color_diff, color))
     return min(color_diffs)[1]
+
+
+def rgb_to_lab(rgb):
+    """ Convert an array of sRGB colors (..., 3) in the 0-255 range to CIELAB (D65) """
+    c = np.asarray(rgb, dtype=np.float64) / 255.0
+    c = np.where(c > 0.04045, ((c + 0.055) / 1.055) ** 2.4, c / 12.92)
+    xyz = c @ np.array([[0.4124564, 0.2126729, 0.0193339],
+                        [0.3575761, 0.7151522, 0.1191920],
+                        [0.1804375, 0.0721750, 0.9503041]])
+    xyz /= np.array([0.95047, 1.0, 1.08883])
+    f = np.where(xyz > 0.008856, np.cbrt(xyz), (7.787 * xyz) + (16 / 116))
+    return np.stack((116 * f[..., 1] - 16,
+                     500 * (f[..., 0] - f[..., 1]),
+                     200 * (f[..., 1] - f[..., 2])), axis=-1)
+
+
+def delta_e(lab1, lab2):
+    """ CIE76 color difference between two arrays of CIELAB colors """
+    return np.sqrt(np.sum((np.asarray(lab1) - np.asarray(lab2)) ** 2, axis=-1))
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Painting control area detection for Rust Painter.
+Finds the control area template on a screenshot with multi-scale template
+matching: every scale is matched on a small downscaled screenshot first, only the
+best candidates are refined on a larger one around their coarse position, and the
+last found scale and position are checked before anything else.
+"""
+
+from PIL import Image
+
+import cv2
+import numpy as np
+
+
+DEFAULT_TEMPLATE_PATH = "opencv_template/rust_palette_template.png"
+
+
+def to_gray_array(image):
+    """PIL image or RGB/gray numpy array to a contiguous uint8 luminance array"""
+    if isinstance(image, np.ndarray):
+        if image.ndim == 2:
+            return np.ascontiguousarray(image, dtype=np.uint8)
+        return cv2.cvtColor(np.ascontiguousarray(image, dtype=np.uint8), cv2.COLOR_RGB2GRAY)
+    return np.asarray(image.convert("L"), dtype=np.uint8)
+
+
+class ControlAreaDetector:
+    """Multi-scale template matcher with a coarse-to-fine search and a last-hit cache"""
+
+    def __init__(self, template=DEFAULT_TEMPLATE_PATH, threshold=0.8, min_scale=0.25, max_scale=2.5,
+                 scale_step=1.035, coarse_width=400, fine_width=960, candidates=2):
+        """
+        Args:
+            template: Path or PIL image of the control area template
+            threshold: Minimum TM_CCOEFF_NORMED score of a match
+            min_scale: Smallest template scale that is searched
+            max_scale: Largest template scale that is searched
+            scale_step: Factor between two scales of the coarse search
+            coarse_width: Width the screenshot is downscaled to for the coarse search
+            fine_width: Width the screenshot is downscaled to for the refinement
+            candidates: Number of coarse candidates that are refined
+        """
+        if isinstance(template, str):
+            template = Image.open(template)
+        self.template = to_gray_array(template)
+        self.threshold = threshold
+        self.coarse_width = coarse_width
+        self.fine_width = fine_width
+        self.candidates = candidates
+
+        self.scales = []
+        scale = min_scale
+        while scale <= max_scale:
+            self.scales.append(scale)
+            scale *= scale_step
+        self.scale_step = scale_step
+
+        self._scaled_templates = {}
+        self.last_scale = None
+        self.last_position = None
+        self.last_stats = {}
+
+    def remember(self, x, y, w, h):
+        """Seed the cache with a known control area (e.g. the one saved in the settings)"""
+        if w > 0 and h > 0:
+            self.last_scale = w / self.template.shape[1]
+            self.last_position = (int(x), int(y))
+
+    def _template_at(self, scale, factor):
+        """Template at scale on a screenshot downscaled by factor, resized once from the original"""
+        key = (round(scale, 5), round(factor, 5))
+        template = self._scaled_templates.get(key)
+        if template is None:
+            th, tw = self.template.shape
+            size = (max(1, int(round(tw * scale * factor))), max(1, int(round(th * scale * factor))))
+            interpolation = cv2.INTER_AREA if scale * factor < 1 else cv2.INTER_LINEAR
+            template = cv2.resize(self.template, size, interpolation=interpolation)
+            self._scaled_templates[key] = template
+        return template
+
+    @staticmethod
+    def _downscale(screen, factor):
+        """Screenshot downscaled by factor (the screenshot itself for factor 1)"""
+        if factor >= 1:
+            return screen
+        sh, sw = screen.shape
+        return cv2.resize(screen, (max(1, int(sw * factor)), max(1, int(sh * factor))),
+                          interpolation=cv2.INTER_AREA)
+
+    def _match_window(self, screen, template, x, y, margin):
+        """
+        Best match of template inside a window around (x, y).
+
+        Returns:
+            tuple: (score, x, y), score is -1 if the template does not fit
+        """
+        th, tw = template.shape
+        sh, sw = screen.shape
+        x0, y0 = max(0, x - margin), max(0, y - margin)
+        x1, y1 = min(sw, x + tw + margin), min(sh, y + th + margin)
+        if x1 - x0 < tw or y1 - y0 < th:
+            return -1.0, x, y
+        result = cv2.matchTemplate(screen[y0:y1, x0:x1], template, cv2.TM_CCOEFF_NORMED)
+        _, score, _, location = cv2.minMaxLoc(result)
+        return score, x0 + location[0], y0 + location[1]
+
+    def _refine(self, fine_screen, factor, scale, x, y, margin, exponents):
+        """
+        Search scales scale * scale_step ** exponent around (x, y) of the fine screenshot,
+        then halve the scale step around the best one.
+
+        Returns:
+            tuple: (score, x, y, scale) with x, y on the fine screenshot
+        """
+        best = (-1.0, x, y, scale)
+        for step in (1.0, 0.25):
+            center = best[3] if best[0] > -1 else scale
+            for exponent in (exponents if step == 1.0 else (-1, 1)):
+                s = center * self.scale_step ** (exponent * step)
+                template = self._template_at(s, factor)
+                score, mx, my = self._match_window(fine_screen, template, x, y, margin)
+                self.last_stats['refined'] += 1
+                if score > best[0]:
+                    best = (score, mx, my, s)
+        return best
+
+    def detect(self, screenshot):
+        """
+        Find the control area on a screenshot.
+
+        Args:
+            screenshot: PIL image or numpy array of the screen
+
+        Returns:
+            tuple: (x, y, width, height) of the control area, or False if it was not found
+        """
+        screen = to_gray_array(screenshot)
+        sh, sw = screen.shape
+        self.last_stats = {'cached_hit': False, 'coarse_matches': 0, 'refined': 0}
+
+        fine_factor = min(1.0, self.fine_width / sw)
+        fine_screen = self._downscale(screen, fine_factor)
+
+        # 1. Check the last found scale and position first
+        if self.last_scale is not None:
+            x, y = self.last_position
+            score, mx, my, scale = self._refine(
+                fine_screen, fine_factor, self.last_scale,
+                int(x * fine_factor), int(y * fine_factor), margin=4, exponents=(0,)
+            )
+            if score >= self.threshold:
+                self.last_stats['cached_hit'] = True
+                return self._found(mx / fine_factor, my / fine_factor, scale)
+
+        # 2. Coarse search of every scale on a small screenshot
+        coarse_factor = min(fine_factor, self.coarse_width / sw)
+        coarse_screen = self._downscale(screen, coarse_factor)
+        ch, cw = coarse_screen.shape
+
+        coarse_hits = []
+        for scale in self.scales:
+            template = self._template_at(scale, coarse_factor)
+            th, tw = template.shape
+            if tw < 8 or th < 8:
+                continue
+            if tw > cw or th > ch:
+                break
+            result = cv2.matchTemplate(coarse_screen, template, cv2.TM_CCOEFF_NORMED)
+            _, score, _, location = cv2.minMaxLoc(result)
+            coarse_hits.append((score, scale, location))
+            self.last_stats['coarse_matches'] += 1
+
+        # 3. Refine the best candidates on the fine screenshot, around the coarse position only
+        coarse_hits.sort(key=lambda hit: hit[0], reverse=True)
+        ratio = fine_factor / coarse_factor
+        margin = int(2 * ratio) + 2
+        best = None
+        for _, scale, (cx, cy) in coarse_hits[:self.candidates]:
+            refined = self._refine(
+                fine_screen, fine_factor, scale, int(cx * ratio), int(cy * ratio), margin,
+                exponents=(-0.5, 0, 0.5)
+            )
+            if best is None or refined[0] > best[0]:
+                best = refined
+
+        if best is None or best[0] < self.threshold:
+            return False
+        score, mx, my, scale = best
+        return self._found(mx / fine_factor, my / fine_factor, scale)
+
+    def _found(self, x, y, scale):
+        """Remember and return a found control area in full resolution coordinates"""
+        th, tw = self.template.shape
+        x, y = int(round(x)), int(round(y))
+        self.last_scale = scale
+        self.last_position = (x, y)
+        return x, y, int(round(tw * scale)), int(round(th * scale))
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Image loading for Rust Painter.
+Downloads images with a timeout and a size cap into a bounded buffer, keeps an
+on-disk HTTP cache revalidated with ETag/Last-Modified and decodes images close
+to the resolution they are needed at.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+
+import email.utils
+import hashlib
+import json
+import io
+import math
+import os
+import re
+import time
+
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".rustdavinci", "url_cache")
+DEFAULT_TIMEOUT = 15                    # Seconds to wait for the server
+MAX_DOWNLOAD_BYTES = 50 * 1024 * 1024   # Largest accepted download
+MAX_IMAGE_PIXELS = 100_000_000          # Decompression bomb guard, checked before decoding
+CHUNK_SIZE = 64 * 1024
+
+USER_AGENT = "Mozilla/5.0 (Windows; U; Windows NT 5.1; en-US; rv:1.9.0.7) Gecko/2009021910 Firefox/3.0.7"
+
+# Downloads run here so the GUI thread only polls for the result
+_executor = ThreadPoolExecutor(max_workers=2)
+
+
+class ImageLoadError(Exception):
+    """Raised when an image can not be downloaded or is refused by a limit"""
+
+
+def _cache_paths(cache_dir, url):
+    """Body and metadata file of the cache entry for url"""
+    key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+    return os.path.join(cache_dir, key + ".body"), os.path.join(cache_dir, key + ".json")
+
+
+def _read_cache(cache_dir, url):
+    """Return (body, metadata) of a cached url or (None, None)"""
+    if not cache_dir:
+        return None, None
+    body_path, meta_path = _cache_paths(cache_dir, url)
+    try:
+        with open(meta_path, "r") as f:
+            meta = json.load(f)
+        with open(body_path, "rb") as f:
+            return f.read(), meta
+    except (OSError, ValueError):
+        return None, None
+
+
+def _write_cache(cache_dir, url, body, meta):
+    """Store a downloaded body with its validators, failures only cost the cache"""
+    body_path, meta_path = _cache_paths(cache_dir, url)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(body_path, "wb") as f:
+            f.write(body)
+        with open(meta_path, "w") as f:
+            json.dump(meta, f)
+    except OSError:
+        pass
+
+
+def _freshness_lifetime(headers):
+    """Seconds a response may be reused without revalidation (Cache-Control max-age / Expires)"""
+    cache_control = headers.get("Cache-Control", "") or ""
+    if "no-store" in cache_control or "no-cache" in cache_control:
+        return 0
+    match = re.search(r"max-age=(\d+)", cache_control)
+    if match:
+        return int(match.group(1))
+    expires = headers.get("Expires")
+    if expires:
+        try:
+            return max(0, int(email.utils.parsedate_to_datetime(expires).timestamp() - time.time()))
+        except (TypeError, ValueError):
+            return 0
+    return 0
+
+
+def _read_limited(response, max_bytes):
+    """Stream a response body into a buffer, refusing bodies larger than max_bytes"""
+    length = response.headers.get("Content-Length")
+    if length is not None and length.isdigit() and int(length) > max_bytes:
+        raise ImageLoadError(f"Image is too large to download ({int(length):,} bytes, limit {max_bytes:,})")
+
+    buffer = bytearray()
+    while True:
+        chunk = response.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        buffer.extend(chunk)
+        if len(buffer) > max_bytes:
+            raise ImageLoadError(f"Image is too large to download (limit {max_bytes:,} bytes)")
+    return bytes(buffer)
+
+
+def fetch_url(url, cache_dir=DEFAULT_CACHE_DIR, timeout=DEFAULT_TIMEOUT, max_bytes=MAX_DOWNLOAD_BYTES):
+    """
+    Download url, answering from the on-disk cache when the server allows it.
+
+    Args:
+        url: Address of the image
+        cache_dir: Directory of the HTTP cache, None disables caching
+        timeout: Seconds to wait for the server
+        max_bytes: Largest body that is accepted
+
+    Returns:
+        tuple: (body bytes, source) where source is "network", "cache" (fresh) or "revalidated" (304)
+    """
+    # The network stack is only loaded when an image is downloaded, see lib/lazy_import.py
+    import urllib.error
+    import urllib.request
+
+    cached_body, meta = _read_cache(cache_dir, url)
+    if cached_body is not None and meta.get("expires", 0) > time.time():
+        return cached_body, "cache"
+
+    headers = {"User-Agent": USER_AGENT}
+    if cached_body is not None:
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+    request = urllib.request.Request(url, None, headers)
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            body = _read_limited(response, max_bytes)
+            response_headers = response.headers
+    except urllib.error.HTTPError as e:
+        if e.code == 304 and cached_body is not None:
+            meta["expires"] = time.time() + _freshness_lifetime(e.headers)
+            _write_cache(cache_dir, url, cached_body, meta)
+            return cached_body, "revalidated"
+        raise ImageLoadError(f"Server answered {e.code} {e.reason}")
+    except urllib.error.URLError as e:
+        raise ImageLoadError(f"Could not reach the server: {e.reason}")
+    except TimeoutError:
+        raise ImageLoadError(f"Server did not answer within {timeout} seconds")
+
+    if cache_dir:
+        meta = {
+            "url": url,
+            "etag": response_headers.get("ETag"),
+            "last_modified": response_headers.get("Last-Modified"),
+            "expires": time.time() + _freshness_lifetime(response_headers),
+        }
+        if meta["etag"] or meta["last_modified"] or meta["expires"] > time.time():
+            _write_cache(cache_dir, url, body, meta)
+    return body, "network"
+
+
+def open_image(source, target_size=None, max_pixels=MAX_IMAGE_PIXELS):
+    """
+    Open and decode an image, decoding close to target_size when it is much larger.
+
+    Args:
+        source: File path, file object or bytes
+        target_size: (width, height) box the image will be fitted into, None decodes at full size
+        max_pixels: Images with more pixels are refused before they are decoded
+
+    Returns:
+        PIL.Image: The decoded image, never smaller than the size it gets when fitted into
+                   target_size. image.info["source_size"] holds the size before decoding.
+    """
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    image = Image.open(source)
+
+    width, height = image.size
+    if width * height > max_pixels:
+        raise ImageLoadError(f"Image has too many pixels ({width}x{height}, limit {max_pixels:,})")
+    source_size = (width, height)
+
+    if target_size is not None:
+        target_w, target_h = max(1, int(target_size[0])), max(1, int(target_size[1]))
+        scale = min(target_w / width, target_h / height, 1.0)
+        fitted_size = (max(1, math.ceil(width * scale)), max(1, math.ceil(height * scale)))
+
+        # JPEG decodes directly at 1/2, 1/4 or 1/8 scale, never below the requested size
+        if image.format == "JPEG":
+            image.draft(image.mode, fitted_size)
+        image.load()
+
+        # Integer box reduction for the remaining factor, the final resize is done by the caller
+        factor = int(max(image.width / target_w, image.height / target_h))
+        if factor >= 2:
+            if image.mode not in ("L", "LA", "RGB", "RGBA"):
+                image = image.convert("RGBA")
+            image = image.reduce(factor)
+    else:
+        image.load()
+    image.info["source_size"] = source_size
+    return image
+
+
+def has_transparency(image):
+    """True if the image has an alpha channel or a transparent palette entry"""
+    return "A" in image.getbands() or "transparency" in image.info
+
+
+def load_image_from_url(url, target_size=None, cache_dir=DEFAULT_CACHE_DIR, timeout=DEFAULT_TIMEOUT,
+                        max_bytes=MAX_DOWNLOAD_BYTES, max_pixels=MAX_IMAGE_PIXELS):
+    """
+    Download and decode an image.
+
+    Returns:
+        tuple: (PIL.Image, source) see fetch_url for source
+    """
+    body, source = fetch_url(url, cache_dir, timeout, max_bytes)
+    return open_image(body, target_size, max_pixels), source
+
+
+def load_image_from_url_async(url, **kwargs):
+    """
+    Download and decode an image in a worker thread.
+
+    Returns:
+        concurrent.futures.Future: Resolves to the result of load_image_from_url
+    """
+    return _executor.submit(load_image_from_url, url, **kwargs)
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Deferred module imports for Rust Painter.
+Modules that are slow to import (pyautogui, OpenCV, numba, ...) are only loaded
+when the feature that needs them runs, which keeps the application startup fast.
+"""
+
+import importlib
+
+
+class LazyModule:
+    """Proxy that imports the wrapped module on first attribute access"""
+
+    def __init__(self, name):
+        object.__setattr__(self, "_name", name)
+        object.__setattr__(self, "_module", None)
+
+    def _load(self):
+        module = object.__getattribute__(self, "_module")
+        if module is None:
+            module = importlib.import_module(object.__getattribute__(self, "_name"))
+            object.__setattr__(self, "_module", module)
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._load(), attr, value)
+
+    def __repr__(self):
+        state = "loaded" if object.__getattribute__(self, "_module") is not None else "not loaded"
+        return f"<LazyModule {object.__getattribute__(self, '_name')} ({state})>"
+
+
+def lazy_import(name):
+    """
+    Return a proxy for a module that is imported on first use.
+    
+    Args:
+        name: Full module name, e.g. "pyautogui"
+        
+    Returns:
+        LazyModule: Proxy forwarding attribute access to the module
+    """
+    return LazyModule(name)
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Memory accounting for Rust Painter.
+Sums the pixel buffers held by the load/convert pipeline per stage. Objects that
+are shared between stages (the same image or a numpy view of the same buffer)
+are counted once.
+"""
+
+import numpy as np
+
+
+# Bytes per band of PIL image modes that do not use 8 bit bands
+_MODE_BAND_BYTES = {"I": 4, "F": 4, "I;16": 2, "I;16B": 2, "I;16L": 2}
+
+
+def buffer_nbytes(obj):
+    """
+    Size of the pixel buffer of a PIL image or numpy array.
+    
+    Args:
+        obj: PIL.Image, numpy array or None
+        
+    Returns:
+        int: Bytes held by the pixel data (0 for None and unknown objects)
+    """
+    if obj is None:
+        return 0
+    if isinstance(obj, np.ndarray):
+        return int(obj.nbytes)
+    if hasattr(obj, "getbands") and hasattr(obj, "size"):
+        width, height = obj.size
+        if obj.mode == "1":
+            return (width + 7) // 8 * height
+        return width * height * len(obj.getbands()) * _MODE_BAND_BYTES.get(obj.mode, 1)
+    return 0
+
+
+def _buffer_owner(obj):
+    """The object that owns the memory of obj (the base array of numpy views)"""
+    if isinstance(obj, np.ndarray):
+        while isinstance(obj.base, np.ndarray):
+            obj = obj.base
+    return obj
+
+
+class MemoryReport:
+    """Collects the memory held by named pipeline buffers after every stage"""
+
+    def __init__(self):
+        self.stages = []
+
+    def snapshot(self, stage, buffers):
+        """
+        Record the buffers alive after a stage.
+        
+        Args:
+            stage: Name of the pipeline stage, e.g. "load" or "convert"
+            buffers: Dictionary {name: PIL.Image / numpy array / None}
+            
+        Returns:
+            dict: {'stage', 'total' (bytes), 'buffers': [(name, bytes, shared_with)]}
+        """
+        owners = {}
+        rows = []
+        total = 0
+        for name, obj in buffers.items():
+            if obj is None:
+                continue
+            owner = _buffer_owner(obj)
+            shared_with = owners.get(id(owner))
+            if shared_with is not None:
+                rows.append((name, 0, shared_with))
+                continue
+            owners[id(owner)] = name
+            nbytes = buffer_nbytes(owner)
+            total += nbytes
+            rows.append((name, nbytes, None))
+
+        entry = {'stage': stage, 'total': total, 'buffers': rows}
+        self.stages.append(entry)
+        return entry
+
+    @staticmethod
+    def format(entry):
+        """Format a snapshot as log lines"""
+        lines = [f"Memory after {entry['stage']}: {entry['total'] / 2**20:.1f} MB in image buffers"]
+        for name, nbytes, shared_with in entry['buffers']:
+            if shared_with is not None:
+                lines.append(f"  {name}: shared with {shared_with}")
+            else:
+                lines.append(f"  {name}: {nbytes / 2**20:.1f} MB")
+        return lines
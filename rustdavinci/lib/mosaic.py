@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Mosaic painting for Rust Painter.
+One image is spread over a grid of signs of the same size. The whole image is
+solved once, so every sign uses the same color solutions and the seams between
+signs match; the layered colors map is then split per sign and the signs are
+planned in parallel worker processes and painted one after the other.
+"""
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+
+import os
+
+from PIL import Image
+
+from lib.painting_plan import count_color_keys, plan_painting_lines, smooth_layer_runs
+
+
+@dataclass(frozen=True)
+class MosaicLayout:
+    """Grid of signs, all sign_width x sign_height canvas pixels"""
+
+    columns: int
+    rows: int
+    sign_width: int
+    sign_height: int
+    gap: int = 0    # Image pixels hidden behind the frame between two signs
+
+    @property
+    def size(self):
+        """(width, height) of the whole mosaic image"""
+        return (
+            self.columns * self.sign_width + (self.columns - 1) * self.gap,
+            self.rows * self.sign_height + (self.rows - 1) * self.gap,
+        )
+
+    @property
+    def sign_count(self):
+        return self.columns * self.rows
+
+    def signs(self):
+        """
+        Returns:
+            list: (row, column, x0, y0, x1, y1) of every sign on the mosaic image,
+                  row by row from the top left sign
+        """
+        signs = []
+        for row in range(self.rows):
+            for column in range(self.columns):
+                x0 = column * (self.sign_width + self.gap)
+                y0 = row * (self.sign_height + self.gap)
+                signs.append((row, column, x0, y0, x0 + self.sign_width, y0 + self.sign_height))
+        return signs
+
+
+@dataclass
+class MosaicSign:
+    """Plan of one sign of the mosaic"""
+
+    row: int
+    column: int
+    plan: dict
+    smoothing: dict    # Report of smooth_layer_runs, None if smoothing was off
+
+    @property
+    def name(self):
+        return f"row {self.row + 1}, column {self.column + 1}"
+
+
+def fit_image(image, layout, background_color):
+    """
+    Scale an image to fit the mosaic, centered on the background color like convert_img
+    centers an image on the canvas.
+
+    Args:
+        image: PIL Image object
+        layout: MosaicLayout
+        background_color: RGB tuple of background color, also used for transparent pixels
+
+    Returns:
+        PIL Image: RGB image of layout.size
+    """
+    width, height = layout.size
+    scale = min(width / image.width, height / image.height)
+    size = (max(1, int(image.width * scale)), max(1, int(image.height * scale)))
+    resized = image.resize(size, Image.LANCZOS)
+
+    mosaic = Image.new("RGB", (width, height), tuple(background_color))
+    position = ((width - size[0]) // 2, (height - size[1]) // 2)
+    if resized.mode == "RGBA":
+        mosaic.paste(resized, position, mask=resized.split()[3])
+    else:
+        mosaic.paste(resized.convert("RGB"), position)
+    return mosaic
+
+
+def split_layers(layered_colors, layout):
+    """
+    Cut the layered colors map of the mosaic image into one map per sign.
+
+    Args:
+        layered_colors: Layered colors map of the mosaic image (dict or tiled_processing.TiledLayers)
+        layout: MosaicLayout
+
+    Returns:
+        list: {(x, y): layers} per sign with coordinates relative to the sign, in layout.signs() order
+    """
+    signs = layout.signs()
+    if hasattr(layered_colors, 'read'):
+        # TiledLayers reads every sign area straight from its layer array
+        return [layered_colors.read(x0, y0, x1, y1) for _, _, x0, y0, x1, y1 in signs]
+
+    maps = [{} for _ in signs]
+    pitch_x = layout.sign_width + layout.gap
+    pitch_y = layout.sign_height + layout.gap
+    for (x, y), layers in layered_colors.items():
+        column, sign_x = divmod(x, pitch_x)
+        row, sign_y = divmod(y, pitch_y)
+        if sign_x < layout.sign_width and sign_y < layout.sign_height:  # Pixels in a gap are not painted
+            maps[row * layout.columns + column][(sign_x, sign_y)] = layers
+    return maps
+
+
+# Needs to be at module level for multiprocessing to work
+def plan_sign(sign_data):
+    """
+    Smooth and plan the layers of one sign.
+
+    Args:
+        sign_data: Tuple (index, layered colors, width, height, background_color, palette_colors,
+                   opacity_values, smoothing_delta_e, min_line_width, use_diagonal_lines,
+                   painting_opacity_values, brush_size, estimator)
+
+    Returns:
+        tuple: (index, plan, smoothing report or None)
+    """
+    (index, layered_colors, width, height, background_color, palette_colors, opacity_values,
+     smoothing_delta_e, min_line_width, use_diagonal_lines, painting_opacity_values, brush_size, estimator) = sign_data
+    report = None
+    if smoothing_delta_e > 0 and layered_colors:
+        layered_colors, report = smooth_layer_runs(
+            layered_colors, width, height, background_color, palette_colors, opacity_values,
+            max_delta_e=smoothing_delta_e, min_line_width=min_line_width
+        )
+    plan = plan_painting_lines(
+        layered_colors, width, height, count_color_keys(layered_colors), min_line_width, use_diagonal_lines,
+        brush_size=brush_size, opacity_values=painting_opacity_values, estimator=estimator
+    )
+    return index, plan, report
+
+
+def plan_mosaic(layered_colors, layout, background_color, palette_colors, opacity_values, smoothing_delta_e=0.0,
+                min_line_width=10, use_diagonal_lines=True, processes=None, progress_callback=None,
+                painting_opacity_values=None, brush_size=0, estimator=None):
+    """
+    Plan every sign of a mosaic, the signs are planned in parallel worker processes.
+
+    Args:
+        layered_colors: Layered colors map of the whole mosaic image (one solve for all signs)
+        layout: MosaicLayout
+        background_color: RGB tuple of background color
+        palette_colors: List of base RGB colors
+        opacity_values: List of opacity values (0-1)
+        smoothing_delta_e: Stroke smoothing of every sign, see smooth_layer_runs (0 = off)
+        min_line_width: Minimum number of pixels to consider as a line
+        use_diagonal_lines: Also search for diagonal lines
+        processes: Number of worker processes (CPU count if None, 1 plans in this process)
+        progress_callback: Called with (signs planned, sign count) after every sign
+        painting_opacity_values: Opacity levels the painting sets (opacity_values if None),
+                                 the large brush strokes only paint the full opacity level
+        brush_size: Brush size of the large brush strokes (0 = off), see plan_painting_lines
+        estimator: PaintTimeEstimator the large brush strokes are weighed with
+
+    Returns:
+        list: MosaicSign per sign, in painting order (row by row from the top left sign)
+    """
+    report = progress_callback or (lambda done, total: None)
+    signs = layout.signs()
+    tasks = [
+        (i, sign_layers, layout.sign_width, layout.sign_height, tuple(background_color), list(palette_colors),
+         list(opacity_values), smoothing_delta_e, min_line_width, use_diagonal_lines,
+         list(painting_opacity_values if painting_opacity_values is not None else opacity_values), brush_size, estimator)
+        for i, sign_layers in enumerate(split_layers(layered_colors, layout))
+    ]
+    processes = min(processes or os.cpu_count() or 1, len(tasks))
+
+    results = {}
+    if processes > 1:
+        try:
+            with ProcessPoolExecutor(max_workers=processes) as executor:
+                for future in as_completed([executor.submit(plan_sign, task) for task in tasks]):
+                    index, plan, smoothing = future.result()
+                    results[index] = (plan, smoothing)
+                    report(len(results), len(tasks))
+        except (OSError, ImportError, RuntimeError):
+            # Fall back to planning in this process if worker processes are not available
+            results = {}
+    for task in tasks:
+        if task[0] not in results:
+            index, plan, smoothing = plan_sign(task)
+            results[index] = (plan, smoothing)
+            report(len(results), len(tasks))
+
+    return [
+        MosaicSign(row, column, *results[i])
+        for i, (row, column, _, _, _, _) in enumerate(signs)
+    ]
@@ -0,0 +1,605 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Painting plan module for Rust Painter.
+This module holds the steps between the color solver and the painting itself,
+working on the layered colors map: {(x, y): [(color_idx, opacity_idx), ...]}.
+"""
+
+import numpy as np
+
+from lib.color_functions import rgb_to_lab, delta_e
+
+
+def layered_map_to_stack_grid(layered_colors, width, height):
+    """
+    Convert a layered colors map into a grid of layer stack ids.
+    
+    Args:
+        layered_colors: Dictionary mapping pixel coordinates to layers list
+        width: Width of the canvas
+        height: Height of the canvas
+        
+    Returns:
+        tuple: ((H, W) int32 grid of stack ids, list of layer stacks as tuples),
+               stack id 0 is the empty stack (pixel is left as background)
+    """
+    stacks = [()]
+    stack_ids = {(): 0}
+    grid = np.zeros((height, width), dtype=np.int32)
+    for (x, y), layers in layered_colors.items():
+        stack = tuple(layers)
+        stack_id = stack_ids.get(stack)
+        if stack_id is None:
+            stack_id = stack_ids[stack] = len(stacks)
+            stacks.append(stack)
+        grid[y, x] = stack_id
+    return grid, stacks
+
+
+def stack_colors(stacks, background_color, palette_colors, opacity_values):
+    """Simulated RGB color of every layer stack painted on the background"""
+    from lib.color_blending import alpha_blend
+
+    colors = []
+    for stack in stacks:
+        color = background_color
+        for color_idx, opacity_idx in stack:
+            color = alpha_blend(color, palette_colors[color_idx], opacity_values[opacity_idx])
+        colors.append(color)
+    return np.array(colors, dtype=np.float64)
+
+
+def _row_stroke_count(row, stack_layer_counts, min_line_width):
+    """Strokes needed to paint one row: one per layer for a line, one per layer and pixel otherwise"""
+    boundaries = np.flatnonzero(np.diff(row)) + 1
+    starts = np.concatenate(([0], boundaries))
+    lengths = np.diff(np.concatenate((starts, [len(row)])))
+    layers = stack_layer_counts[row[starts]]
+    return int(np.sum(np.where(lengths >= min_line_width, layers, layers * lengths)))
+
+
+def smooth_layer_runs(layered_colors, width, height, background_color, palette_colors, opacity_values,
+                      max_delta_e=2.3, min_line_width=10):
+    """
+    Merge short horizontal runs into a neighboring run when their painted colors are
+    within max_delta_e of each other. A single pixel of a slightly different color no
+    longer splits a long line into two lines and a point.
+    
+    Args:
+        layered_colors: Dictionary mapping pixel coordinates to layers list
+        width: Width of the canvas
+        height: Height of the canvas
+        background_color: RGB tuple of background color
+        palette_colors: List of base RGB colors
+        opacity_values: List of opacity values (0-1)
+        max_delta_e: Largest CIE76 color difference a merged pixel may change by
+        min_line_width: Runs shorter than this are painted pixel by pixel and are merge candidates
+        
+    Returns:
+        tuple: (new layered colors map, report dict with 'strokes_before', 'strokes_after',
+                'pixels_changed', 'mean_delta_e' and 'max_delta_e')
+    """
+    grid, stacks = layered_map_to_stack_grid(layered_colors, width, height)
+    lab = rgb_to_lab(stack_colors(stacks, background_color, palette_colors, opacity_values))
+    layer_counts = np.array([len(stack) for stack in stacks], dtype=np.int64)
+    
+    strokes_before = 0
+    strokes_after = 0
+    smoothed = grid.copy()
+    
+    for y in range(height):
+        row = grid[y]
+        strokes_before += _row_stroke_count(row, layer_counts, min_line_width)
+        
+        boundaries = np.flatnonzero(np.diff(row)) + 1
+        if len(boundaries) > 0:
+            starts = np.concatenate(([0], boundaries)).tolist()
+            ends = np.concatenate((boundaries, [width])).tolist()
+            ids = row[starts].tolist()
+            
+            # Runs as [start, end, stack id], merged greedily from left to right
+            runs = [[start, end, stack_id] for start, end, stack_id in zip(starts, ends, ids)]
+            merged = [runs[0]]
+            for i in range(1, len(runs)):
+                run = runs[i]
+                previous = merged[-1]
+                following = runs[i + 1] if i + 1 < len(runs) else None
+                
+                if run[1] - run[0] < min_line_width:
+                    # Prefer the longer neighbor that is close enough in color
+                    options = [previous] + ([following] if following else [])
+                    options.sort(key=lambda r: r[1] - r[0], reverse=True)
+                    target = None
+                    for option in options:
+                        if delta_e(lab[run[2]], lab[option[2]]) <= max_delta_e:
+                            target = option
+                            break
+                    if target is not None:
+                        run[2] = target[2]
+                
+                if run[2] == previous[2]:
+                    previous[1] = run[1]
+                else:
+                    merged.append(run)
+            
+            for start, end, stack_id in merged:
+                smoothed[y, start:end] = stack_id
+        
+        strokes_after += _row_stroke_count(smoothed[y], layer_counts, min_line_width)
+    
+    changed_y, changed_x = np.nonzero(smoothed != grid)
+    changes = delta_e(lab[grid[changed_y, changed_x]], lab[smoothed[changed_y, changed_x]])
+    
+    result = dict(layered_colors)
+    for x, y in zip(changed_x.tolist(), changed_y.tolist()):
+        stack = stacks[smoothed[y, x]]
+        if stack:
+            result[(x, y)] = list(stack)
+        else:
+            result.pop((x, y), None)
+    
+    report = {
+        'strokes_before': strokes_before,
+        'strokes_after': strokes_after,
+        'pixels_changed': int(len(changes)),
+        'mean_delta_e': float(changes.mean()) if len(changes) else 0.0,
+        'max_delta_e': float(changes.max()) if len(changes) else 0.0
+    }
+    return result, report
+
+
+def run_length_statistics(index_array, min_line_width):
+    """
+    Count horizontal runs of every color at once.
+    
+    Args:
+        index_array: (H, W) array of non-negative color indices
+        min_line_width: Runs of at least this length are painted as one line
+        
+    Returns:
+        tuple: (pixels per color, lines per color, pixels painted as single points per color),
+               each an int64 array indexed by color index
+    """
+    index_array = np.asarray(index_array)
+    flat = index_array.ravel().astype(np.int64)
+    if flat.size == 0:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, empty
+    
+    # A run starts at the first pixel of a row or where the color changes
+    starts = np.ones(index_array.shape, dtype=bool)
+    starts[:, 1:] = index_array[:, 1:] != index_array[:, :-1]
+    start_idx = np.flatnonzero(starts)
+    lengths = np.diff(np.append(start_idx, flat.size))
+    run_colors = flat[start_idx]
+    is_line = lengths >= min_line_width
+    
+    color_count = int(flat.max()) + 1
+    pixel_counts = np.bincount(flat, minlength=color_count)
+    line_counts = np.bincount(run_colors[is_line], minlength=color_count)
+    point_counts = np.bincount(
+        run_colors[~is_line], weights=lengths[~is_line], minlength=color_count
+    ).astype(np.int64)
+    return pixel_counts, line_counts, point_counts
+
+
+def count_color_keys(layered_colors):
+    """
+    Count the pixels of every (color_idx, opacity_idx) key.
+    
+    Returns:
+        dict: {(color_idx, opacity_idx): pixel count} in order of first appearance
+    """
+    if hasattr(layered_colors, 'count_keys'):
+        return layered_colors.count_keys()  # tiled_processing.TiledLayers counts on its layer array
+    color_counts = {}
+    for layers in layered_colors.values():
+        for color_key in layers:
+            color_key = tuple(color_key)
+            color_counts[color_key] = color_counts.get(color_key, 0) + 1
+    return color_counts
+
+
+def _scan_runs(lines, key, coords_by_line, processed, min_line_width, horizontal, open_start=None, open_end=None):
+    """
+    Store the runs of unprocessed pixels along one row or column that are long enough
+    to be painted as lines, marking their pixels as processed.
+    
+    Args:
+        lines: List the lines are appended to
+        key: Row (horizontal) or column index
+        coords_by_line: Sorted x (horizontal) or y positions of the color on this row/column
+        processed: Set of (x, y) pixels that are already covered by a line
+        min_line_width: Minimum run length of a line
+        horizontal: True for rows (start_x, y, end_x), False for columns (x, start_y, end_y)
+        open_start: Position a run may start at with any length (continues across a tile seam)
+        open_end: Position a run may end at with any length (continues across a tile seam)
+    """
+    run_start = previous = None
+    for position in coords_by_line + [None]:
+        if position is not None:
+            pixel = (position, key) if horizontal else (key, position)
+            if pixel in processed:
+                position = None
+        if position is not None and previous is not None and position == previous + 1:
+            previous = position
+            continue
+        if run_start is not None and (previous - run_start + 1 >= min_line_width
+                                      or run_start == open_start or previous == open_end):
+            lines.append((run_start, key, previous) if horizontal else (key, run_start, previous))
+            for i in range(run_start, previous + 1):
+                processed.add((i, key) if horizontal else (key, i))
+        run_start = previous = position
+
+
+def detect_diagonal_lines(pixels, processed, min_line_width):
+    """
+    Detect diagonal lines of one color.
+    
+    Args:
+        pixels: (x, y) positions of the color, in scan order
+        processed: Set of already processed pixels, the pixels of the found lines are added
+        min_line_width: Minimum number of pixels to consider as a line
+        
+    Returns:
+        List of diagonal lines in format [((start_x, start_y), (end_x, end_y)), ...]
+    """
+    diagonal_lines = []
+    candidates = {}  # Points per diagonal, down-right diagonals have a constant x - y, down-left ones x + y
+    
+    for x, y in pixels:
+        if (x, y) not in processed:
+            candidates.setdefault(("dr", x - y), []).append((x, y))
+            candidates.setdefault(("dl", x + y), []).append((x, y))
+    
+    for (direction, _), points in candidates.items():
+        # Only process if we have enough points to make a line
+        if len(points) < min_line_width:
+            continue
+        points.sort(key=lambda p: p[0])
+        step_y = 1 if direction == "dr" else -1
+        
+        # Find continuous segments in the sorted points
+        segments = []
+        current_segment = [points[0]]
+        for point in points[1:]:
+            prev_point = current_segment[-1]
+            if point[0] == prev_point[0] + 1 and point[1] == prev_point[1] + step_y:
+                current_segment.append(point)
+            else:
+                if len(current_segment) >= min_line_width:
+                    segments.append(current_segment)
+                current_segment = [point]
+        if len(current_segment) >= min_line_width:
+            segments.append(current_segment)
+        
+        for segment in segments:
+            diagonal_lines.append((segment[0], segment[-1]))
+            processed.update(segment)
+    
+    return diagonal_lines
+
+
+def _default_estimator():
+    """PaintTimeEstimator with the default delays and no recorded timings"""
+    from lib.time_estimator import PaintTimeEstimator
+    estimator = PaintTimeEstimator(path=None)
+    estimator.set_delays(0.02, 0.03, 0.18)  # Default click, line and control area delays
+    return estimator
+
+
+def plan_brush_strokes(layered_colors, width, height, opacity_values, brush_size, min_line_width=10, estimator=None,
+                       bounds=None):
+    """
+    Find the large areas of one color that are faster to paint with a large brush.
+    
+    Only pixels with a single layer at full opacity are used, the strokes of a large
+    brush overlap and overlapping only gives the planned color when the layer covers
+    what is below it. A stroke is only placed where the whole brush stays inside the
+    area, so nothing around it is painted over, and it covers brush_size rows above
+    and below its own row. The edges of an area are left to the normal lines and
+    points. A stroke is kept when it saves painting time, the strokes of a color when
+    they save more than selecting the color once more, and all strokes when they save
+    more than changing the brush size there and back.
+    
+    Args:
+        layered_colors: Dictionary mapping pixel coordinates to layers list
+        width: Width of the canvas
+        height: Height of the canvas
+        opacity_values: List of opacity values (0-1)
+        brush_size: Brush size of the strokes, covering 1 + 2 * brush_size pixels across
+                    (the size box value, see choose_painting_controls)
+        min_line_width: Minimum number of pixels the normal strokes paint as a line
+        estimator: time_estimator.PaintTimeEstimator the time saved is estimated with
+                   (default delays if None)
+        bounds: (x0, y0, x1, y1) part of the map the strokes are placed in (the whole map if None),
+                the map around it only tells how far the brush may reach, see plan_tiled
+        
+    Returns:
+        tuple: ({(color_idx, opacity_idx): [(start_x, y, end_x), ...]} brush strokes,
+                (H, W) bool array of the pixels the strokes cover)
+    """
+    covered = np.zeros((height, width), dtype=bool)
+    brush_lines = {}
+    band = 1 + 2 * brush_size
+    if brush_size <= 0 or not layered_colors or width < band or height < band:
+        return brush_lines, covered
+    if estimator is None:
+        estimator = _default_estimator()
+    click_time = estimator.operation_time("click")
+    control_time = estimator.operation_time("control_change")
+
+    def normal_time(length):
+        """Time the normal strokes take for the band of one brush stroke, row or column wise"""
+        rows = band * (estimator.operation_time("h_line", length) if length >= min_line_width else length * click_time)
+        columns = length * (estimator.operation_time("v_line", band) if band >= min_line_width else band * click_time)
+        return min(rows, columns)
+
+    grid, stacks = layered_map_to_stack_grid(layered_colors, width, height)
+    counts = np.bincount(grid.ravel(), minlength=len(stacks))
+    total_saved = 0.0
+    for stack_id, stack in enumerate(stacks):
+        if len(stack) != 1 or counts[stack_id] < band * band:
+            continue
+        color_key = tuple(stack[0])
+        if opacity_values[color_key[1]] < 1.0:
+            continue
+
+        # Stroke positions: pixels with the whole band x band square around them in the area
+        mask = grid == stack_id
+        integral = np.zeros((height + 1, width + 1), dtype=np.int32)
+        integral[1:, 1:] = mask.cumsum(axis=0).cumsum(axis=1)
+        centers = np.zeros_like(mask)
+        centers[brush_size:height - brush_size, brush_size:width - brush_size] = (
+            integral[band:, band:] - integral[:-band, band:] - integral[band:, :-band] + integral[:-band, :-band]
+        ) == band * band
+        if bounds is not None:
+            x0, y0, x1, y1 = bounds
+            centers[:y0] = False
+            centers[y1:] = False
+            centers[:, :x0] = False
+            centers[:, x1:] = False
+        if not centers.any():
+            continue
+
+        lines = []
+        saved = 0.0
+        for y in range(brush_size, height - brush_size):
+            row = centers[y]
+            if not row.any():
+                continue
+            # A stroke starts where the rows above are not covered yet, or at the last row
+            # of stroke positions when the rows below are not covered yet
+            start = row & ~covered[y - brush_size]
+            start |= row & ~centers[y + 1] & ~covered[y + brush_size]
+            edges = np.flatnonzero(np.diff(np.concatenate(([0], start.view(np.int8), [0]))))
+            for start_x, end_x in zip(edges[::2].tolist(), (edges[1::2] - 1).tolist()):
+                length = end_x - start_x + 1
+                area = covered[y - brush_size:y + brush_size + 1, start_x:end_x + 1]
+                new_pixels = area.size - np.count_nonzero(area)
+                gain = normal_time(length) * new_pixels / area.size - estimator.operation_time("brush_line", length)
+                if gain <= 0:
+                    continue
+                lines.append((start_x, y, end_x))
+                area[:] = True
+                saved += gain
+
+        if lines and saved > control_time:
+            brush_lines[color_key] = lines
+            total_saved += saved - control_time
+        else:
+            covered &= ~mask
+
+    # Changing the brush size to the large brush and back
+    if total_saved <= 2 * control_time:
+        return {}, np.zeros((height, width), dtype=bool)
+    return brush_lines, covered
+
+
+def plan_painting_lines(layered_colors, width, height, color_counts=None, min_line_width=10,
+                        use_diagonal_lines=True, progress_callback=None, seams=(), brush_size=0,
+                        opacity_values=None, estimator=None, brush_strokes=None):
+    """
+    Split the layered colors map into horizontal, vertical and diagonal lines and
+    single points per color/opacity combination. Runs without a GUI.
+    
+    Lines are searched in this order: large brush strokes (if brush_size is set, see
+    plan_brush_strokes), horizontal lines row by row, vertical lines column by column,
+    then diagonal lines per color. A pixel that is covered by a line is not used by
+    any later line or point. The large brush strokes also cut the normal lines around
+    them short, so a plan with them is only kept when its estimated painting time is
+    below the one of the plan without them.
+    
+    Args:
+        layered_colors: Dictionary mapping pixel coordinates to layers list
+        width: Width of the canvas
+        height: Height of the canvas
+        color_counts: {(color_idx, opacity_idx): pixel count}, see count_color_keys (computed if None)
+        min_line_width: Minimum number of pixels to consider as a line
+        use_diagonal_lines: Also search for diagonal lines
+        progress_callback: Called with (percent, status text) while planning
+        seams: Sides of the canvas ('left', 'top', 'right', 'bottom') where it continues in another
+               tile, runs touching them are kept at any length so they can be stitched together
+               (see tiled_processing.stitch_plan)
+        brush_size: Brush size of the large brush strokes (0 = off)
+        opacity_values: List of opacity values (0-1), needed for the large brush strokes
+        estimator: PaintTimeEstimator the large brush strokes are weighed with, see plan_brush_strokes
+        brush_strokes: Result of plan_brush_strokes for this map found by the caller, e.g. with the
+                       pixels around a tile (see plan_tiled), found here if None
+        
+    Returns:
+        dict: {(color_idx, opacity_idx): {'h_lines': [(start_x, y, end_x), ...],
+                                          'v_lines': [(x, start_y, end_y), ...],
+                                          'd_lines': [((start_x, start_y), (end_x, end_y)), ...],
+                                          'points': [(x, y), ...]}},
+              keys with large brush strokes also have 'brush_lines': [(start_x, y, end_x), ...]
+              and 'brush_size'
+    """
+    if color_counts is None:
+        color_counts = count_color_keys(layered_colors)
+    report = progress_callback or (lambda percent, status: None)
+    
+    precomputed_lines = {
+        color_key: {'h_lines': [], 'v_lines': [], 'd_lines': [], 'points': []}
+        for color_key in color_counts
+    }
+    line_keys = [color_key for color_key, count in color_counts.items() if count >= min_line_width]
+    line_key_set = set(line_keys)
+    
+    # Pixels per color (scan order) and per row/column, built in one pass over the map
+    report(0, "Building pixel grid...")
+    color_pixels = {color_key: [] for color_key in color_counts}
+    rows = {}
+    columns = {}
+    for (x, y), layers in layered_colors.items():
+        keys = [tuple(color_key) for color_key in layers]
+        if len(keys) > 1:
+            keys = set(keys)  # The same layer twice is still painted once per line/point
+        for color_key in keys:
+            color_pixels[color_key].append((x, y))
+            if color_key in line_key_set:
+                rows.setdefault(y, {}).setdefault(color_key, []).append(x)
+                columns.setdefault(x, {}).setdefault(color_key, []).append(y)
+    
+    processed = set()  # Pixels covered by a line, over all colors
+    brush_lines = {}
+    if brush_size > 0 and (opacity_values is not None or brush_strokes is not None):
+        report(10, "Finding large areas...")
+        if estimator is None:
+            estimator = _default_estimator()
+        if brush_strokes is None:
+            brush_strokes = plan_brush_strokes(
+                layered_colors, width, height, opacity_values, brush_size, min_line_width, estimator
+            )
+        brush_lines, brush_covered = brush_strokes
+        for color_key, lines in brush_lines.items():
+            precomputed_lines[color_key]['brush_lines'] = lines
+            precomputed_lines[color_key]['brush_size'] = brush_size
+        ys, xs = np.nonzero(brush_covered)
+        processed.update(zip(xs.tolist(), ys.tolist()))
+    open_left = 0 if 'left' in seams else None
+    open_right = width - 1 if 'right' in seams else None
+    open_top = 0 if 'top' in seams else None
+    open_bottom = height - 1 if 'bottom' in seams else None
+    
+    # Horizontal lines, row by row - 20% to 45% of the progress
+    report(20, "Finding horizontal lines...")
+    for y in range(height):
+        row = rows.get(y)
+        if row:
+            for color_key in line_keys:
+                xs = row.get(color_key)
+                if xs:
+                    xs.sort()
+                    _scan_runs(precomputed_lines[color_key]['h_lines'], y, xs, processed, min_line_width, True,
+                               open_left, open_right)
+        if y % 10 == 0:
+            report(20 + int(y / height * 25), f"Finding horizontal lines: {int(y / height * 100)}%")
+    
+    # Vertical lines, column by column - 45% to 70%
+    report(45, "Finding vertical lines...")
+    for x in range(width):
+        column = columns.get(x)
+        if column:
+            for color_key in line_keys:
+                ys = column.get(color_key)
+                if ys:
+                    ys.sort()
+                    _scan_runs(precomputed_lines[color_key]['v_lines'], x, ys, processed, min_line_width, False,
+                               open_top, open_bottom)
+        if x % 10 == 0:
+            report(45 + int(x / width * 25), f"Finding vertical lines: {int(x / width * 100)}%")
+    
+    # Diagonal lines, color by color - 70% to 90%
+    if use_diagonal_lines:
+        report(70, "Finding diagonal lines...")
+        for i, color_key in enumerate(line_keys):
+            precomputed_lines[color_key]['d_lines'] = detect_diagonal_lines(
+                color_pixels[color_key], processed, min_line_width
+            )
+            if i % 5 == 0:
+                report(70 + int(i / len(line_keys) * 20), f"Finding diagonal lines: {int(i / len(line_keys) * 100)}%")
+    
+    # Remaining points - 90% to 100%
+    report(90, "Collecting remaining points...")
+    for color_key, pixels in color_pixels.items():
+        precomputed_lines[color_key]['points'] = [pixel for pixel in pixels if pixel not in processed]
+    
+    if brush_lines:
+        from lib.time_estimator import summarize_plan
+        report(95, "Comparing with the plan without large brush strokes...")
+        plain_lines = plan_painting_lines(layered_colors, width, height, color_counts, min_line_width,
+                                          use_diagonal_lines, seams=seams)
+        if estimator.estimate(summarize_plan(plain_lines)) <= estimator.estimate(summarize_plan(precomputed_lines)):
+            precomputed_lines = plain_lines
+    
+    report(100, "Line optimization complete")
+    return precomputed_lines
+
+
+def plan_pixels(data):
+    """
+    Every pixel painted by the lines and points of one color/opacity combination.
+    
+    Args:
+        data: {'h_lines', 'v_lines', 'd_lines', 'points'} of one color key
+        
+    Returns:
+        tuple: (xs, ys) int64 arrays
+    """
+    xs, ys = [], []
+    brush_size = data.get('brush_size', 0)
+    for start_x, y, end_x in data.get('brush_lines', ()):
+        for row in range(y - brush_size, y + brush_size + 1):
+            xs.append(np.arange(start_x, end_x + 1))
+            ys.append(np.full(end_x - start_x + 1, row))
+    for start_x, y, end_x in data['h_lines']:
+        xs.append(np.arange(start_x, end_x + 1))
+        ys.append(np.full(end_x - start_x + 1, y))
+    for x, start_y, end_y in data['v_lines']:
+        xs.append(np.full(end_y - start_y + 1, x))
+        ys.append(np.arange(start_y, end_y + 1))
+    for (start_x, start_y), (end_x, end_y) in data['d_lines']:
+        steps = np.arange(abs(end_x - start_x) + 1)
+        xs.append(start_x + steps * (1 if end_x >= start_x else -1))
+        ys.append(start_y + steps * (1 if end_y >= start_y else -1))
+    if data['points']:
+        points = np.asarray(data['points'], dtype=np.int64)
+        xs.append(points[:, 0])
+        ys.append(points[:, 1])
+    if not xs:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty
+    return np.concatenate(xs).astype(np.int64), np.concatenate(ys).astype(np.int64)
+
+
+def simulate_plan(plan, width, height, background_color, palette_colors, opacity_values):
+    """
+    Simulate the canvas after painting a plan, in the order the painting uses
+    (by color index, then opacity index). Unlike simulating the layered colors map
+    this shows what is actually painted, including layers the plan does not cover.
+    
+    Args:
+        plan: Dictionary {color_key: {'h_lines', 'v_lines', 'd_lines', 'points'}}
+        width: Width of the canvas
+        height: Height of the canvas
+        background_color: RGB tuple of background color
+        palette_colors: List of base RGB colors
+        opacity_values: List of opacity values (0-1)
+        
+    Returns:
+        numpy.ndarray: (H, W, 3) uint8 RGB array
+    """
+    canvas = np.empty((height, width, 3), dtype=np.float64)
+    canvas[:, :] = background_color
+    for color_idx, opacity_idx in sorted(plan):
+        xs, ys = plan_pixels(plan[(color_idx, opacity_idx)])
+        if len(xs) == 0:
+            continue
+        opacity = opacity_values[opacity_idx]
+        color = np.asarray(palette_colors[color_idx], dtype=np.float64)
+        # Same rounding as alpha_blend (truncation to int)
+        canvas[ys, xs] = np.floor(canvas[ys, xs] * (1 - opacity) + color * opacity)
+    return canvas.astype(np.uint8)
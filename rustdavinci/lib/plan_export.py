@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Painting plan export/import for Rust Painter.
+A solved sign is stored as one indexed PNG per layer depth plus a small JSON manifest.
+Pixel value i of a layer PNG is entry i - 1 of the manifest key table, a
+(color_idx, opacity_idx) pair, and 0 means no layer. The PNG palette holds the
+palette color of every key with its opacity as alpha, so a layer opens in any image
+viewer as the strokes it paints. Importing a plan gives back the layered colors map,
+ready to be planned and painted without solving.
+"""
+
+import json
+import os
+import time
+
+import numpy as np
+from PIL import Image
+
+from lib.tiled_processing import TiledLayers
+
+
+PLAN_FORMAT = "rustdavinci-plan"
+PLAN_VERSION = 1
+
+# Largest key table an 8-bit indexed PNG holds, value 0 is the empty pixel
+MAX_PALETTE_KEYS = 255
+
+
+def encode_layers(layered_colors, width, height, opacity_count, max_layers=2):
+    """
+    Layer codes of a layered colors map, see TiledLayers.
+
+    Args:
+        layered_colors: Layered colors map (dict or TiledLayers)
+        width: Width of the canvas
+        height: Height of the canvas
+        opacity_count: Number of opacity values
+        max_layers: Maximum number of layers per pixel of a dict map
+
+    Returns:
+        numpy.ndarray: (layer depth, H, W) uint16 codes, depths without any layer are left out
+    """
+    if isinstance(layered_colors, TiledLayers):
+        codes = np.array(layered_colors.codes)
+    else:
+        layers = TiledLayers(width, height, opacity_count, max_layers)
+        try:
+            layers.write(0, 0, width, height, layered_colors)
+            codes = np.array(layers.codes)
+        finally:
+            layers.close()
+    depth = 1
+    while depth < len(codes) and codes[depth].any():
+        depth += 1
+    return codes[:depth]
+
+
+def export_plan(path, layered_colors, width, height, background_color, palette_colors, opacity_values,
+                blend_opacity_values=None):
+    """
+    Write a layered colors map as layer PNGs and a JSON manifest.
+
+    Args:
+        path: Path of the manifest, the layers are written next to it as <name>.layer<depth>.png
+        layered_colors: Layered colors map (dict or TiledLayers)
+        width: Width of the canvas
+        height: Height of the canvas
+        background_color: RGB tuple of background color the map was solved for
+        palette_colors: List of base RGB colors
+        opacity_values: List of opacity values (0-1)
+        blend_opacity_values: Opacities the layers were solved with if the blending is
+                              calibrated (see blend_calibration.py), opacity_values if None
+
+    Returns:
+        list: Paths of the written files, the manifest first
+    """
+    opacity_count = len(opacity_values)
+    codes = encode_layers(layered_colors, width, height, opacity_count)
+
+    # Key table of the codes that are used, pixel values index into it
+    used = np.unique(codes)
+    used = used[used != 0]
+    lookup = np.zeros(int(codes.max()) + 1, dtype=np.uint16)
+    lookup[used] = np.arange(1, len(used) + 1)
+    keys = [[(code - 1) // opacity_count, (code - 1) % opacity_count] for code in used.tolist()]
+
+    # 16-bit grayscale when the keys do not fit into a palette, still lossless but not colored in a viewer
+    indexed = len(keys) <= MAX_PALETTE_KEYS
+    if indexed:
+        colors = [tuple(background_color)] + [tuple(palette_colors[c]) for c, _ in keys]
+        alpha = bytes([0] + [int(round(255 * opacity_values[o])) for _, o in keys])
+        raw_palette = [channel for color in colors for channel in color]
+
+    base = os.path.splitext(path)[0]
+    paths = [path]
+    layer_files = []
+    for depth, plane in enumerate(codes, 1):
+        values = lookup[plane]
+        if indexed:
+            image = Image.fromarray(values.astype(np.uint8), mode="P")
+            image.putpalette(raw_palette)
+            extra = {"transparency": alpha}
+        else:
+            image = Image.fromarray(values, mode="I;16")
+            extra = {}
+        layer_path = f"{base}.layer{depth}.png"
+        image.save(layer_path, optimize=True, **extra)
+        layer_files.append(os.path.basename(layer_path))
+        paths.append(layer_path)
+
+    manifest = {
+        "format": PLAN_FORMAT,
+        "version": PLAN_VERSION,
+        "width": width,
+        "height": height,
+        "background_color": list(background_color),
+        "palette": [list(color) for color in palette_colors],
+        "opacity_values": list(opacity_values),
+        "blend_opacity_values": list(blend_opacity_values if blend_opacity_values is not None else opacity_values),
+        "encoding": "palette" if indexed else "gray16",
+        "keys": keys,
+        "layers": layer_files,
+        "painted_pixels": int(np.count_nonzero(codes[0])),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    with open(path, "w") as f:
+        json.dump(manifest, f, indent=1)
+    return paths
+
+
+def read_manifest(path):
+    """
+    Read and check a plan manifest.
+
+    Returns:
+        dict: The manifest
+
+    Raises:
+        ValueError: If the file is not a plan manifest this version can read
+    """
+    with open(path, "r") as f:
+        manifest = json.load(f)
+    if not isinstance(manifest, dict) or manifest.get("format") != PLAN_FORMAT:
+        raise ValueError("Not a painting plan manifest")
+    if manifest.get("version", 0) > PLAN_VERSION:
+        raise ValueError(f"Painting plan version {manifest.get('version')} is not supported")
+    return manifest
+
+
+def import_plan(path, directory=None):
+    """
+    Read a plan written by export_plan.
+
+    Args:
+        path: Path of the manifest
+        directory: Directory of the memory-mapped layers (system temp directory if None)
+
+    Returns:
+        tuple: (TiledLayers of the plan, manifest dict)
+
+    Raises:
+        ValueError: If the manifest or a layer does not match the plan
+    """
+    manifest = read_manifest(path)
+    width, height = manifest["width"], manifest["height"]
+    opacity_count = len(manifest["opacity_values"])
+    keys = manifest["keys"]
+    for color_idx, opacity_idx in keys:
+        if not (0 <= color_idx < len(manifest["palette"]) and 0 <= opacity_idx < opacity_count):
+            raise ValueError(f"Invalid color/opacity key {color_idx, opacity_idx} in the plan")
+
+    # Pixel value -> layer code
+    lookup = np.zeros(len(keys) + 1, dtype=np.uint16)
+    lookup[1:] = [color_idx * opacity_count + opacity_idx + 1 for color_idx, opacity_idx in keys]
+
+    folder = os.path.dirname(os.path.abspath(path))
+    codes = np.zeros((max(1, len(manifest["layers"])), height, width), dtype=np.uint16)
+    for depth, name in enumerate(manifest["layers"]):
+        with Image.open(os.path.join(folder, name)) as image:
+            values = np.asarray(image)
+        if values.shape != (height, width):
+            raise ValueError(f"Layer {name} is {values.shape[1]}x{values.shape[0]}, the plan is {width}x{height}")
+        if values.max(initial=0) > len(keys):
+            raise ValueError(f"Layer {name} uses keys that are not in the manifest")
+        codes[depth] = lookup[values]
+
+    return TiledLayers.from_codes(codes, opacity_count, directory), manifest
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Pre-scaled preview images for Rust Painter.
+Holds a preview image at halving resolutions so it can be fitted into a
+selection area of any size with a cheap resize of the nearest larger level.
+"""
+
+from PIL import Image
+
+
+class PreviewPyramid:
+    """Preview image at full, 1/2, 1/4, ... resolution with a small cache of fitted results"""
+
+    def __init__(self, image, min_size=32, background=(50, 50, 50), cache_size=8):
+        image = image if image.mode == "RGB" else image.convert("RGB")
+        self.levels = [image]
+        while min(self.levels[-1].size) // 2 >= min_size:
+            self.levels.append(self.levels[-1].reduce(2))
+        self.background = background
+        self.cache_size = cache_size
+        self._cache = {}
+
+    def level_for(self, width, height):
+        """Smallest level that is at least width x height (the full image if none is)"""
+        for level in reversed(self.levels):
+            if level.width >= width and level.height >= height:
+                return level
+        return self.levels[0]
+
+    def fit(self, width, height):
+        """
+        The preview fitted into width x height keeping its aspect ratio, centered on
+        the background color.
+        
+        Args:
+            width: Width of the area
+            height: Height of the area
+            
+        Returns:
+            PIL.Image: RGB image of exactly width x height
+        """
+        key = (width, height)
+        if key in self._cache:
+            return self._cache[key]
+
+        orig_width, orig_height = self.levels[0].size
+        scale = min(width / orig_width, height / orig_height)
+        resize_width = max(1, int(orig_width * scale))
+        resize_height = max(1, int(orig_height * scale))
+
+        # Bilinear from the nearest larger level is close to LANCZOS from full size, at a fraction of the cost
+        level = self.level_for(resize_width, resize_height)
+        resized_img = level.resize((resize_width, resize_height), Image.BILINEAR)
+
+        centered_img = Image.new("RGB", (width, height), self.background)
+        centered_img.paste(resized_img, ((width - resize_width) // 2, (height - resize_height) // 2))
+
+        if len(self._cache) >= self.cache_size:
+            self._cache.pop(next(iter(self._cache)))
+        self._cache[key] = centered_img
+        return centered_img
@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Pipeline profiling for Rust Painter.
+Records named spans (load, solve, plan, every painting operation, ...) with their
+start time and duration, summarizes them per stage and exports them as JSON and
+as a Chrome trace (chrome://tracing, Perfetto). A cProfile or sampling profiler
+can be attached to one stage to see where the time inside it goes.
+"""
+
+from contextlib import nullcontext
+
+import cProfile
+import datetime
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+
+
+DEFAULT_PROFILE_DIR = os.path.join(os.path.expanduser("~"), ".rustdavinci", "profiles")
+
+# Profilers that can be attached to a stage
+PROFILING_HOOKS = ("none", "cprofile", "sampling")
+
+# Lines of the cProfile/sampling report that are kept per stage
+REPORT_LINES = 30
+
+_NULL_SPAN = nullcontext()
+
+
+class SamplingProfiler:
+    """Samples the call stack of one thread at a fixed interval from a background thread"""
+
+    def __init__(self, interval=0.005, max_depth=64):
+        """
+        Args:
+            interval: Seconds between two samples
+            max_depth: Deepest stack frame that is recorded
+        """
+        self.interval = interval
+        self.max_depth = max_depth
+        self.stacks = {}        # {(outermost frame, ..., innermost frame): samples}
+        self.samples = 0
+        self._thread_id = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start sampling the calling thread"""
+        self._thread_id = threading.get_ident()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop sampling"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._thread_id)
+            stack = []
+            while frame is not None and len(stack) < self.max_depth:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                key = tuple(reversed(stack))
+                self.stacks[key] = self.stacks.get(key, 0) + 1
+                self.samples += 1
+
+    def report(self, limit=REPORT_LINES):
+        """Functions with the most samples, own (innermost frame) and total (anywhere on the stack)"""
+        own, total = {}, {}
+        for stack, count in self.stacks.items():
+            own[stack[-1]] = own.get(stack[-1], 0) + count
+            for function in set(stack):
+                total[function] = total.get(function, 0) + count
+
+        lines = [f"{self.samples} samples every {self.interval * 1000:.1f} ms", "   own%  total%  function"]
+        for function in sorted(total, key=lambda f: (own.get(f, 0), total[f]), reverse=True)[:limit]:
+            lines.append(
+                f"{100 * own.get(function, 0) / max(self.samples, 1):6.1f}  "
+                f"{100 * total[function] / max(self.samples, 1):6.1f}  {function}"
+            )
+        return "\n".join(lines)
+
+    def folded(self):
+        """Stacks in the collapsed format of flamegraph.pl / speedscope"""
+        return "\n".join(f"{';'.join(stack)} {count}" for stack, count in self.stacks.items())
+
+
+class _Span:
+    """Context manager of one recorded span, see Profiler.span"""
+
+    __slots__ = ("profiler", "name", "category", "args", "start", "hook")
+
+    def __init__(self, profiler, name, category, args):
+        self.profiler = profiler
+        self.name = name
+        self.category = category
+        self.args = args
+        self.hook = None
+
+    def __enter__(self):
+        self.hook = self.profiler._start_hook(self.name)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        end = time.perf_counter()
+        self.profiler._add(self.name, self.category, self.start, end - self.start, self.args)
+        if self.hook is not None:
+            self.profiler._stop_hook(self.name, self.hook)
+        return False
+
+
+class Profiler:
+    """Collects timing spans of the pipeline while enabled, costs one attribute check while disabled"""
+
+    def __init__(self):
+        self.enabled = False
+        self.hook = "none"
+        self.hook_stage = ""
+        self.spans = []         # [{'name', 'category', 'start', 'duration', 'thread', 'args'}]
+        self.profiles = {}      # {stage: cProfile.Profile or SamplingProfiler}
+        self.origin = time.perf_counter()
+        self.started = datetime.datetime.now()
+
+    def configure(self, enabled, hook="none", hook_stage=""):
+        """
+        Args:
+            enabled: Record spans
+            hook: Profiler attached to hook_stage, one of PROFILING_HOOKS
+            hook_stage: Name of the span the profiler runs around (e.g. "solve")
+        """
+        self.enabled = bool(enabled)
+        self.hook = hook if hook in PROFILING_HOOKS else "none"
+        self.hook_stage = hook_stage
+
+    def reset(self):
+        """Forget all recorded spans and profiles, timestamps restart at 0"""
+        self.spans = []
+        self.profiles = {}
+        self.origin = time.perf_counter()
+        self.started = datetime.datetime.now()
+
+    def span(self, name, category="pipeline", **args):
+        """
+        Time the enclosed block.
+
+        Args:
+            name: Stage name, spans with the same name are summarized together
+            category: Group of the span ("pipeline", "solve", "plan", "paint", ...)
+            args: Extra values stored with the span (sizes, counts)
+
+        Returns:
+            Context manager, a shared no-op one while profiling is disabled
+        """
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, category, args)
+
+    def record(self, name, duration, category="paint", **args):
+        """Record an operation that was already timed and has just finished"""
+        if self.enabled:
+            self._add(name, category, time.perf_counter() - duration, duration, args)
+
+    def _add(self, name, category, start, duration, args):
+        self.spans.append({
+            "name": name,
+            "category": category,
+            "start": start - self.origin,
+            "duration": duration,
+            "thread": threading.get_ident(),
+            "args": args,
+        })
+
+    def _start_hook(self, name):
+        if self.hook == "none" or name != self.hook_stage:
+            return None
+        if self.hook == "cprofile":
+            hook = cProfile.Profile()
+            hook.enable()
+        else:
+            hook = SamplingProfiler()
+            hook.start()
+        return hook
+
+    def _stop_hook(self, name, hook):
+        if isinstance(hook, cProfile.Profile):
+            hook.disable()
+        else:
+            hook.stop()
+        self.profiles[name] = hook
+
+    def summary(self):
+        """
+        Returns:
+            dict: {name: {'category', 'count', 'total', 'mean', 'max'}} in seconds
+        """
+        stages = {}
+        for span in self.spans:
+            stage = stages.setdefault(span["name"], {
+                "category": span["category"], "count": 0, "total": 0.0, "max": 0.0
+            })
+            stage["count"] += 1
+            stage["total"] += span["duration"]
+            stage["max"] = max(stage["max"], span["duration"])
+        for stage in stages.values():
+            stage["mean"] = stage["total"] / stage["count"]
+        return stages
+
+    def format_summary(self):
+        """Summary as log lines, the most expensive stage first"""
+        stages = self.summary()
+        lines = ["Stage                  Count       Total        Mean         Max"]
+        for name, stage in sorted(stages.items(), key=lambda item: item[1]["total"], reverse=True):
+            lines.append(
+                f"{name:<20} {stage['count']:>7} {stage['total']:>10.3f} s "
+                f"{stage['mean'] * 1000:>8.2f} ms {stage['max'] * 1000:>8.1f} ms"
+            )
+        return lines
+
+    def profile_report(self, stage, limit=REPORT_LINES):
+        """Text report of the profiler attached to stage, None if it did not run"""
+        hook = self.profiles.get(stage)
+        if hook is None:
+            return None
+        if isinstance(hook, SamplingProfiler):
+            return hook.report(limit)
+        stream = io.StringIO()
+        pstats.Stats(hook, stream=stream).sort_stats("cumulative").print_stats(limit)
+        return stream.getvalue()
+
+    def to_dict(self):
+        """All spans, the summary and the profiler reports as plain data"""
+        return {
+            "version": 1,
+            "started": self.started.isoformat(timespec="seconds"),
+            "summary": self.summary(),
+            "spans": self.spans,
+            "profiles": {stage: self.profile_report(stage) for stage in self.profiles},
+        }
+
+    def to_chrome_trace(self):
+        """Spans as Chrome trace events ("X" complete events, microseconds)"""
+        pid = os.getpid()
+        events = [
+            {
+                "name": span["name"],
+                "cat": span["category"],
+                "ph": "X",
+                "ts": round(span["start"] * 1e6, 1),
+                "dur": round(span["duration"] * 1e6, 1),
+                "pid": pid,
+                "tid": span["thread"],
+                "args": span["args"],
+            }
+            for span in self.spans
+        ]
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def export(self, job, directory=DEFAULT_PROFILE_DIR):
+        """
+        Write <job>_<time>.json, <job>_<time>.trace.json and the profiler output
+        (.prof for cProfile, .folded for the sampling profiler) to directory.
+
+        Returns:
+            list: Paths of the written files, empty if nothing was recorded or writing failed
+        """
+        if not self.spans:
+            return []
+        base = os.path.join(directory, f"{job}_{self.started.strftime('%Y%m%d_%H%M%S')}")
+        paths = []
+        try:
+            os.makedirs(directory, exist_ok=True)
+            with open(base + ".json", "w") as f:
+                json.dump(self.to_dict(), f, indent=1)
+            paths.append(base + ".json")
+            with open(base + ".trace.json", "w") as f:
+                json.dump(self.to_chrome_trace(), f)
+            paths.append(base + ".trace.json")
+            for stage, hook in self.profiles.items():
+                if isinstance(hook, SamplingProfiler):
+                    with open(f"{base}_{stage}.folded", "w") as f:
+                        f.write(hook.folded())
+                    paths.append(f"{base}_{stage}.folded")
+                else:
+                    hook.dump_stats(f"{base}_{stage}.prof")
+                    paths.append(f"{base}_{stage}.prof")
+        except OSError:
+            pass
+        return paths
+
+
+# Shared by the GUI and the library modules, so spans of the solver and planner land in the same trace
+profiler = Profiler()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+In-memory image conversion for Rust Painter.
+Converts PIL images and numpy arrays straight into QImage/QPixmap objects,
+without encoding a temporary PNG file to disk.
+"""
+
+from PyQt6.QtGui import QImage, QPixmap
+
+import numpy as np
+
+
+# PIL mode -> (raw mode, QImage format, bytes per pixel)
+_PIL_FORMATS = {
+    "RGB": ("RGB", QImage.Format.Format_RGB888, 3),
+    "RGBA": ("RGBA", QImage.Format.Format_RGBA8888, 4),
+    "L": ("L", QImage.Format.Format_Grayscale8, 1),
+}
+
+
+def numpy_to_qimage(array):
+    """
+    Wrap a uint8 numpy array in a QImage without copying the pixels.
+
+    Args:
+        array: (H, W) grayscale, (H, W, 3) RGB or (H, W, 4) RGBA uint8 array
+
+    Returns:
+        QImage: Image sharing the array's buffer, the array is kept alive by the image
+    """
+    array = np.ascontiguousarray(array, dtype=np.uint8)
+    height, width = array.shape[:2]
+    if array.ndim == 2:
+        image_format = QImage.Format.Format_Grayscale8
+    elif array.shape[2] == 3:
+        image_format = QImage.Format.Format_RGB888
+    elif array.shape[2] == 4:
+        image_format = QImage.Format.Format_RGBA8888
+    else:
+        raise ValueError(f"Unsupported array shape: {array.shape}")
+
+    qimage = QImage(array.data, width, height, array.strides[0], image_format)
+    # QImage does not own the buffer, it must outlive the image
+    qimage._buffer = array
+    return qimage
+
+
+def pil_to_qimage(image):
+    """
+    Convert a PIL image to a QImage with one raw copy of the pixels (no encoding).
+
+    Args:
+        image: PIL Image object, other modes than RGB/RGBA/L are converted to RGB or RGBA
+
+    Returns:
+        QImage: Image sharing the raw pixel buffer, which is kept alive by the image
+    """
+    if image.mode not in _PIL_FORMATS:
+        has_alpha = "A" in image.getbands() or "transparency" in image.info
+        image = image.convert("RGBA" if has_alpha else "RGB")
+    raw_mode, image_format, bytes_per_pixel = _PIL_FORMATS[image.mode]
+
+    data = image.tobytes("raw", raw_mode)
+    qimage = QImage(data, image.width, image.height, image.width * bytes_per_pixel, image_format)
+    # QImage does not own the buffer, it must outlive the image
+    qimage._buffer = data
+    return qimage
+
+
+def pil_to_qpixmap(image):
+    """
+    Convert a PIL image to a QPixmap.
+
+    Args:
+        image: PIL Image object
+
+    Returns:
+        QPixmap: Pixmap holding its own copy of the pixels (no buffer to keep alive)
+    """
+    return QPixmap.fromImage(pil_to_qimage(image))
+
+
+def numpy_to_qpixmap(array):
+    """
+    Convert a uint8 numpy array to a QPixmap.
+
+    Args:
+        array: (H, W), (H, W, 3) or (H, W, 4) uint8 array
+
+    Returns:
+        QPixmap: Pixmap holding its own copy of the pixels
+    """
+    return QPixmap.fromImage(numpy_to_qimage(array))
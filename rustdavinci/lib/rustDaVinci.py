@@ -2,29 +2,31 @@
 # -*- coding: utf-8 -*-
 
 from PyQt6.QtCore import QSettings, Qt, QRect, QDir, QTimer
-from PyQt6.QtGui import QPixmap
 from PyQt6.QtWidgets import QMessageBox, QInputDialog, QFileDialog, QApplication, QLabel, QProgressBar
 
-from pynput import keyboard
 from PIL import Image
 
-import urllib.request
-import pyautogui
 import datetime
+import threading
 import numpy
 import time
-import cv2
 import os
 
-from lib.rustPaletteData import rust_palette
-from lib.captureArea import capture_area
+from lib.rustPaletteData import rust_palette, opacity_ui_value
 from lib.color_functions import hex_to_rgb, rgb_to_hex
-from lib.color_blending import find_optimal_layers_numba as find_optimal_layers
-from lib.color_blending import create_layered_colors_map_optimized as create_layered_colors_map
-from lib.color_blending import simulate_layered_image_numba as simulate_layered_image
-from lib.color_blending import alpha_blend_numba as alpha_blend
+from lib.painting_plan import smooth_layer_runs, run_length_statistics, count_color_keys, plan_painting_lines
+from lib.time_estimator import PaintTimeEstimator, summarize_plan, line_length
+from lib.lazy_import import lazy_import
+from lib.qt_image import pil_to_qpixmap
+from lib.memory_report import MemoryReport
+from lib.screen_capture import get_screen_capture
+from lib.image_loading import load_image_from_url_async, open_image, has_transparency
+from lib.settings_snapshot import SettingsSnapshot, BatchedSettingsWriter
+from lib.profiling import profiler
 from ui.dialogs.captureDialog import CaptureAreaDialog
-from ui.settings.default_settings import default_settings
+
+# Loaded on first use, see lib/lazy_import.py (OpenCV, numba and pynput are imported where they are needed)
+pyautogui = lazy_import("pyautogui")
 
 
 class rustDaVinci:
@@ -33,8 +35,17 @@ class rustDaVinci:
         self.parent = parent
         self.settings = QSettings()
 
+        # Typed copy of the settings, taken once per job (see take_settings_snapshot)
+        self.snapshot = SettingsSnapshot.from_qsettings(self.settings)
+        # Control positions for the test overlay are written in one debounced batch
+        self.overlay_writer = BatchedSettingsWriter(self.settings)
+
         # PIL.Image images original/ quantized
         self.org_img_template = None
+        # ("file", path) or ("url", url) the template was decoded from and the size box it was
+        # decoded at, see refresh_source_decode (None for images that can not be decoded again)
+        self.image_source = None
+        self.source_decode_target = None
         self.org_img = None
         self.quantized_img = None
         self.palette_data = None
@@ -43,14 +54,20 @@ class rustDaVinci:
         # New variables for optimal layering
         self.layered_colors_map = None
         self.base_palette_colors = []
-        self.opacity_values = [1.0, 0.75, 0.5, 0.25]  # 100%, 75%, 50%, 25%
+        self.opacity_values = list(self.snapshot.opacity_levels)  # 100%, 75%, 50%, 25% by default
+        # Opacities the layers blend with in game, see blend_opacities
+        self.blend_opacity_values = list(self.opacity_values)
+
+        # Manifest of an imported painting plan, painted as is instead of solving (see import_painting_plan)
+        self.imported_plan = None
         
         # Cache for storing calculated color data to avoid recalculation
         self.color_calculation_cache = {
             'resized_img': None,         # Stores the resized image
             'layered_colors_map': None,  # Stores the calculated color layers
             'simulated_img': None,       # Stores the simulated result image
-            'background_color': None     # The background color used for calculation
+            'background_color': None,    # The background color used for calculation
+            'solution_cache': None  # Per-color solutions reused between solves (created on first solve)
         }
 
         # Pixmaps
@@ -98,6 +115,15 @@ class rustDaVinci:
         self.line_delay = 0
         self.ctrl_area_delay = 0
 
+        # Multi-scale control area detector, keeps the last found scale/position (created on first use)
+        self.control_area_detector = None
+
+        # Memory held by the image buffers after every pipeline stage
+        self.memory_report = MemoryReport()
+
+        # Recorded operation timings that drive the estimated painting time
+        self.time_estimator = PaintTimeEstimator()
+
         # Color tracking for status display
         self.total_colors = 0
         self.current_color_index = 0
@@ -118,45 +144,77 @@ class rustDaVinci:
         # Hotkey display QLabel
         self.hotkey_label = None
 
+        # Background compilation of the color solver kernels
+        self.warm_up_thread = None
+        self.warm_up_timer = None
+        self.warm_up_result = None
+
         # Init functions
-        if not (
-            int(self.settings.value("ctrl_w", default_settings["ctrl_w"])) == 0
-            or int(self.settings.value("ctrl_h", default_settings["ctrl_h"]))
-        ):
+        if self.snapshot.has_control_area:
             self.calculate_ctrl_tools_positioning()
 
-    def update(self):
-        """Updates pyauogui delays, booleans and paint image button"""
-        self.click_delay = float(
-            int(self.settings.value("click_delay", default_settings["click_delay"]))
-            / 1000
-        )
-        self.line_delay = float(
-            int(self.settings.value("line_delay", default_settings["line_delay"]))
-            / 1000
-        )
-        self.ctrl_area_delay = float(
-            int(
-                self.settings.value(
-                    "ctrl_area_delay", default_settings["ctrl_area_delay"]
-                )
+        if self.snapshot.numba_warm_up:
+            # Start once the event loop runs, so the main window is shown first
+            QTimer.singleShot(0, self.start_kernel_warm_up)
+
+    def start_kernel_warm_up(self):
+        """Compile the color solver kernels in a background thread so the first solve runs at full speed"""
+        if self.warm_up_thread is not None:
+            return
+
+        def warm_up():
+            start_time = time.time()
+            try:
+                from lib.color_blending import warm_up_kernels
+                warm_up_kernels()
+                self.warm_up_result = time.time() - start_time
+            except Exception as e:
+                self.warm_up_result = e
+
+        self.warm_up_thread = threading.Thread(target=warm_up, daemon=True)
+        self.warm_up_thread.start()
+
+        # Poll the thread from the UI thread, widgets must not be touched from the worker
+        self.warm_up_timer = QTimer()
+        self.warm_up_timer.timeout.connect(self.check_kernel_warm_up)
+        self.warm_up_timer.start(250)
+
+    def check_kernel_warm_up(self):
+        """Report the result of the kernel warm-up once the background thread has finished"""
+        if self.warm_up_thread is None or self.warm_up_thread.is_alive():
+            return
+        self.warm_up_timer.stop()
+        self.warm_up_timer = None
+
+        if isinstance(self.warm_up_result, Exception):
+            self.parent.ui.log_TextEdit.append(f"Color solver warm-up failed: {str(self.warm_up_result)}")
+        else:
+            self.parent.ui.log_TextEdit.append(
+                f"Color solver ready (kernels compiled/loaded in {self.warm_up_result:.2f} s)"
             )
-            / 1000
-        )
 
-        # Update the pyautogui delay
-        pyautogui.PAUSE = self.click_delay
+    def take_settings_snapshot(self):
+        """Read the settings once for the job that is about to run
+
+        Returns:
+            SettingsSnapshot: The new snapshot, also stored in self.snapshot
+        """
+        self.snapshot = SettingsSnapshot.from_qsettings(self.settings)
+        return self.snapshot
+
+    def update(self):
+        """Takes a new settings snapshot, updates the delays, booleans and paint image button"""
+        settings = self.take_settings_snapshot()
+        self.click_delay = settings.click_delay / 1000
+        self.line_delay = settings.line_delay / 1000
+        self.ctrl_area_delay = settings.ctrl_area_delay / 1000
+
+        # pyautogui.PAUSE is set when painting starts, setting it here would import pyautogui at startup
+        self.time_estimator.set_delays(self.click_delay, self.line_delay, self.ctrl_area_delay)
 
-        if (
-            int(self.settings.value("ctrl_w", default_settings["ctrl_w"])) == 0
-            or int(self.settings.value("ctrl_h", default_settings["ctrl_h"])) == 0
-        ):
+        if not settings.has_control_area:
             self.parent.ui.paint_image_PushButton.setEnabled(False)
-        elif (
-            self.org_img_ok
-            and int(self.settings.value("ctrl_w", default_settings["ctrl_w"])) != 0
-            and int(self.settings.value("ctrl_h", default_settings["ctrl_h"])) != 0
-        ):
+        elif self.org_img_ok:
             self.parent.ui.paint_image_PushButton.setEnabled(True)
 
     def load_image_from_file(self):
@@ -174,46 +232,43 @@ class rustDaVinci:
         )[0]
 
         if path.endswith((".png", ".jpg", "jpeg", ".gif", ".bmp")):
+            settings = self.take_settings_snapshot()
+            self.start_profiling()
             try:
                 self.settings.setValue("folder_path", path)
                 # Clear previous data
                 self.layered_colors_map = None
+                self.imported_plan = None
                 self.color_calculation_cache = {
                     'resized_img': None,
                     'layered_colors_map': None,
                     'simulated_img': None,
-                    'background_color': None
+                    'background_color': None,
+                    'solution_cache': None
                 }
                 
-                # Pixmap for original image
-                self.org_img_pixmap = QPixmap(path, "1")
-
-                # The original PIL.Image object
-                self.org_img_template = Image.open(path).convert("RGBA")
+                # The original PIL.Image object, decoded close to the size it is used at
+                with profiler.span("load", source="file"):
+                    self.source_decode_target = self.source_decode_size()
+                    self.org_img_template = self.prepare_source_image(
+                        open_image(path, target_size=self.source_decode_target)
+                    )
+                self.image_source = ("file", path)
                 self.org_img = self.org_img_template
 
+                # Pixmap for original image, converted in memory instead of decoding the file twice
+                self.org_img_pixmap = pil_to_qpixmap(self.org_img_template)
+
                 # Check if we should try to load cached data
-                use_cached_data = bool(
-                    self.settings.value("use_cached_data", True)
-                )
-                
-                if use_cached_data:
-                    # Get background color for cache check
-                    bg_color_hex = self.settings.value("background_color", default_settings["background_color"])
-                    bg_color_rgb = hex_to_rgb(bg_color_hex)
-                    
+                if settings.use_cached_data:
                     # Try to load cached data
-                    if self.load_calculation_cache(path, bg_color_rgb):
+                    if self.load_calculation_cache(path, settings.background_rgb):
                         self.parent.ui.log_TextEdit.append("Using cached color calculations")
                 
                 self.convert_transparency()
                 self.create_pixmaps()
 
-                if bool(
-                    self.settings.value(
-                        "show_preview_load", default_settings["show_preview_load"]
-                    )
-                ):
+                if settings.show_preview_load:
                     # Always use the optimized high quality pixmap
                     self.pixmap_on_display = 2
 
@@ -225,6 +280,8 @@ class rustDaVinci:
 
                 self.parent.ui.log_TextEdit.clear()
                 self.parent.ui.progress_ProgressBar.setValue(0)
+                self.report_memory("load")
+                self.finish_profiling("load")
 
             except Exception as e:
                 self.org_img = None
@@ -247,19 +304,37 @@ class rustDaVinci:
         url = dialog.textValue()
 
         if ok_clicked and url != "":
+            settings = self.take_settings_snapshot()
+            self.start_profiling()
             try:
-                headers = {
-                    "User-Agent": "Mozilla/5.0 (Windows; U; Windows NT 5.1; en-US; rv:1.9.0.7) Gecko/2009021910 Firefox/3.0.7"
+                # Download in a worker thread (timeout, size cap and HTTP cache), keep the UI responsive
+                self.parent.ui.log_TextEdit.append("Downloading image...")
+                with profiler.span("load", source="url"):
+                    decode_target = self.source_decode_size()
+                    future = load_image_from_url_async(url, target_size=decode_target)
+                    while not future.done():
+                        QApplication.processEvents()
+                        time.sleep(0.01)
+                    image, source = future.result()
+                if source != "network":
+                    self.parent.ui.log_TextEdit.append("Using cached download of the image")
+
+                # Clear previous data
+                self.layered_colors_map = None
+                self.imported_plan = None
+                self.color_calculation_cache = {
+                    'resized_img': None,
+                    'layered_colors_map': None,
+                    'simulated_img': None,
+                    'background_color': None,
+                    'solution_cache': None
                 }
-                request = urllib.request.Request(url, None, headers)
-                self.org_img_template = Image.open(
-                    urllib.request.urlopen(request)
-                ).convert("RGBA")
+                self.org_img_template = self.prepare_source_image(image)
+                self.image_source = ("url", url)
+                self.source_decode_target = decode_target
 
                 # Pixmap for original image
-                self.org_img_template.save("temp_url_image.png")
-                self.org_img_pixmap = QPixmap("temp_url_image.png", "1")
-                os.remove("temp_url_image.png")
+                self.org_img_pixmap = pil_to_qpixmap(self.org_img_template)
 
                 # The original PIL.Image object
                 self.org_img = self.org_img_template
@@ -267,18 +342,9 @@ class rustDaVinci:
                 self.convert_transparency()
                 self.create_pixmaps()
 
-                if bool(
-                    self.settings.value(
-                        "show_preview_load", default_settings["show_preview_load"]
-                    )
-                ):
-                    if (
-                        int(self.settings.value("quality", default_settings["quality"]))
-                        == 0
-                    ):
-                        self.pixmap_on_display = 1
-                    else:
-                        self.pixmap_on_display = 2
+                if settings.show_preview_load:
+                    # Always use the optimized high quality pixmap
+                    self.pixmap_on_display = 2
 
                     if self.parent.is_expanded:
                         self.parent.label.hide()
@@ -288,6 +354,8 @@ class rustDaVinci:
 
                 self.parent.ui.log_TextEdit.clear()
                 self.parent.ui.progress_ProgressBar.setValue(0)
+                self.report_memory("load")
+                self.finish_profiling("load")
 
             except Exception as e:
                 self.org_img = None
@@ -300,30 +368,225 @@ class rustDaVinci:
 
         self.update()
 
+    def import_painting_plan(self):
+        """Load a painting plan exported with export_painting_plan, it is painted without solving"""
+        title = "Select the painting plan to be painted"
+        fileformats = "Painting plans (*.json)"
+        folder_path = self.settings.value("folder_path", QDir.homePath())
+        folder_path = os.path.dirname(os.path.abspath(folder_path))
+        if not os.path.exists(folder_path):
+            folder_path = QDir.homePath()
+
+        path = QFileDialog.getOpenFileName(
+            parent=self.parent, caption=title, directory=folder_path, filter=fileformats
+        )[0]
+
+        if path.endswith(".json"):
+            settings = self.take_settings_snapshot()
+            self.start_profiling()
+            try:
+                from lib.plan_export import import_plan
+                with profiler.span("load", source="plan"):
+                    layers, manifest = import_plan(path)
+                width, height = manifest["width"], manifest["height"]
+                background_color = tuple(manifest["background_color"])
+                self.settings.setValue("folder_path", path)
+
+                # The plan brings its own palette and opacities, a later solve sets them again
+                self.base_palette_colors = [tuple(color) for color in manifest["palette"]]
+                self.opacity_values = list(manifest["opacity_values"])
+                self.blend_opacity_values = list(manifest.get("blend_opacity_values", self.opacity_values))
+                simulated_img = layers.simulate(background_color, self.base_palette_colors, self.blend_opacity_values)
+                if width * height <= settings.tiled_processing_pixels:
+                    self.layered_colors_map = layers.read(0, 0, width, height)
+                    layers.close()
+                else:
+                    self.layered_colors_map = layers
+                self.imported_plan = manifest
+
+                # The simulated plan stands in for the source image, a canvas the plan
+                # does not fit on is solved again from it
+                self.color_calculation_cache = {
+                    'resized_img': simulated_img,
+                    'layered_colors_map': self.layered_colors_map,
+                    'simulated_img': simulated_img,
+                    'background_color': background_color,
+                    'solution_cache': None
+                }
+                self.org_img_template = simulated_img
+                self.image_source = None
+                self.org_img = simulated_img
+                self.quantized_img = simulated_img
+                self.org_img_pixmap = pil_to_qpixmap(simulated_img)
+                self.quantized_img_pixmap = self.org_img_pixmap
+                self.org_img_ok = True
+
+                if settings.show_preview_load:
+                    self.pixmap_on_display = 2
+
+                    if self.parent.is_expanded:
+                        self.parent.label.hide()
+                    self.parent.expand_window()
+                else:
+                    self.pixmap_on_display = 0
+
+                self.parent.ui.log_TextEdit.clear()
+                self.parent.ui.progress_ProgressBar.setValue(0)
+                self.parent.ui.log_TextEdit.append(
+                    f"Loaded painting plan {os.path.basename(path)}: {width} x {height}, "
+                    f"{manifest['painted_pixels']:,} pixels in {len(manifest['layers'])} layer(s)"
+                )
+                if background_color != settings.background_rgb:
+                    self.parent.ui.log_TextEdit.append(
+                        f"The plan was made for the background color {rgb_to_hex(background_color)}, "
+                        "set it in the settings to paint the plan without solving it again"
+                    )
+                self.report_memory("load")
+                self.finish_profiling("load")
+
+            except Exception as e:
+                self.org_img = None
+                self.org_img_ok = False
+                self.imported_plan = None
+                msg = QMessageBox(self.parent)
+                msg.setIcon(QMessageBox.Icon.Critical)
+                msg.setText("ERROR! Could not load the selected painting plan...")
+                msg.setInformativeText(str(e))
+                msg.exec()
+
+        self.update()
+
+    def report_memory(self, stage):
+        """Log the memory held by the image buffers of the pipeline (memory_report setting)"""
+        entry = self.memory_report.snapshot(stage, {
+            "org_img_template": self.org_img_template,
+            "org_img": self.org_img,
+            "resized_img": self.color_calculation_cache['resized_img'],
+            "simulated_img": self.color_calculation_cache['simulated_img'],
+            "quantized_img": self.quantized_img,
+        })
+        if self.snapshot.memory_report:
+            for line in MemoryReport.format(entry):
+                self.parent.ui.log_TextEdit.append(line)
+
+    def start_profiling(self):
+        """Start a new profiling session for the job that is about to run (enable_profiling setting)"""
+        profiler.configure(
+            self.snapshot.enable_profiling, self.snapshot.profiling_hook, self.snapshot.profiling_stage
+        )
+        profiler.reset()
+
+    def finish_profiling(self, job):
+        """Log the per stage timing report of the job and export it as JSON and Chrome trace
+
+        Args:
+            job: Name of the job, used in the exported file names ("load" or "paint")
+        """
+        if not profiler.enabled:
+            return
+        self.parent.ui.log_TextEdit.append(f"Timing report ({job}):")
+        for line in profiler.format_summary():
+            self.parent.ui.log_TextEdit.append(line)
+        for path in profiler.export(job):
+            self.parent.ui.log_TextEdit.append(f"Profile saved to {path}")
+
+    def record_operation(self, kind, duration, length=0):
+        """Record the duration of one painting operation for the time estimator and the profiler"""
+        self.time_estimator.record(kind, duration, length)
+        profiler.record(kind, duration, "paint", length=length)
+
+    def source_decode_size(self):
+        """Size box source images are decoded at: the larger of max_source_size and the canvas"""
+        target = max(self.snapshot.max_source_size, self.canvas_w, self.canvas_h)
+        return (target, target)
+
+    def refresh_source_decode(self):
+        """Decode the source image again when the decode size box changed since it was loaded
+        (canvas size or max_source_size), so the image is neither too small nor larger than needed
+        
+        Returns:
+            bool: True if the image was decoded again
+        """
+        if self.image_source is None or self.org_img_template is None:
+            return False
+        target = self.source_decode_size()
+        if target == self.source_decode_target:
+            return False
+        source_size = self.org_img_template.info.get("source_size", self.org_img_template.size)
+        reduced = self.org_img_template.size != tuple(source_size)
+        too_large = max(self.org_img_template.size) >= 2 * target[0]
+        if not (reduced or too_large):
+            return False  # Decoded at full size and still needed at full size
+
+        kind, location = self.image_source
+        self.parent.ui.log_TextEdit.append("Decode size changed, decoding the source image again...")
+        QApplication.processEvents()
+        try:
+            with profiler.span("load", source=kind):
+                if kind == "file":
+                    image = open_image(location, target_size=target)
+                else:
+                    future = load_image_from_url_async(location, target_size=target)
+                    while not future.done():
+                        QApplication.processEvents()
+                        time.sleep(0.01)
+                    image, _ = future.result()
+        except Exception as e:
+            self.parent.ui.log_TextEdit.append(f"Could not decode the source image again, using the loaded one: {e}")
+            self.source_decode_target = target
+            return False
+
+        self.org_img_template = self.prepare_source_image(image)
+        self.source_decode_target = target
+        self.org_img_pixmap = pil_to_qpixmap(self.org_img_template)
+        self.convert_transparency()
+        return True
+
+    def prepare_source_image(self, image):
+        """Return the single working copy of a decoded source image (RGB unless it has transparency)
+        
+        Args:
+            image: Decoded PIL.Image
+            
+        Returns:
+            PIL.Image: RGBA image if the source has transparency, otherwise RGB
+        """
+        source_size = image.info.get("source_size", image.size)
+        if source_size != image.size:
+            self.parent.ui.log_TextEdit.append(
+                f"Decoded image at {image.width}x{image.height} (source {source_size[0]}x{source_size[1]})"
+            )
+        if has_transparency(image):
+            return image if image.mode == "RGBA" else image.convert("RGBA")
+        return image if image.mode == "RGB" else image.convert("RGB")
+
     def convert_transparency(self):
         """Paste the org_img on top of an image with background color"""
-        try:
-            # Get the user's background color preference 
-            bg_color_hex = self.settings.value("background_color", default_settings["background_color"])
-            bg_color_rgb = hex_to_rgb(bg_color_hex)
+        if self.org_img_template.mode == "RGB":
+            # Nothing to fill in, share the working copy instead of copying it
+            self.org_img = self.org_img_template
+            return
+
+        with profiler.span("transparency"):
+            try:
+                # Get the user's background color preference 
+                bg_color_rgb = self.snapshot.background_rgb
             
-            # Check if the color exists in our palette - if not, use white (3rd color in our new palette)
-            if bg_color_rgb in rust_palette:
-                background_color = rust_palette.index(bg_color_rgb)
-            else:
-                # Use pure white (255,255,255) which is at index 3 in our new palette
-                background_color = 3
+                # Check if the color exists in our palette - if not, use white (3rd color in our new palette)
+                if bg_color_rgb in rust_palette:
+                    background_color = rust_palette.index(bg_color_rgb)
+                else:
+                    # Use pure white (255,255,255) which is at index 3 in our new palette
+                    background_color = 3
                 
-            # Set transparency in image to default background
-            self.org_img = self.org_img_template
-            temp_org_img = Image.new("RGBA", self.org_img.size, color=rust_palette[background_color])
-            temp_org_img.paste(self.org_img, (0, 0), mask=self.org_img)
-            self.org_img = temp_org_img
-            self.org_img = self.org_img.convert("RGB")
-        except Exception as e:
-            # Log the error but continue processing
-            print(f"Warning: Error handling transparency: {str(e)}")
-            self.org_img = self.org_img_template.convert("RGB")
+                # Set transparency in image to default background, pasted straight onto an RGB image
+                org_img = Image.new("RGB", self.org_img_template.size, color=rust_palette[background_color])
+                org_img.paste(self.org_img_template, (0, 0), mask=self.org_img_template)
+                self.org_img = org_img
+            except Exception as e:
+                # Log the error but continue processing
+                print(f"Warning: Error handling transparency: {str(e)}")
+                self.org_img = self.org_img_template.convert("RGB")
 
     def optimized_quantize_to_palette(self, image):
         """
@@ -336,13 +599,15 @@ class rustDaVinci:
         Returns:
             PIL Image: Quantized image based on optimal color layering
         """
+        # Settings of this solve, read once when the job started
+        settings = self.snapshot
+
         try:
-            # Prepare the base image
-            temp_img = image.copy()
+            # Prepare the base image (every step below creates a new image, the input is never modified)
+            temp_img = image
             if temp_img.mode == "RGBA":
                 # Get background color from settings
-                bg_color_hex = self.settings.value("background_color", default_settings["background_color"])
-                bg_color_rgb = hex_to_rgb(bg_color_hex)
+                bg_color_rgb = settings.background_rgb
                 
                 # Create new image with background color
                 bg = Image.new('RGB', temp_img.size, bg_color_rgb)
@@ -353,34 +618,9 @@ class rustDaVinci:
             if temp_img.mode != "RGB":
                 temp_img = temp_img.convert("RGB")
                 
-            # Performance optimization for very large images
-            # Set a reasonable limit for pixel count
+            # Images above tiled_processing_pixels are solved tile by tile with bounded memory
             total_pixels = temp_img.width * temp_img.height
-            resize_threshold = 500000  # Adjust based on typical system capabilities
-            
-            if total_pixels > resize_threshold:
-                # Ask user if they want to resize for faster calculation
-                # Calculate new dimensions to fit within threshold while maintaining aspect ratio
-                factor = (resize_threshold / total_pixels) ** 0.5
-                new_width = int(temp_img.width * factor)
-                new_height = int(temp_img.height * factor)
-                
-                from ui.theme.theme import apply_theme_to_dialog
-                
-                msg = QMessageBox(self.parent)
-                apply_theme_to_dialog(msg)  # Apply current theme to dialog
-                msg.setIcon(QMessageBox.Icon.Question)
-                msg.setWindowTitle("Large Image Detected")
-                msg.setText(f"This image is very large ({temp_img.width}x{temp_img.height} = {total_pixels:,} pixels).")
-                msg.setInformativeText(f"Would you like to temporarily resize to {new_width}x{new_height} for faster color calculation?\n\n" +
-                                       "Note: The final painted image will still use your original resolution.")
-                msg.setStandardButtons(QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
-                response = msg.exec()
-                
-                if response == QMessageBox.StandardButton.Yes:
-                    # Resize for faster processing
-                    temp_img = temp_img.resize((new_width, new_height), Image.LANCZOS)
-                    self.parent.ui.log_TextEdit.append(f"Using reduced resolution ({new_width}x{new_height}) for color calculation...")
+            use_tiles = total_pixels > settings.tiled_processing_pixels
             
             # Use ALL 64 base colors from rust_palette
             self.base_palette_colors = rust_palette[:64]
@@ -458,8 +698,7 @@ class rustDaVinci:
             
             # Background color for calculations
             background_color = rust_palette[0]  # Default to first color
-            bg_color_hex = self.settings.value("background_color", default_settings["background_color"])
-            bg_color_rgb = hex_to_rgb(bg_color_hex)
+            bg_color_rgb = settings.background_rgb
             
             if bg_color_rgb in rust_palette:
                 background_color = bg_color_rgb
@@ -472,6 +711,25 @@ class rustDaVinci:
             self.progress_status.setText("Starting color calculations...")
             QApplication.processEvents()
             
+            # Opacity levels the layers are solved with, applied on top of the base colors during painting
+            self.opacity_values = list(settings.opacity_levels)
+            self.blend_opacity_values = self.blend_opacities(settings)
+
+            # Solutions of previous solves, so only new colors/backgrounds get calculated
+            solution_cache = self.color_calculation_cache['solution_cache']
+            if solution_cache is not None and solution_cache['opacity_values'] != tuple(self.blend_opacity_values):
+                self.parent.ui.log_TextEdit.append("Opacity levels changed, solving every color again...")
+                solution_cache = None
+            if solution_cache is None:
+                from lib.color_blending import create_solution_cache
+                solution_cache = self.color_calculation_cache['solution_cache'] = create_solution_cache(
+                    self.blend_opacity_values
+                )
+
+            # Threshold and dilation of the importance mask (pixels that get an exact solution)
+            importance_threshold = settings.importance_threshold
+            importance_dilation = settings.importance_dilation
+
             # Update callback function to update the progress dialog
             self.cancel_requested = False
             
@@ -505,48 +763,93 @@ class rustDaVinci:
                 QApplication.processEvents()
                 return self.cancel_requested
             
-            # Define the opacity values
-            # These are SEPARATE from the base colors and are applied during painting
-            self.opacity_values = [1.0, 0.75, 0.5, 0.25]
-            
+            # Dithering trades stroke count for smoother gradients, see create_dithered_colors_map
+            dither_mode = settings.dither_mode.lower()
+            dither_isolation_penalty = settings.dither_isolation_penalty
+
             # Check if we can use multiprocessing for better performance
-            try:
-                import multiprocessing
-                # Only use parallel processing if we have at least 2 cores and a big enough image
-                if multiprocessing.cpu_count() > 1 and total_pixels > 50000:
-                    from lib.color_blending import create_layered_colors_map_parallel
-                    self.parent.ui.log_TextEdit.append(f"Using parallel processing with {multiprocessing.cpu_count()} cores")
-                    self.layered_colors_map = create_layered_colors_map_parallel(
-                        temp_img,
-                        background_color,
-                        self.base_palette_colors,
-                        self.opacity_values,
-                        max_layers=2,
-                        update_callback=update_progress
-                    )
-                else:
-                    # Fall back to single-threaded for small images
+            with profiler.span("solve", "solve", pixels=total_pixels, dither=dither_mode):
+                try:
+                    import multiprocessing
+                    if use_tiles and dither_mode == "none":
+                        from lib.tiled_processing import solve_tiled
+                        self.parent.ui.log_TextEdit.append(
+                            f"Large image ({total_pixels:,} pixels), solving in tiles of {settings.tile_size}x{settings.tile_size}"
+                        )
+                        self.layered_colors_map = solve_tiled(
+                            temp_img,
+                            background_color,
+                            self.base_palette_colors,
+                            self.blend_opacity_values,
+                            max_layers=2,
+                            tile_size=settings.tile_size,
+                            update_callback=update_progress,
+                            solution_cache=solution_cache,
+                            importance_threshold=importance_threshold,
+                            importance_dilation=importance_dilation
+                        )
+                    elif dither_mode != "none":
+                        from lib.color_blending import create_dithered_colors_map
+                        if use_tiles:
+                            self.parent.ui.log_TextEdit.append("Dithering needs the whole image at once, solving without tiles")
+                        self.parent.ui.log_TextEdit.append(f"Using {dither_mode} dithering over the achievable colors")
+                        self.layered_colors_map = create_dithered_colors_map(
+                            temp_img,
+                            background_color,
+                            self.base_palette_colors,
+                            self.blend_opacity_values,
+                            max_layers=2,
+                            method=dither_mode,
+                            isolation_penalty=dither_isolation_penalty,
+                            update_callback=update_progress,
+                            solution_cache=solution_cache,
+                            importance_threshold=importance_threshold,
+                            importance_dilation=importance_dilation
+                        )
+                    # Only use parallel processing if we have at least 2 cores and a big enough image
+                    elif multiprocessing.cpu_count() > 1 and total_pixels > 50000:
+                        from lib.color_blending import create_layered_colors_map_parallel
+                        self.parent.ui.log_TextEdit.append(f"Using parallel processing with {multiprocessing.cpu_count()} cores")
+                        self.layered_colors_map = create_layered_colors_map_parallel(
+                            temp_img,
+                            background_color,
+                            self.base_palette_colors,
+                            self.blend_opacity_values,
+                            max_layers=2,
+                            update_callback=update_progress,
+                            solution_cache=solution_cache,
+                            importance_threshold=importance_threshold,
+                            importance_dilation=importance_dilation
+                        )
+                    else:
+                        # Fall back to single-threaded for small images
+                        from lib.color_blending import create_layered_colors_map
+                        self.layered_colors_map = create_layered_colors_map(
+                            temp_img,
+                            background_color,
+                            self.base_palette_colors,
+                            self.blend_opacity_values,
+                            max_layers=2,
+                            update_callback=update_progress,
+                            solution_cache=solution_cache,
+                            importance_threshold=importance_threshold,
+                            importance_dilation=importance_dilation
+                        )
+                except (ImportError, AttributeError) as e:
+                    # Fall back to single-threaded if multiprocessing fails
+                    self.parent.ui.log_TextEdit.append(f"Using single-threaded processing: {str(e)}")
                     from lib.color_blending import create_layered_colors_map
                     self.layered_colors_map = create_layered_colors_map(
                         temp_img,
                         background_color,
                         self.base_palette_colors,
-                        self.opacity_values,
+                        self.blend_opacity_values,
                         max_layers=2,
-                        update_callback=update_progress
+                        update_callback=update_progress,
+                        solution_cache=solution_cache,
+                        importance_threshold=importance_threshold,
+                        importance_dilation=importance_dilation
                     )
-            except (ImportError, AttributeError) as e:
-                # Fall back to single-threaded if multiprocessing fails
-                self.parent.ui.log_TextEdit.append(f"Using single-threaded processing: {str(e)}")
-                from lib.color_blending import create_layered_colors_map
-                self.layered_colors_map = create_layered_colors_map(
-                    temp_img,
-                    background_color,
-                    self.base_palette_colors,
-                    self.opacity_values,
-                    max_layers=2,
-                    update_callback=update_progress
-                )
                 
             # Close the progress dialog
             self.progress_dialog.close()
@@ -556,28 +859,41 @@ class rustDaVinci:
                 return None
                 
             # Create the simulated output image
-            from lib.color_blending import simulate_layered_image
-            self.simulated_img = simulate_layered_image(
-                temp_img,
-                background_color,
-                self.base_palette_colors,
-                self.opacity_values,
-                self.layered_colors_map
-            )
+            with profiler.span("simulate", "solve"):
+                from lib.tiled_processing import TiledLayers
+                if isinstance(self.layered_colors_map, TiledLayers):
+                    self.simulated_img = self.layered_colors_map.simulate(
+                        background_color, self.base_palette_colors, self.blend_opacity_values
+                    )
+                else:
+                    from lib.color_blending import simulate_layered_image
+                    self.simulated_img = simulate_layered_image(
+                        temp_img,
+                        background_color,
+                        self.base_palette_colors,
+                        self.blend_opacity_values,
+                        self.layered_colors_map
+                    )
             
             # Cache the calculation results
-            self.color_calculation_cache = {
+            self.color_calculation_cache.update({
                 'resized_img': temp_img,
                 'layered_colors_map': self.layered_colors_map,
                 'simulated_img': self.simulated_img,
                 'background_color': background_color
-            }
+            })
             
             # Convert the simulated image to PIL format for quantization
             quantized_img = self.simulated_img
             
             # Log statistics
-            pixel_count = sum(1 for _ in self.layered_colors_map.values())
+            solve_stats = solution_cache['last_stats']
+            if solve_stats['reused']:
+                self.parent.ui.log_TextEdit.append(
+                    f"Reused {solve_stats['reused']:,} cached color solutions, " +
+                    f"calculated {solve_stats['solved']:,} new ones"
+                )
+            pixel_count = len(self.layered_colors_map)
             self.parent.ui.log_TextEdit.append(
                 f"Optimal color layering complete: {pixel_count:,} pixels will be painted " +
                 f"({pixel_count / total_pixels:.1%} of image)"
@@ -606,10 +922,9 @@ class rustDaVinci:
     def create_pixmaps(self):
         """Create quantized pixmaps"""
         try:
-            # Get background color
-            bg_color_hex = self.settings.value("background_color", default_settings["background_color"])
-            bg_color_rgb = hex_to_rgb(bg_color_hex)
-            self.update_palette(bg_color_rgb)
+            # Settings of this solve, used by optimized_quantize_to_palette
+            settings = self.take_settings_snapshot()
+            self.update_palette(settings.background_rgb)
             
             # Generate the optimized image with layered colors
             # This replaces the previous quantization method with our new one
@@ -621,14 +936,8 @@ class rustDaVinci:
                 self.parent.ui.log_TextEdit.append("Image processing cancelled or failed. Please try again.")
                 return
             
-            # Save optimized image to use for both normal and high quality previews
-            # (since they're now identical - we always use the best quality)
-            optimized_img.save("temp_optimized.png")
-            optimized_pixmap = QPixmap("temp_optimized.png")
-            os.remove("temp_optimized.png")
-            
-            # Use the same high-quality optimized image for both normal and high quality
-            self.quantized_img_pixmap = optimized_pixmap
+            # Convert the optimized image in memory for the preview
+            self.quantized_img_pixmap = pil_to_qpixmap(optimized_img)
             
             self.org_img_ok = True
             self.parent.ui.log_TextEdit.append("Image processed with optimal color layering.")
@@ -650,6 +959,30 @@ class rustDaVinci:
             return False
             
         try:
+            # An imported plan is painted pixel for pixel, centered on the canvas
+            if self.imported_plan is not None and self.color_calculation_cache['layered_colors_map'] is not None:
+                plan_w, plan_h = self.imported_plan["width"], self.imported_plan["height"]
+                if self.color_calculation_cache['background_color'] != self.snapshot.background_rgb:
+                    self.parent.ui.log_TextEdit.append("Background color differs from the imported plan, solving the plan image...")
+                elif plan_w > self.canvas_w or plan_h > self.canvas_h:
+                    self.parent.ui.log_TextEdit.append(
+                        f"The imported plan ({plan_w} x {plan_h}) does not fit on the canvas, solving the plan image..."
+                    )
+                else:
+                    self.quantized_img = self.color_calculation_cache['simulated_img']
+                    self.layered_colors_map = self.color_calculation_cache['layered_colors_map']
+                    self.canvas_x += (self.canvas_w - plan_w) // 2
+                    self.canvas_y += (self.canvas_h - plan_h) // 2
+                    self.canvas_w = plan_w
+                    self.canvas_h = plan_h
+                    self.parent.ui.log_TextEdit.append("Painting the imported plan without solving...")
+                    return True
+                # From here on the plan image is solved like any other image
+                self.imported_plan = None
+
+            # The canvas size is only known now, it may need another decode size than at load time
+            self.refresh_source_decode()
+
             org_img_w = self.org_img.size[0]
             org_img_h = self.org_img.size[1]
 
@@ -662,21 +995,22 @@ class rustDaVinci:
             x_correction = 0
             y_correction = 0
 
-            # Use Image.LANCZOS instead of deprecated Image.ANTIALIAS
-            if hsize <= self.canvas_h:
-                resized_img = self.org_img.resize((self.canvas_w, hsize), Image.LANCZOS)
-                y_correction = int((self.canvas_h - hsize) / 2)
-            elif wsize <= self.canvas_w:
-                resized_img = self.org_img.resize((wsize, self.canvas_h), Image.LANCZOS)
-                x_correction = int((self.canvas_w - wsize) / 2)
-            else:
-                resized_img = self.org_img.resize(
-                    (self.canvas_w, self.canvas_h), Image.LANCZOS
-                )
+            with profiler.span("resize", size=(self.canvas_w, self.canvas_h)):
+                # Use Image.LANCZOS instead of deprecated Image.ANTIALIAS
+                if hsize <= self.canvas_h:
+                    resized_img = self.org_img.resize((self.canvas_w, hsize), Image.LANCZOS)
+                    y_correction = int((self.canvas_h - hsize) / 2)
+                elif wsize <= self.canvas_w:
+                    resized_img = self.org_img.resize((wsize, self.canvas_h), Image.LANCZOS)
+                    x_correction = int((self.canvas_w - wsize) / 2)
+                else:
+                    resized_img = self.org_img.resize(
+                        (self.canvas_w, self.canvas_h), Image.LANCZOS
+                    )
 
             # Get background color for comparison
-            bg_color_hex = self.settings.value("background_color", default_settings["background_color"])
-            bg_color_rgb = hex_to_rgb(bg_color_hex)
+            settings = self.snapshot
+            bg_color_rgb = settings.background_rgb
             
             # Get the current loaded image path for cache saving
             current_image_path = self.settings.value("folder_path", "")
@@ -687,6 +1021,8 @@ class rustDaVinci:
             # First try to use cached calculations if available
             if (self.color_calculation_cache['resized_img'] is not None and
                 self.color_calculation_cache['background_color'] == bg_color_rgb and
+                tuple(self.opacity_values) == settings.opacity_levels and
+                self.blend_opacity_values == self.blend_opacities(settings) and
                 self.color_calculation_cache['simulated_img'] is not None and
                 resized_img.size == self.color_calculation_cache['resized_img'].size):
                 
@@ -697,8 +1033,19 @@ class rustDaVinci:
                 self.quantized_img = self.color_calculation_cache['simulated_img']
                 self.layered_colors_map = self.color_calculation_cache['layered_colors_map']
             else:
-                # Need to reprocess if any of these essential settings have changed
-                need_reprocess = False
+                # Background color or canvas size changed. The solution cache keeps the
+                # per-color solutions, so only colors that were never solved for this
+                # background get calculated instead of a full recompute.
+                need_reprocess = True
+                if self.color_calculation_cache['resized_img'] is not None:
+                    if self.color_calculation_cache['background_color'] != bg_color_rgb:
+                        self.parent.ui.log_TextEdit.append("Background color changed, re-solving cached colors...")
+                    elif tuple(self.opacity_values) != settings.opacity_levels:
+                        self.parent.ui.log_TextEdit.append("Opacity levels changed, re-solving the image...")
+                    elif self.blend_opacity_values != self.blend_opacities(settings):
+                        self.parent.ui.log_TextEdit.append("Blend calibration changed, re-solving the image...")
+                    else:
+                        self.parent.ui.log_TextEdit.append("Canvas size changed, re-mapping cached color solutions...")
                 
             # If no cache or if we need to reprocess, calculate optimal colors
             if need_reprocess or self.quantized_img is None:
@@ -708,8 +1055,9 @@ class rustDaVinci:
                     QApplication.processEvents()
                     
                     # Store the new calculation
-                    self.color_calculation_cache['resized_img'] = resized_img.copy()
+                    self.color_calculation_cache['resized_img'] = resized_img
                     self.color_calculation_cache['background_color'] = bg_color_rgb
+                    self.color_calculation_cache['simulated_img'] = None
                     
                     self.quantized_img = self.optimized_quantize_to_palette(resized_img)
                     
@@ -718,16 +1066,12 @@ class rustDaVinci:
                         self.parent.ui.log_TextEdit.append("Optimal quantization failed, using standard quantization...")
                         self.quantized_img = self.quantize_to_palette(resized_img)
                     else:
-                        # Store the result in the cache
-                        self.color_calculation_cache['simulated_img'] = self.quantized_img.copy()
+                        # Store the result in the cache (images are never modified in place, no copy needed)
+                        self.color_calculation_cache['simulated_img'] = self.quantized_img
                         self.color_calculation_cache['layered_colors_map'] = self.layered_colors_map
                         
                         # Save calculation to cache file if setting is enabled
-                        auto_save_cache = bool(
-                            self.settings.value("auto_save_cache", True)
-                        )
-                        
-                        if auto_save_cache and current_image_path and os.path.isfile(current_image_path):
+                        if settings.auto_save_cache and current_image_path and os.path.isfile(current_image_path):
                             self.save_calculation_cache(current_image_path)
                         
                 except Exception as e:
@@ -749,6 +1093,7 @@ class rustDaVinci:
             self.canvas_y += y_correction
             self.canvas_w = self.quantized_img.size[0]
             self.canvas_h = self.quantized_img.size[1]
+            self.report_memory("convert")
             return True
             
         except Exception as e:
@@ -757,6 +1102,21 @@ class rustDaVinci:
             self.parent.ui.log_TextEdit.append(traceback.format_exc())
             return False
 
+    def blend_opacities(self, settings):
+        """Opacities the layers of every opacity level blend with, the measured effective
+        opacities if the blending has been calibrated (see lib/blend_calibration.py)
+        
+        Args:
+            settings: SettingsSnapshot of the job
+            
+        Returns:
+            list: Blend opacity per opacity level
+        """
+        if not settings.use_blend_calibration:
+            return list(settings.opacity_levels)
+        from lib.blend_calibration import calibrated_opacities, load_calibration
+        return calibrated_opacities(settings.opacity_levels, load_calibration())
+
     def update_palette(self, rgb_background):
         """Update the palette used for image quantization with the new 4x16 color grid"""
         # Find the background color in the rust_palette list
@@ -769,7 +1129,7 @@ class rustDaVinci:
         # Store background color indices for skip_colors list (used only during painting)
         # This doesn't affect the color palette used for image quantization
         self.background_opacities = []
-        if self.settings.value("skip_background_color", default_settings["skip_background_color"]):
+        if self.snapshot.skip_background_color:
             self.background_opacities = [background_index]
 
         # Create a new palette image with the right mode
@@ -810,13 +1170,10 @@ class rustDaVinci:
         """
         try:
             # Get the background color from settings
-            bg_color_hex = self.settings.value(
-                "background_color", default_settings["background_color"]
-            )
-            bg_color_rgb = hex_to_rgb(bg_color_hex)
+            bg_color_rgb = self.snapshot.background_rgb
             
-            # Prepare the image
-            temp_img = image.copy()
+            # Prepare the image (every step below creates a new image, the input is never modified)
+            temp_img = image
             if temp_img.mode == "RGBA":
                 # Handle transparency by replacing it with the background color
                 bg = Image.new('RGB', temp_img.size, bg_color_rgb)
@@ -832,10 +1189,7 @@ class rustDaVinci:
             
             # Determine if we use dithering
             dither_mode = False
-            if not pixmap:
-                quality = int(self.settings.value("quality", default_settings["quality"]))
-                dither_mode = (quality == 1)  # True for high quality
-            else:
+            if pixmap:
                 dither_mode = (pixmap_q == 1)  # True for dithered preview
             
             # Use a third-party PIL-compatible quantization library for better results
@@ -894,6 +1248,8 @@ class rustDaVinci:
         self.org_img = None
         self.quantized_img = None
         self.org_img_ok = False
+        self.imported_plan = None
+        self.image_source = None
         self.update()
 
     def locate_canvas_area(self):
@@ -919,6 +1275,7 @@ class rustDaVinci:
 
         self.parent.hide()
         # Pass the preview image to the capture_area function
+        from lib.captureArea import capture_area
         canvas_area = capture_area(preview_image=preview_img)
         self.parent.show()
 
@@ -983,6 +1340,7 @@ class rustDaVinci:
             return False
 
         self.parent.hide()
+        from lib.captureArea import capture_area
         ctrl_area = capture_area()
         self.parent.show()
 
@@ -1079,36 +1437,150 @@ class rustDaVinci:
                     ctrl_h
                     False, if no control area was found
         """
-        screenshot = pyautogui.screenshot()
-        screen_w, screen_h = screenshot.size
+        if self.control_area_detector is None:
+            from lib.control_area_detection import ControlAreaDetector
+            self.control_area_detector = ControlAreaDetector()
+            # Check the saved control area first
+            settings = self.snapshot
+            self.control_area_detector.remember(settings.ctrl_x, settings.ctrl_y, settings.ctrl_w, settings.ctrl_h)
+
+        screenshot = get_screen_capture().grab()
+        return self.control_area_detector.detect(screenshot)
+
+    def calibrate_blending(self):
+        """Paint test swatches on an empty canvas, capture them and fit the blend opacities
+        of the opacity levels (see lib/blend_calibration.py)"""
+        from lib.blend_calibration import CALIBRATION_COLORS, SwatchLayout, save_capture
+
+        self.update()  # Settings snapshot, click, line, ctrl_area delay
+        settings = self.snapshot
+        if not settings.has_control_area:
+            msg = QMessageBox(self.parent)
+            msg.setIcon(QMessageBox.Icon.Warning)
+            msg.setText("Locate the painting controls area before calibrating the blending.")
+            msg.exec()
+            return False
+        self.start_profiling()
+
+        self.pause_key = settings.pause_key.lower()
+        self.skip_key = settings.skip_key.lower()
+        self.abort_key = settings.abort_key.lower()
+
+        layout = SwatchLayout(CALIBRATION_COLORS, settings.opacity_levels)
+        width, height = layout.size
+        msg = QMessageBox(self.parent)
+        msg.setIcon(QMessageBox.Icon.Information)
+        msg.setWindowTitle("Calibrate Blending")
+        msg.setText(
+            f"Test swatches of {len(layout.color_indices)} colors at {len(layout.opacity_values)} opacity levels "
+            f"are painted and measured.\n\nSelect an empty canvas of at least {width} x {height} pixels, "
+            f"filled with the background color {settings.background_color}."
+        )
+        msg.setStandardButtons(QMessageBox.StandardButton.Ok | QMessageBox.StandardButton.Cancel)
+        if msg.exec() == QMessageBox.StandardButton.Cancel:
+            return False
+        if not self.locate_canvas_area():
+            return False
+        if self.canvas_w < width or self.canvas_h < height:
+            self.parent.ui.log_TextEdit.append(
+                f"Error: The canvas is {self.canvas_w} x {self.canvas_h}, the swatches need {width} x {height}"
+            )
+            return False
+
+        # The swatches are painted like any plan, one horizontal line per swatch row
+        swatch_plan = {}
+        for color_idx, opacity_idx, x0, y0, x1, y1 in layout.swatches():
+            swatch_plan[(color_idx, opacity_idx)] = {
+                'h_lines': [(x0, y, x1 - 1) for y in range(y0, y1)], 'v_lines': [], 'd_lines': [], 'points': []
+            }
+        plan_summary = summarize_plan(swatch_plan)
+        total_operations = plan_summary['h_line'] + len(swatch_plan)
+        self.estimated_time = int(self.time_estimator.estimate(plan_summary))
+
+        self.calculate_ctrl_tools_positioning()
+        if self.updated_palette is None:
+            self.update_palette(settings.background_rgb)
+        painted_levels, painted_palette = self.opacity_values, self.base_palette_colors
+        self.opacity_values = list(layout.opacity_values)
+        self.base_palette_colors = self.base_palette_colors or rust_palette[:64]
+
+        listener, start_time = self.begin_painting_session(settings)
+        try:
+            self.prepare_canvas(settings)
+            painted = self.paint_precomputed_lines(swatch_plan, total_operations, start_time, settings)
+        finally:
+            self.opacity_values, self.base_palette_colors = painted_levels, painted_palette
+        if not painted:
+            self.shutdown(listener, start_time, 1)
+            return False
 
-        image_gray = cv2.cvtColor(numpy.array(screenshot), cv2.COLOR_BGR2GRAY)
+        time.sleep(1)  # Let the game draw the last strokes
+        capture = get_screen_capture().grab((self.canvas_x, self.canvas_y, width, height))
+        path = save_capture(capture, layout, settings.background_rgb)
+        self.shutdown(listener, start_time)
+        self.parent.ui.log_TextEdit.append(f"Swatch capture saved: {path}")
+        return self.fit_blend_calibration(capture, layout, settings.background_rgb)
 
-        tmpl = cv2.imread("opencv_template/rust_palette_template.png", 0)
-        tmpl_w, tmpl_h = tmpl.shape[::-1]
+    def calibrate_blending_from_capture(self):
+        """Fit the blend opacities from a swatch capture saved by calibrate_blending"""
+        from lib.blend_calibration import DEFAULT_CAPTURE_DIRECTORY, load_capture
 
-        x_coord, y_coord = 0, 0
-        threshold = 0.8
+        folder_path = DEFAULT_CAPTURE_DIRECTORY if os.path.exists(DEFAULT_CAPTURE_DIRECTORY) else QDir.homePath()
+        path = QFileDialog.getOpenFileName(
+            parent=self.parent, caption="Select a swatch capture", directory=folder_path, filter="Swatch captures (*.png)"
+        )[0]
+        if not path:
+            return False
+        try:
+            capture, layout, background_color = load_capture(path)
+        except Exception as e:
+            msg = QMessageBox(self.parent)
+            msg.setIcon(QMessageBox.Icon.Critical)
+            msg.setText("ERROR! Could not load the swatch capture...")
+            msg.setInformativeText(str(e))
+            msg.exec()
+            return False
+        return self.fit_blend_calibration(capture, layout, background_color)
 
-        for loop in range(50):
-            matches = cv2.matchTemplate(image_gray, tmpl, cv2.TM_CCOEFF_NORMED)
-            loc = numpy.where(matches >= threshold)
+    def fit_blend_calibration(self, capture, layout, background_color):
+        """Measure a swatch capture, fit and store the blend opacities
 
-            x_list, y_list = [], []
-            for point in zip(*loc[::-1]):
-                x_list.append(point[0])
-                y_list.append(point[1])
+        Args:
+            capture: PIL Image of the painted swatches
+            layout: SwatchLayout of the swatches
+            background_color: RGB tuple of the background the swatches were painted on
 
-            if x_list:
-                x_coord = int(sum(x_list) / len(x_list))
-                y_coord = int(sum(y_list) / len(y_list))
-                return x_coord, y_coord, tmpl_w, tmpl_h
+        Returns:
+            bool: True if the calibration was stored
+        """
+        from lib.blend_calibration import measure_swatches, fit_blend_coefficients, save_calibration
 
-            tmpl_w, tmpl_h = int(tmpl.shape[1] * 1.035), int(tmpl.shape[0] * 1.035)
-            tmpl = cv2.resize(tmpl, (int(tmpl_w), int(tmpl_h)))
+        try:
+            measured = measure_swatches(capture, layout)
+        except ValueError as e:
+            self.parent.ui.log_TextEdit.append(f"Error measuring the swatches: {str(e)}")
+            return False
+        calibration = fit_blend_coefficients(measured, layout, background_color, rust_palette[:64])
+        if all(effective is None for effective in calibration['effective']):
+            self.parent.ui.log_TextEdit.append("No swatch differs enough from the background, calibration not stored")
+            return False
 
-            if tmpl_w > screen_w or tmpl_h > screen_h or loop == 49:
-                return False
+        for nominal, effective, error, samples in zip(calibration['opacity_values'], calibration['effective'],
+                                                      calibration['rms_error'], calibration['samples']):
+            if effective is None:
+                self.parent.ui.log_TextEdit.append(f"Opacity {nominal:.0%}: not measured")
+            else:
+                self.parent.ui.log_TextEdit.append(
+                    f"Opacity {nominal:.0%}: blends like {effective:.1%} (RMS error {error:.1f}, {samples} samples)"
+                )
+        save_calibration(calibration)
+        if self.snapshot.use_blend_calibration:
+            self.parent.ui.log_TextEdit.append("Blend calibration saved, the next color calculation uses it")
+        else:
+            self.parent.ui.log_TextEdit.append(
+                "Blend calibration saved, enable use_blend_calibration in the settings to use it"
+            )
+        return True
 
     def calculate_ctrl_tools_positioning(self):
         """This function calculates the positioning of the different controls in the painting control area.
@@ -1126,22 +1598,23 @@ class rustDaVinci:
         self.ctrl_opacity = []
         self.ctrl_color = []
 
-        ctrl_x = int(self.settings.value("ctrl_x", default_settings["ctrl_x"]))
-        ctrl_y = int(self.settings.value("ctrl_y", default_settings["ctrl_y"]))
-        ctrl_w = int(self.settings.value("ctrl_w", default_settings["ctrl_w"]))
-        ctrl_h = int(self.settings.value("ctrl_h", default_settings["ctrl_h"]))
+        settings = self.snapshot
+        ctrl_x, ctrl_y, ctrl_w, ctrl_h = settings.ctrl_x, settings.ctrl_y, settings.ctrl_w, settings.ctrl_h
+
+        # Positions for the test overlay, written in one batch at the end
+        overlay = {}
 
         # Update button position (at 50% from left, 105.56% from top)
         self.ctrl_update = (ctrl_x + (ctrl_w * 0.5), ctrl_y + (ctrl_h * 1.0556))
         # Store in settings for the test overlay
-        self.settings.setValue("overlay_update_x", self.ctrl_update[0])
-        self.settings.setValue("overlay_update_y", self.ctrl_update[1])
+        overlay["overlay_update_x"] = self.ctrl_update[0]
+        overlay["overlay_update_y"] = self.ctrl_update[1]
 
         # Size box for text input (at 89.54% from left, 29.96% from top)
         self.ctrl_size.append((ctrl_x + (ctrl_w * 0.8954), ctrl_y + (ctrl_h * 0.2996)))
         # Store in settings for the test overlay
-        self.settings.setValue("overlay_size_x", self.ctrl_size[0][0])
-        self.settings.setValue("overlay_size_y", self.ctrl_size[0][1])
+        overlay["overlay_size_x"] = self.ctrl_size[0][0]
+        overlay["overlay_size_y"] = self.ctrl_size[0][1]
 
         # Brush types
         # Paint Brush is 38.17% from the left edge and 9.54% from the top edge
@@ -1157,17 +1630,17 @@ class rustDaVinci:
         
         # Store brush positions in settings for the test overlay
         for i, pos in enumerate(self.ctrl_brush):
-            self.settings.setValue(f"overlay_brush_{i}_x", pos[0])
-            self.settings.setValue(f"overlay_brush_{i}_y", pos[1])
-        self.settings.setValue("overlay_brush_count", len(self.ctrl_brush))
+            overlay[f"overlay_brush_{i}_x"] = pos[0]
+            overlay[f"overlay_brush_{i}_y"] = pos[1]
+        overlay["overlay_brush_count"] = len(self.ctrl_brush)
 
         # Opacity box for text input (at 89.54% from left, 39.25% from top)
         self.ctrl_opacity.append(
             (ctrl_x + (ctrl_w * 0.8954), ctrl_y + (ctrl_h * 0.3925))
         )
         # Store in settings for the test overlay
-        self.settings.setValue("overlay_opacity_x", self.ctrl_opacity[0][0])
-        self.settings.setValue("overlay_opacity_y", self.ctrl_opacity[0][1])
+        overlay["overlay_opacity_x"] = self.ctrl_opacity[0][0]
+        overlay["overlay_opacity_y"] = self.ctrl_opacity[0][1]
 
         # Calculate color grid positions
         # First row and column of colors is 52.03% down from the top edge, 14.68% from the left edge
@@ -1188,11 +1661,14 @@ class rustDaVinci:
                 self.ctrl_color.append((color_x, color_y))
                 # Store color grid positions in settings for the test overlay
                 color_idx = row * 4 + column
-                self.settings.setValue(f"overlay_color_{color_idx}_x", color_x)
-                self.settings.setValue(f"overlay_color_{color_idx}_y", color_y)
+                overlay[f"overlay_color_{color_idx}_x"] = color_x
+                overlay[f"overlay_color_{color_idx}_y"] = color_y
                 
         # Store total color count
-        self.settings.setValue("overlay_color_count", len(self.ctrl_color))
+        overlay["overlay_color_count"] = len(self.ctrl_color)
+
+        # One debounced write of the values that changed, instead of a registry/ini write per key
+        self.overlay_writer.set_values(overlay)
 
     def calculate_statistics(self):
         """Calculate what colors, how many pixels and lines for the painting
@@ -1201,94 +1677,66 @@ class rustDaVinci:
                     self.pixels,
                     self.lines
         """
-        minimum_line_width = int(
-            self.settings.value(
-                "minimum_line_width", default_settings["minimum_line_width"]
-            )
-        )
+        minimum_line_width = self.snapshot.minimum_line_width
         self.update_skip_colors()
-        pixel_arr = self.quantized_img.load()
+
+        # Palette index per pixel; RGB images (layered painting) are indexed by their unique colors
+        if self.quantized_img.mode == "P":
+            index_array = numpy.asarray(self.quantized_img)
+            color_values = list(range(int(index_array.max()) + 1))
+            skip = set(self.skip_colors)
+        else:
+            rgb = numpy.asarray(self.quantized_img.convert("RGB"), dtype=numpy.uint32)
+            packed = (rgb[..., 0] << 16) | (rgb[..., 1] << 8) | rgb[..., 2]
+            unique_packed, index_array = numpy.unique(packed, return_inverse=True)
+            index_array = index_array.reshape(packed.shape)
+            color_values = [
+                (int(c >> 16), int((c >> 8) & 0xFF), int(c & 0xFF)) for c in unique_packed
+            ]
+            # skip_colors holds palette indices, compare them as RGB
+            palette = self.updated_palette or []
+            skip = {tuple(palette[i]) for i in self.skip_colors if i < len(palette)}
+
+        pixel_counts, line_counts, point_counts = run_length_statistics(
+            index_array, minimum_line_width
+        )
 
         self.img_colors = []
         self.tot_pixels = 0
         self.pixels = 0
         self.lines = 0
 
-        for color in self.quantized_img.getcolors():
-            if color[1] not in self.skip_colors:
-                self.tot_pixels += color[0]
-                self.img_colors.append(color[1])
-
-        for color in self.img_colors:
-            is_first_point_of_row = True
-            is_last_point_of_row = False
-            is_previous_color = False
-            is_line = False
-            pixels_in_line = 0
-
-            for y in range(self.canvas_h):
-                is_first_point_of_row = True
-                is_last_point_of_row = False
-                is_previous_color = False
-                is_line = False
-                pixels_in_line = 0
-
-                for x in range(self.canvas_w):
-                    if x == (self.canvas_w - 1):
-                        is_last_point_of_row = True
-
-                    if is_first_point_of_row:
-                        is_first_point_of_row = False
-                        if pixel_arr[x, y] == color:
-                            is_previous_color = True
-                            pixels_in_line = 1
-                        continue
-
-                    if pixel_arr[x, y] == color:
-                        if is_previous_color:
-                            if is_last_point_of_row:
-                                if pixels_in_line >= minimum_line_width:
-                                    self.lines += 1
-                                else:
-                                    self.pixels += pixels_in_line + 1
-                            else:
-                                is_line = True
-                                pixels_in_line += 1
-                        else:
-                            if is_last_point_of_row:
-                                self.pixels += 1
-                            else:
-                                is_previous_color = True
-                                pixels_in_line = 1
-                    else:
-                        if is_previous_color:
-                            if is_line:
-                                is_line = False
-
-                                if is_last_point_of_row:
-                                    if pixels_in_line >= minimum_line_width:
-                                        self.lines += 1
-                                    else:
-                                        self.pixels += pixels_in_line + 1
-                                    continue
-
-                                if pixels_in_line >= minimum_line_width:
-                                    self.lines += 1
-                                else:
-                                    self.pixels += pixels_in_line + 1
-                                pixels_in_line = 0
-                            else:
-                                self.pixels += 1
-                            is_previous_color = False
-                        else:
-                            is_line = False
-                            pixels_in_line = 0
+        for idx, color in enumerate(color_values):
+            if pixel_counts[idx] == 0 or color in skip:
+                continue
+            self.img_colors.append(color)
+            self.tot_pixels += int(pixel_counts[idx])
+            self.pixels += int(point_counts[idx])
+            self.lines += int(line_counts[idx])
 
     def calculate_estimated_time(self):
         """Calculate estimated time for the painting process.
         Updates:    Estimated time for clicking and lines
                     Estimated time for only clicking
         """
+        if self.time_estimator.is_calibrated():
+            # Points are clicks, the remaining pixels are painted as horizontal lines
+            summary = {
+                "click": self.pixels,
+                "h_line": self.lines,
+                "h_line_length": self.tot_pixels - self.pixels,
+                "control_change": len(self.img_colors) + 1,
+            }
+            est_time_lines = int(self.time_estimator.estimate(summary))
+            est_time_click = int(self.time_estimator.estimate(
+                {"click": self.tot_pixels, "control_change": len(self.img_colors) + 1}
+            ))
+            self.prefer_lines = self.snapshot.draw_lines and est_time_lines < est_time_click
+            self.estimated_time = est_time_lines if self.prefer_lines else est_time_click
+            self.parent.ui.log_TextEdit.append(f"Time estimation: {time.strftime('%H:%M:%S', time.gmtime(self.estimated_time))}")
+            self.parent.ui.log_TextEdit.append(f"(Calibrated from {self.time_estimator.sample_count()} recorded operations)")
+            return
+
         # Base time factors
         one_click_time = self.click_delay + 0.001
         one_line_time = (self.line_delay * 5) + 0.0035
@@ -1319,7 +1767,7 @@ class rustDaVinci:
         est_time_lines = int((raw_est_time_lines * performance_factor) + color_change_overhead)
         est_time_click = int((raw_est_time_click * performance_factor) + color_change_overhead)
 
-        if not bool(self.settings.value("draw_lines", default_settings["draw_lines"])):
+        if not self.snapshot.draw_lines:
             self.prefer_lines = False
             self.estimated_time = est_time_click
         elif est_time_lines < est_time_click:
@@ -1442,12 +1890,18 @@ class rustDaVinci:
         if state == 0:
             self.parent.ui.progress_ProgressBar.setValue(100)
 
+        # Keep the recorded operation timings for the next time estimate
+        self.time_estimator.fit()
+        self.time_estimator.save()
+        self.finish_profiling("paint")
+
         # Clear the last used color/brush/opacity settings
         self.clear_last_painting_settings()
 
-        if bool(
-            self.settings.value("window_topmost", default_settings["window_topmost"])
-        ):
+        # Store the overlay positions now instead of waiting for the debounce timer
+        self.overlay_writer.flush()
+
+        if self.snapshot.window_topmost:
             self.parent.setWindowFlags(
                 self.parent.windowFlags() & ~Qt.WindowStaysOnTopHint
             )
@@ -1540,15 +1994,8 @@ class rustDaVinci:
             QApplication.processEvents()
 
         # 3. Set opacity (text input box) - only if changed
-        # Determine opacity value string for UI input
-        ui_opacity_value = actual_opacity
-        if actual_opacity == 0.75:
-            ui_opacity_value = 0.37
-        elif actual_opacity == 0.5:
-            ui_opacity_value = 0.25
-        elif actual_opacity == 0.25:
-            ui_opacity_value = 0.12
-        opacity_percent = str(ui_opacity_value)
+        # The opacity box value is not the blend opacity, see rust_opacity_ui_values
+        opacity_percent = str(opacity_ui_value(actual_opacity))
         
         # Only update opacity if it changed
         if self.current_ctrl_opacity != actual_opacity:
@@ -1607,24 +2054,14 @@ class rustDaVinci:
     def update_skip_colors(self):
         """Updates the skip colors list"""
         self.skip_colors = []
-        temp_skip_colors = self.settings.value(
-            "skip_colors", default_settings["skip_colors"], "QStringList"
-        )
-        if len(temp_skip_colors) != 0:
-            for color in temp_skip_colors:
-                if hex_to_rgb(color) in self.updated_palette:
-                    self.skip_colors.append(
-                        self.updated_palette.index(hex_to_rgb(color))
-                    )
+        for color in self.snapshot.skip_colors:
+            if hex_to_rgb(color) in self.updated_palette:
+                self.skip_colors.append(
+                    self.updated_palette.index(hex_to_rgb(color))
+                )
 
         # Add background color indices to skip_colors if skip_background_color is enabled
-        skip_background_color = bool(
-            self.settings.value(
-                "skip_background_color", default_settings["skip_background_color"]
-            )
-        )
-        
-        if skip_background_color and hasattr(self, 'background_opacities'):
+        if self.snapshot.skip_background_color and hasattr(self, 'background_opacities'):
             # Add all background opacities to skip colors
             self.skip_colors.extend(self.background_opacities)
 
@@ -1632,46 +2069,22 @@ class rustDaVinci:
 
     def start_painting(self):
         """Start the painting"""
+        # Read the settings once for the whole painting, nothing below touches QSettings
+        self.update()  # Settings snapshot, click, line, ctrl_area delay
+        settings = self.snapshot
+        self.start_profiling()
+
         # Update global variables
-        self.pause_key = str(
-            self.settings.value("pause_key", default_settings["pause_key"])
-        ).lower()
-        self.skip_key = str(
-            self.settings.value("skip_key", default_settings["skip_key"])
-        ).lower()
-        self.abort_key = str(
-            self.settings.value("abort_key", default_settings["abort_key"])
-        ).lower()
+        self.pause_key = settings.pause_key.lower()
+        self.skip_key = settings.skip_key.lower()
+        self.abort_key = settings.abort_key.lower()
 
         # Update local variables
-        minimum_line_width = int(
-            self.settings.value(
-                "minimum_line_width", default_settings["minimum_line_width"]
-            )
-        )
-        hide_preview_paint = bool(
-            self.settings.value(
-                "hide_preview_paint", default_settings["hide_preview_paint"]
-            )
-        )
-        update_canvas_end = bool(
-            self.settings.value(
-                "update_canvas_end", default_settings["update_canvas_end"]
-            )
-        )
-        window_topmost = bool(
-            self.settings.value("window_topmost", default_settings["window_topmost"])
-        )
-        update_canvas = bool(
-            self.settings.value("update_canvas", default_settings["update_canvas"])
-        )
-        show_info = bool(
-            self.settings.value(
-                "show_information", default_settings["show_information"]
-            )
-        )
+        minimum_line_width = settings.minimum_line_width
+        update_canvas_end = settings.update_canvas_end
+        update_canvas = settings.update_canvas
+        show_info = settings.show_information
 
-        self.update()  # Update click, line, ctrl_area delay
         self.update_skip_colors()  # Update self.skip_colors variable
         if not self.locate_canvas_area():
             return  # Locate the canvas
@@ -1694,25 +2107,51 @@ class rustDaVinci:
             # Continue with original painting method
             return self.start_standard_painting()
 
+        # Merge short runs into neighboring runs of nearly the same color (fewer strokes)
+        smoothing_delta_e = settings.stroke_smoothing_delta_e
+        if smoothing_delta_e > 0:
+            from lib.tiled_processing import TiledLayers
+            with profiler.span("smoothing", "plan"):
+                if isinstance(self.layered_colors_map, TiledLayers):
+                    # Strip by strip, the whole map never has to be in memory
+                    self.layered_colors_map, report = self.layered_colors_map.smooth(
+                        settings.background_rgb,
+                        self.base_palette_colors or rust_palette[:64],
+                        self.blend_opacity_values,
+                        max_delta_e=smoothing_delta_e,
+                        min_line_width=minimum_line_width,
+                    )
+                else:
+                    self.layered_colors_map, report = smooth_layer_runs(
+                        self.layered_colors_map,
+                        self.canvas_w,
+                        self.canvas_h,
+                        settings.background_rgb,
+                        self.base_palette_colors or rust_palette[:64],
+                        self.blend_opacity_values,
+                        max_delta_e=smoothing_delta_e,
+                        min_line_width=minimum_line_width,
+                    )
+            if report['strokes_before'] > 0:
+                reduction = 100 * (1 - report['strokes_after'] / report['strokes_before'])
+                self.parent.ui.log_TextEdit.append(
+                    f"Stroke smoothing: {report['strokes_before']} -> {report['strokes_after']} strokes "
+                    f"({reduction:.1f}% fewer), {report['pixels_changed']} pixels changed "
+                    f"(mean delta-E {report['mean_delta_e']:.2f}, max {report['max_delta_e']:.2f})"
+                )
+                QApplication.processEvents()
+
         # Using optimal layering painting method
         # Count total painting operations
-        total_operations = 0
-        color_counts = {}
-        
         # Count operations per color and opacity
-        for coords, layers in self.layered_colors_map.items():
-            for color_idx, opacity_idx in layers:
-                color_key = (color_idx, opacity_idx)
-                if color_key not in color_counts:
-                    color_counts[color_key] = 1
-                else:
-                    color_counts[color_key] += 1
-                total_operations += 1
+        color_counts = count_color_keys(self.layered_colors_map)
+        total_operations = sum(color_counts.values())
         
         # Precompute the horizontal, vertical, and diagonal lines to optimize painting
         self.parent.ui.log_TextEdit.append("Optimizing painting with line detection...")
         QApplication.processEvents()
-        precomputed_lines = self.precompute_painting_lines(color_counts)
+        with profiler.span("plan", "plan", pixels=total_operations):
+            precomputed_lines = self.precompute_painting_lines(color_counts)
                 
         # Recalculate operations and time estimate based on the optimizations
         total_operations = 0
@@ -1725,21 +2164,18 @@ class rustDaVinci:
             total_operations += len(precomputed_lines[color_key]['d_lines'])
             # Each point is one operation
             total_operations += len(precomputed_lines[color_key]['points'])
+            # Each large brush stroke is one operation
+            total_operations += len(precomputed_lines[color_key].get('brush_lines', ()))
         
         # Add color selection operations
         total_operations += len(precomputed_lines)
         
-        # Estimate time with optimized operations
-        one_click_time = self.click_delay + 0.001
-        one_line_time = (self.line_delay * 5) + 0.0035
-        set_paint_controls_time = len(precomputed_lines) * ((2 * self.click_delay) + (2 * self.ctrl_area_delay))
-        
-        # Calculate time based on operations
-        h_v_d_lines_count = sum(len(data['h_lines']) + len(data['v_lines']) + len(data['d_lines']) 
-                              for data in precomputed_lines.values())
-        points_count = sum(len(data['points']) for data in precomputed_lines.values())
-        painting_time = (h_v_d_lines_count * one_line_time) + (points_count * one_click_time)
-        self.estimated_time = int(painting_time + set_paint_controls_time)
+        # Estimate time with optimized operations, using timings recorded on this machine if available
+        plan_summary = summarize_plan(precomputed_lines)
+        h_v_d_lines_count = plan_summary['h_line'] + plan_summary['v_line'] + plan_summary['d_line']
+        points_count = plan_summary['click']
+        canvas_saves = (len(precomputed_lines) if update_canvas else 0) + (1 if update_canvas_end else 0)
+        self.estimated_time = int(self.time_estimator.estimate(plan_summary, canvas_saves))
 
         # Print statistics
         question = (
@@ -1748,9 +2184,13 @@ class rustDaVinci:
         question += "\nNumber of unique colors/opacities:\t" + str(len(precomputed_lines))
         question += f"\nTotal lines (h/v/diag): \t\t{h_v_d_lines_count}"
         question += f"\nTotal individual points: \t\t{points_count}"
+        if plan_summary['brush_line']:
+            question += f"\nLarge brush strokes: \t\t{plan_summary['brush_line']}"
         question += "\nEst. painting time:\t\t\t" + str(
             time.strftime("%H:%M:%S", time.gmtime(self.estimated_time))
         )
+        if self.time_estimator.is_calibrated():
+            question += f" (calibrated from {self.time_estimator.sample_count()} recorded operations)"
         question += "\n\nUsing optimal line painting for better speed and accuracy."
         question += "\nWould you like to start the painting?"
         
@@ -1767,6 +2207,27 @@ class rustDaVinci:
             if result == QMessageBox.StandardButton.No:
                 return
 
+        listener, start_time = self.begin_painting_session(settings)
+        self.prepare_canvas(settings)
+        if not self.paint_precomputed_lines(precomputed_lines, total_operations, start_time, settings):
+            return self.shutdown(listener, start_time, 1)
+        return self.shutdown(listener, start_time)
+
+    def begin_painting_session(self, settings):
+        """Lock the main window for painting, log the time estimate and start the hotkey listener
+        
+        Args:
+            settings: SettingsSnapshot of the painting job
+            
+        Returns:
+            tuple: (keyboard listener, start time), see shutdown
+        """
+        hide_preview_paint = settings.hide_preview_paint
+        window_topmost = settings.window_topmost
+
+        # Update the pyautogui delay
+        pyautogui.PAUSE = self.click_delay
+
         # Disable mainwindow buttons while painting
         self.parent.ui.load_image_PushButton.setEnabled(False)
         self.parent.ui.identify_ctrl_PushButton.setEnabled(False)
@@ -1797,9 +2258,46 @@ class rustDaVinci:
         )
         self.hotkey_label.show()
 
+        # Print out the start time, estimated time and estimated finish time
+        self.parent.ui.log_TextEdit.append(
+            "Start time:\t" + str((datetime.datetime.now()).time().strftime("%H:%M:%S"))
+        )
+        self.parent.ui.log_TextEdit.append(
+            "Est. time:\t"
+            + str(time.strftime("%H:%M:%S", time.gmtime(self.estimated_time)))
+        )
+        self.parent.ui.log_TextEdit.append(
+            "Est. finished:\t"
+            + str(
+                (
+                    datetime.datetime.now()
+                    + datetime.timedelta(seconds=self.estimated_time)
+                )
+                .time()
+                .strftime("%H:%M:%S")
+            )
+        )
+        QApplication.processEvents()
+
+        self.paused = False
+        self.abort = False
+        self.skip_current_color = False
+        start_time = time.time()
+
+        # Start keyboard listener
+        from pynput import keyboard
+        listener = keyboard.Listener(on_press=self.key_event)
+        listener.start()
+        return listener, start_time
+
+    def prepare_canvas(self, settings):
+        """Focus the Rust window and paint the background if the paint_background setting is set
+        
+        Args:
+            settings: SettingsSnapshot of the painting job
+        """
         # Paint the background with the default background color
-        bg_color_hex = self.settings.value("background_color", default_settings["background_color"])
-        bg_color_rgb = hex_to_rgb(bg_color_hex)
+        bg_color_rgb = settings.background_rgb
 
         empty_area_tuple = self.ctrl_size[0][0], self.ctrl_size[0][1] - 10
         
@@ -1807,19 +2305,19 @@ class rustDaVinci:
         time.sleep(1)
         self.click_pixel(empty_area_tuple)
         
-        if bool(self.settings.value("paint_background", default_settings["paint_background"])):
+        if settings.paint_background:
             self.parent.ui.log_TextEdit.append("Painting background...")
             
             # Find the background color index in our base colors
             background_idx = -1
-            for i, color in self.base_palette_colors:
+            for i, color in enumerate(self.base_palette_colors):
                 if color == bg_color_rgb:
                     background_idx = i
                     break
             
             if background_idx != -1:
                 # Background should use 100% opacity
-                self.choose_painting_controls(5, int(self.settings.value("brush_type", default_settings["brush_type"])), background_idx)
+                self.choose_painting_controls(5, settings.brush_type, background_idx)
                 
                 # Paint the background
                 x_start = self.canvas_x + 10
@@ -1831,39 +2329,26 @@ class rustDaVinci:
                         (x_end, self.canvas_y + (10 * i)),
                     )
 
-        # Print out the start time, estimated time and estimated finish time
-        self.parent.ui.log_TextEdit.append(
-            "Start time:\t" + str((datetime.datetime.now()).time().strftime("%H:%M:%S"))
-        )
-        self.parent.ui.log_TextEdit.append(
-            "Est. time:\t"
-            + str(time.strftime("%H:%M:%S", time.gmtime(self.estimated_time)))
-        )
-        self.parent.ui.log_TextEdit.append(
-            "Est. finished:\t"
-            + str(
-                (
-                    datetime.datetime.now()
-                    + datetime.timedelta(seconds=self.estimated_time)
-                )
-                .time()
-                .strftime("%H:%M:%S")
-            )
-        )
-        QApplication.processEvents()
-
-        self.paused = False
-        self.abort = False
+    def paint_precomputed_lines(self, precomputed_lines, total_operations, start_time, settings):
+        """Paint a plan on the current canvas (canvas_x, canvas_y), color by color
+        
+        Args:
+            precomputed_lines: Plan {(color_idx, opacity_idx): {'h_lines', 'v_lines', 'd_lines', 'points'}}
+            total_operations: Number of operations of the plan, for the progress bar
+            start_time: Time when painting started
+            settings: SettingsSnapshot of the painting job
+            
+        Returns:
+            bool: True if the plan was painted, False if the painting was aborted
+        """
+        if not precomputed_lines:
+            return True
+        update_canvas = settings.update_canvas
+        update_canvas_end = settings.update_canvas_end
+        brush_type = settings.brush_type
         operation_counter = 0
         progress_percent = 0
         previous_progress_percent = None
-
-        start_time = time.time()
-        brush_type = int(self.settings.value("brush_type", default_settings["brush_type"]))
-
-        # Start keyboard listener
-        listener = keyboard.Listener(on_press=self.key_event)
-        listener.start()
         
         # Create a sorted list of color keys based on color index first, then opacity index
         # This ensures colors are processed in a logical sequential order (1,2,3...) instead of by size
@@ -1874,7 +2359,63 @@ class rustDaVinci:
         self.current_operation_counter = operation_counter
         self.current_total_operations = total_operations
         self.start_status_update_timer(sorted_color_keys[0], precomputed_lines, operation_counter, total_operations, start_time)
-        
+
+        # Fill the large single color areas first with the large brush (see plan_brush_strokes),
+        # the normal strokes below leave the pixels the large brush covers alone
+        for color_key in sorted_color_keys:
+            brush_lines = precomputed_lines[color_key].get('brush_lines')
+            if not brush_lines:
+                continue
+            color_idx, opacity_idx = color_key
+            self.current_color_key = color_key
+
+            if self.abort:
+                self.parent.ui.log_TextEdit.append("Aborted...")
+                self.show_log_text()  # Show log instead of status
+                return False
+
+            brush_size = precomputed_lines[color_key]['brush_size']
+            self.parent.ui.log_TextEdit.append(
+                f"Painting {rgb_to_hex(self.base_palette_colors[color_idx])} large areas: " +
+                f"{len(brush_lines)} strokes with brush size {1 + 2 * brush_size}"
+            )
+            self.update_painting_status_ui(color_idx, opacity_idx, color_key, precomputed_lines,
+                                           operation_counter, total_operations, start_time)
+            QApplication.processEvents()
+
+            op_start = time.perf_counter()
+            self.choose_painting_controls(brush_size, brush_type, color_idx,
+                                          opacity_value=self.opacity_values[opacity_idx])
+            self.record_operation("control_change", time.perf_counter() - op_start)
+
+            for brush_line in brush_lines:
+                while self.paused:
+                    QApplication.processEvents()
+
+                if self.abort:
+                    self.parent.ui.log_TextEdit.append("Aborted...")
+                    self.show_log_text()  # Show log instead of status
+                    return False
+
+                if self.skip_current_color:
+                    break
+
+                start_x, y, end_x = brush_line
+                op_start = time.perf_counter()
+                self.draw_line((self.canvas_x + start_x, self.canvas_y + y), (self.canvas_x + end_x, self.canvas_y + y))
+                self.record_operation("brush_line", time.perf_counter() - op_start, line_length("brush_line", brush_line))
+                operation_counter += 1
+                self.current_operation_counter = operation_counter
+
+                # Update progress
+                progress_percent = int(operation_counter / total_operations * 100)
+                if progress_percent != previous_progress_percent:
+                    previous_progress_percent = progress_percent
+                    self.parent.ui.progress_ProgressBar.setValue(progress_percent)
+
+            # A skip during the large strokes only skips the large strokes of the color
+            self.skip_current_color = False
+
         # Paint each color/opacity combination using the precomputed lines in sequential order
         for color_key in sorted_color_keys:
             color_idx, opacity_idx = color_key
@@ -1885,7 +2426,7 @@ class rustDaVinci:
             if self.abort:
                 self.parent.ui.log_TextEdit.append("Aborted...")
                 self.show_log_text()  # Show log instead of status
-                return self.shutdown(listener, start_time, 1)
+                return False
                 
             if self.skip_current_color:
                 self.skip_current_color = False
@@ -1917,7 +2458,9 @@ class rustDaVinci:
             QApplication.processEvents()
             
             # Set painting controls for this color/opacity
+            op_start = time.perf_counter()
             self.choose_painting_controls(0, brush_type, color_idx, opacity_value=opacity)
+            self.record_operation("control_change", time.perf_counter() - op_start)
             
             # First paint horizontal lines
             for h_line in precomputed_lines[color_key]['h_lines']:
@@ -1927,7 +2470,7 @@ class rustDaVinci:
                 if self.abort:
                     self.parent.ui.log_TextEdit.append("Aborted...")
                     self.show_log_text()  # Show log instead of status
-                    return self.shutdown(listener, start_time, 1)
+                    return False
                     
                 if self.skip_current_color:
                     break
@@ -1941,7 +2484,9 @@ class rustDaVinci:
                 screen_y = self.canvas_y + y
                 
                 # Draw the horizontal line
+                op_start = time.perf_counter()
                 self.draw_line((screen_start_x, screen_y), (screen_end_x, screen_y))
+                self.record_operation("h_line", time.perf_counter() - op_start, line_length("h_line", h_line))
                 operation_counter += 1
                 self.current_operation_counter = operation_counter
                 
@@ -1964,7 +2509,7 @@ class rustDaVinci:
                 if self.abort:
                     self.parent.ui.log_TextEdit.append("Aborted...")
                     self.show_log_text()  # Show log instead of status
-                    return self.shutdown(listener, start_time, 1)
+                    return False
                     
                 if self.skip_current_color:
                     break
@@ -1978,7 +2523,9 @@ class rustDaVinci:
                 screen_end_y = self.canvas_y + end_y
                 
                 # Draw the vertical line
+                op_start = time.perf_counter()
                 self.draw_vertical_line((screen_x, screen_start_y), (screen_x, screen_end_y))
+                self.record_operation("v_line", time.perf_counter() - op_start, line_length("v_line", v_line))
                 operation_counter += 1
                 self.current_operation_counter = operation_counter
                 
@@ -2006,7 +2553,7 @@ class rustDaVinci:
                 if self.abort:
                     self.parent.ui.log_TextEdit.append("Aborted...")
                     self.show_log_text()  # Show log instead of status
-                    return self.shutdown(listener, start_time, 1)
+                    return False
                     
                 if self.skip_current_color:
                     break
@@ -2021,8 +2568,10 @@ class rustDaVinci:
                 screen_end_y = self.canvas_y + end_point[1]
                 
                 # Draw the diagonal line
+                op_start = time.perf_counter()
                 self.draw_diagonal_line((screen_start_x, screen_start_y), 
                                        (screen_end_x, screen_end_y))
+                self.record_operation("d_line", time.perf_counter() - op_start, line_length("d_line", d_line))
                 operation_counter += 1
                 self.current_operation_counter = operation_counter
                 
@@ -2050,7 +2599,7 @@ class rustDaVinci:
                 if self.abort:
                     self.parent.ui.log_TextEdit.append("Aborted...")
                     self.show_log_text()  # Show log instead of status
-                    return self.shutdown(listener, start_time, 1)
+                    return False
                     
                 if self.skip_current_color:
                     break
@@ -2060,7 +2609,9 @@ class rustDaVinci:
                 screen_y = self.canvas_y + point[1]
                 
                 # Paint the individual point
+                op_start = time.perf_counter()
                 self.click_pixel(screen_x, screen_y)
+                self.record_operation("click", time.perf_counter() - op_start)
                 operation_counter += 1
                 self.current_operation_counter = operation_counter
                 
@@ -2084,8 +2635,10 @@ class rustDaVinci:
                                             total_operations, start_time)
                 self.show_log_text()  # Show the log for the canvas update message
                 QApplication.processEvents()
+                op_start = time.perf_counter()
                 pyautogui.hotkey('ctrl', 's')
                 time.sleep(self.ctrl_area_delay)
+                self.record_operation("canvas_save", time.perf_counter() - op_start)
                 
             # Reset skip flag
             self.skip_current_color = False
@@ -2094,9 +2647,142 @@ class rustDaVinci:
         if update_canvas_end:
             self.parent.ui.log_TextEdit.append("Final canvas update with Ctrl+S")
             QApplication.processEvents()
+            op_start = time.perf_counter()
             pyautogui.hotkey('ctrl', 's')
             time.sleep(self.ctrl_area_delay)
+            self.record_operation("canvas_save", time.perf_counter() - op_start)
 
+        return True
+
+    def start_mosaic_painting(self):
+        """Paint the image over a grid of signs. The whole image is solved once, every sign is
+        planned in a worker process and the signs are painted one after the other."""
+        from lib.mosaic import MosaicLayout, fit_image, plan_mosaic
+
+        self.update()  # Settings snapshot, click, line, ctrl_area delay
+        settings = self.snapshot
+        self.start_profiling()
+
+        self.pause_key = settings.pause_key.lower()
+        self.skip_key = settings.skip_key.lower()
+        self.abort_key = settings.abort_key.lower()
+
+        if not self.org_img:
+            self.parent.ui.log_TextEdit.append("Error: No image loaded")
+            return
+
+        columns, ok = QInputDialog.getInt(
+            self.parent, "Mosaic", "Number of signs side by side (columns):", 2, 1, 32
+        )
+        if not ok:
+            return
+        rows, ok = QInputDialog.getInt(
+            self.parent, "Mosaic", "Number of signs on top of each other (rows):", 1, 1, 32
+        )
+        if not ok:
+            return
+
+        self.update_skip_colors()  # Update self.skip_colors variable
+        self.parent.ui.log_TextEdit.append("Select the canvas of the top left sign...")
+        if not self.locate_canvas_area():
+            return
+
+        # Every sign has the size of the first one
+        layout = MosaicLayout(columns, rows, self.canvas_w, self.canvas_h, settings.mosaic_gap)
+        mosaic_w, mosaic_h = layout.size
+        self.parent.ui.progress_ProgressBar.setValue(0)
+        self.parent.ui.log_TextEdit.clear()
+        self.parent.ui.log_TextEdit.append(
+            f"Mosaic of {columns} x {rows} signs ({layout.sign_width} x {layout.sign_height} each), "
+            f"solving the {mosaic_w} x {mosaic_h} image once for all signs..."
+        )
+        QApplication.processEvents()
+
+        with profiler.span("resize", size=layout.size):
+            mosaic_img = fit_image(self.org_img, layout, settings.background_rgb)
+        if self.optimized_quantize_to_palette(mosaic_img) is None:
+            self.parent.ui.log_TextEdit.append("Color calculation of the mosaic failed")
+            return
+
+        self.calculate_ctrl_tools_positioning()  # Calculate the control tools positioning
+
+        def update_progress(done, total):
+            self.parent.ui.progress_ProgressBar.setValue(int(done / total * 100))
+            self.parent.ui.log_TextEdit.append(f"Planned sign {done} of {total}")
+            QApplication.processEvents()
+
+        self.parent.ui.log_TextEdit.append(f"Planning {layout.sign_count} signs in parallel...")
+        QApplication.processEvents()
+        with profiler.span("plan", "plan", signs=layout.sign_count):
+            signs = plan_mosaic(
+                self.layered_colors_map,
+                layout,
+                settings.background_rgb,
+                self.base_palette_colors,
+                self.blend_opacity_values,
+                smoothing_delta_e=settings.stroke_smoothing_delta_e,
+                min_line_width=settings.minimum_line_width,
+                use_diagonal_lines=settings.use_diagonal_lines,
+                progress_callback=update_progress,
+                painting_opacity_values=self.opacity_values,
+                brush_size=settings.brush_region_size,
+                estimator=self.time_estimator,
+            )
+
+        # Time estimate of all signs, with one canvas save per color and sign
+        summaries = [summarize_plan(sign.plan) for sign in signs]
+        canvas_saves = sum(
+            (len(sign.plan) if settings.update_canvas else 0) + (1 if settings.update_canvas_end else 0)
+            for sign in signs
+        )
+        total_summary = {kind: sum(summary[kind] for summary in summaries) for kind in summaries[0]}
+        self.estimated_time = int(self.time_estimator.estimate(total_summary, canvas_saves))
+        lines_count = total_summary['h_line'] + total_summary['v_line'] + total_summary['d_line']
+
+        if settings.show_information:
+            question = f"Signs: \t\t\t\t{columns} x {rows} ({layout.sign_width} x {layout.sign_height} each)"
+            question += f"\nTotal lines (h/v/diag): \t\t{lines_count}"
+            question += f"\nTotal individual points: \t\t{total_summary['click']}"
+            if total_summary['brush_line']:
+                question += f"\nLarge brush strokes: \t\t{total_summary['brush_line']}"
+            question += "\nEst. painting time:\t\t\t" + time.strftime("%H:%M:%S", time.gmtime(self.estimated_time))
+            question += "\n\nThe signs are painted row by row from the top left one. After every sign"
+            question += "\nyou are asked to open the next sign and select its canvas."
+            question += "\nWould you like to start the painting?"
+            msg = QMessageBox(self.parent)
+            msg.setIcon(QMessageBox.Icon.Question)
+            msg.setWindowTitle("Ready to Paint Mosaic")
+            msg.setText(question)
+            msg.setStandardButtons(QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
+            msg.setDefaultButton(QMessageBox.StandardButton.Yes)
+            if msg.exec() == QMessageBox.StandardButton.No:
+                return
+
+        listener, start_time = self.begin_painting_session(settings)
+        for i, (sign, summary) in enumerate(zip(signs, summaries)):
+            if i > 0:
+                # The player has to walk to the next sign, its canvas is selected again
+                msg = QMessageBox(self.parent)
+                msg.setIcon(QMessageBox.Icon.Information)
+                msg.setWindowTitle("Next Sign")
+                msg.setText(f"Sign {i + 1} of {len(signs)} ({sign.name}): open this sign in Rust, then press OK to select its canvas.")
+                msg.setStandardButtons(QMessageBox.StandardButton.Ok | QMessageBox.StandardButton.Cancel)
+                if msg.exec() == QMessageBox.StandardButton.Cancel or not self.locate_canvas_area():
+                    self.parent.ui.log_TextEdit.append(f"Mosaic stopped before sign {i + 1} of {len(signs)}")
+                    return self.shutdown(listener, start_time, 1)
+                if (self.canvas_w, self.canvas_h) != (layout.sign_width, layout.sign_height):
+                    self.parent.ui.log_TextEdit.append(
+                        f"Warning: canvas is {self.canvas_w} x {self.canvas_h}, the first sign was "
+                        f"{layout.sign_width} x {layout.sign_height}"
+                    )
+
+            self.parent.ui.log_TextEdit.append(f"Painting sign {i + 1} of {len(signs)} ({sign.name})")
+            QApplication.processEvents()
+            self.prepare_canvas(settings)
+            total_operations = (summary['h_line'] + summary['v_line'] + summary['d_line'] + summary['brush_line'] +
+                                summary['click'] + len(sign.plan))
+            if not self.paint_precomputed_lines(sign.plan, total_operations, start_time, settings):
+                return self.shutdown(listener, start_time, 1)
         return self.shutdown(listener, start_time)
 
     def start_standard_painting(self):
@@ -2110,6 +2796,51 @@ class rustDaVinci:
         self.parent.ui.log_TextEdit.append("Using standard painting method...")
         return
 
+    def export_painting_plan(self):
+        """Export the solved layers as layer PNGs and a JSON manifest, see lib/plan_export.py"""
+        layered_colors = self.color_calculation_cache['layered_colors_map']
+        if not layered_colors or self.color_calculation_cache['resized_img'] is None:
+            self.parent.ui.log_TextEdit.append("No calculation data to export.")
+            return False
+
+        folder_path = self.settings.value("folder_path", QDir.homePath())
+        name = os.path.splitext(os.path.basename(folder_path))[0] or "plan"
+        folder_path = os.path.dirname(os.path.abspath(folder_path))
+        if not os.path.exists(folder_path):
+            folder_path = QDir.homePath()
+
+        path = QFileDialog.getSaveFileName(
+            parent=self.parent, caption="Export the painting plan",
+            directory=os.path.join(folder_path, f"{name}.json"), filter="Painting plans (*.json)"
+        )[0]
+        if not path:
+            return False
+        if not path.endswith(".json"):
+            path += ".json"
+
+        try:
+            from lib.plan_export import export_plan
+            width, height = self.color_calculation_cache['resized_img'].size
+            paths = export_plan(
+                path,
+                layered_colors,
+                width,
+                height,
+                self.color_calculation_cache['background_color'],
+                self.base_palette_colors or rust_palette[:64],
+                self.opacity_values,
+                self.blend_opacity_values,
+            )
+            file_size = sum(os.path.getsize(file) for file in paths) / 1024  # Size in KB
+            self.parent.ui.log_TextEdit.append(
+                f"Painting plan exported ({width} x {height}, {file_size:.1f} KB in {len(paths)} files): "
+                f"{os.path.basename(path)}"
+            )
+            return True
+        except Exception as e:
+            self.parent.ui.log_TextEdit.append(f"Error exporting painting plan: {str(e)}")
+            return False
+
     def save_calculation_cache(self, image_path):
         """Save the color calculation cache to a file alongside the image
         
@@ -2132,6 +2863,8 @@ class rustDaVinci:
                 'layered_colors_map': self.layered_colors_map,
                 'background_color': self.color_calculation_cache['background_color'],
                 'image_size': self.color_calculation_cache['resized_img'].size if self.color_calculation_cache['resized_img'] else None,
+                'opacity_values': list(self.opacity_values),
+                'blend_opacity_values': list(self.blend_opacity_values),
                 'timestamp': time.time(),
                 'version': 1.0  # For future compatibility checks
             }
@@ -2181,6 +2914,14 @@ class rustDaVinci:
             if cache_data['background_color'] != bg_color_rgb:
                 self.parent.ui.log_TextEdit.append("Background color in cache doesn't match current settings")
                 return False
+
+            # Caches without opacity levels were solved with the default levels
+            opacity_values = tuple(cache_data.get('opacity_values', SettingsSnapshot.defaults().opacity_levels))
+            if opacity_values != self.snapshot.opacity_levels:
+                self.parent.ui.log_TextEdit.append("Opacity levels in cache don't match current settings")
+                return False
+            self.opacity_values = list(opacity_values)
+            self.blend_opacity_values = list(cache_data.get('blend_opacity_values', opacity_values))
                 
             # Populate our cache
             self.layered_colors_map = cache_data['layered_colors_map']
@@ -2263,253 +3004,45 @@ class rustDaVinci:
         progress_dialog.show()
         QApplication.processEvents()
         
-        # Create a dictionary to store:
-        # (color_idx, opacity_idx) -> { 'h_lines': [...], 'v_lines': [...], 'd_lines': [...], 'points': [...] }
-        precomputed_lines = {}
-        
-        # Create a temporary 2D grid representing the image to track processed pixels
-        grid = {}
-        processed = set() # Global set to track all processed pixels across all colors
-        min_line_width = int(self.settings.value("minimum_line_width", default_settings["minimum_line_width"]))
-        
-        # Fill the grid with color/opacity information
-        pixel_count = len(self.layered_colors_map)
-        pixels_processed = 0
         start_time = time.time()
         
-        # Calculate total work steps for accurate progress tracking
-        color_count = len(color_opacity_map)
-        total_progress_steps = 100
-        grid_building_steps = 20
-        horizontal_line_steps = 25
-        vertical_line_steps = 25
-        diagonal_line_steps = 20
-        
-        progress_bar.setMaximum(total_progress_steps)
-        progress_bar.setValue(0)
-        progress_status.setText("Building pixel grid...")
-        QApplication.processEvents()
-        
-        # Step 1: Build the pixel grid - 20% of progress
-        for (x, y), layers in self.layered_colors_map.items():
-            for color_idx, opacity_idx in layers:
-                if (x, y) not in grid:
-                    grid[(x, y)] = []
-                grid[(x, y)].append((color_idx, opacity_idx))
-            
-            # Update progress
-            pixels_processed += 1
-            if pixels_processed % 1000 == 0 or pixels_processed == pixel_count:
-                percent = int((pixels_processed / pixel_count) * grid_building_steps)
-                progress_bar.setValue(percent)
-                elapsed = time.time() - start_time
-                remaining = (elapsed / percent) * (total_progress_steps - percent) if percent > 0 else 0
-                elapsed_str = time.strftime("%M:%S", time.gmtime(elapsed))
-                remaining_str = time.strftime("%M:%S", time.gmtime(remaining))
-                progress_status.setText(f"Building pixel grid: {int(pixels_processed / pixel_count * 100)}% | " +
-                                         f"Elapsed: {elapsed_str} | Remaining: {remaining_str}")
-                QApplication.processEvents()
-        
-        # For each color/opacity combination, find horizontal and vertical lines
-        colors_processed = 0
-        total_colors = len(color_opacity_map)
-        
-        # Initialize storage for all color/opacity combinations
-        for (color_idx, opacity_idx) in color_opacity_map:
-            precomputed_lines[(color_idx, opacity_idx)] = {
-                'h_lines': [],  # Horizontal lines: [(start_x, y, end_x), ...]
-                'v_lines': [],  # Vertical lines: [(x, start_y, end_y), ...]
-                'd_lines': [],  # Diagonal lines: [((start_x, start_y), (end_x, end_y)), ...]
-                'points': []    # Individual points: [(x, y), ...]
-            }
-        
-        # Step 2: Find horizontal lines - 25% of progress (grid_building_steps to grid_building_steps+horizontal_line_steps)
-        progress_status.setText("Finding horizontal lines...")
-        QApplication.processEvents()
-        
-        # Process all rows of the canvas
-        for y in range(self.canvas_h):
-            # For each color, check for horizontal lines in this row
-            for (color_idx, opacity_idx), count in color_opacity_map.items():
-                if count < min_line_width:
-                    continue
-                
-                x = 0
-                while x < self.canvas_w:
-                    # Find start of horizontal line
-                    line_start = None
-                    while x < self.canvas_w:
-                        if ((x, y) in grid and 
-                            (color_idx, opacity_idx) in grid[(x, y)] and
-                            (x, y) not in processed):
-                            line_start = x
-                            break
-                        x += 1
-                    
-                    # No line found, move to next position
-                    if line_start is None:
-                        break
-                    
-                    # Find end of horizontal line
-                    line_end = line_start
-                    x = line_start + 1
-                    while x < self.canvas_w:
-                        if ((x, y) in grid and 
-                            (color_idx, opacity_idx) in grid[(x, y)] and
-                            (x, y) not in processed):
-                            line_end = x
-                            x += 1
-                        else:
-                            break
-                    
-                    # Check if line is long enough
-                    line_length = line_end - line_start + 1
-                    if line_length >= min_line_width:
-                        # Store the horizontal line
-                        precomputed_lines[(color_idx, opacity_idx)]['h_lines'].append(
-                            (line_start, y, line_end)
-                        )
-                        # Mark all pixels in this line as processed globally
-                        for i in range(line_start, line_end + 1):
-                            processed.add((i, y))
-                    else:
-                        # Line too short, just increment x to look for the next line
-                        x = line_end + 1
-            
-            # Update progress for horizontal lines - scale from 20% to 45%
-            if y % 10 == 0 or y == self.canvas_h - 1:
-                h_percent = grid_building_steps + int((y / self.canvas_h) * horizontal_line_steps)
-                progress_bar.setValue(h_percent)
-                elapsed = time.time() - start_time
-                remaining = (elapsed / h_percent) * (total_progress_steps - h_percent) if h_percent > 0 else 0
-                elapsed_str = time.strftime("%M:%S", time.gmtime(elapsed))
-                remaining_str = time.strftime("%M:%S", time.gmtime(remaining))
-                progress_status.setText(f"Finding horizontal lines: {int(y / self.canvas_h * 100)}% | " +
-                                         f"Elapsed: {elapsed_str} | Remaining: {remaining_str}")
-                QApplication.processEvents()
-        
-        # Step 3: Find vertical lines - 25% of progress (45% to 70%)
-        progress_status.setText("Finding vertical lines...")
-        QApplication.processEvents()
-        
-        # Process all columns of the canvas
-        for x in range(self.canvas_w):
-            # For each color, check for vertical lines in this column
-            for (color_idx, opacity_idx), count in color_opacity_map.items():
-                if count < min_line_width:
-                    continue
-                
-                y = 0
-                while y < self.canvas_h:
-                    # Find start of vertical line
-                    line_start = None
-                    while y < self.canvas_h:
-                        if ((x, y) in grid and 
-                            (color_idx, opacity_idx) in grid[(x, y)] and
-                            (x, y) not in processed):
-                            line_start = y
-                            break
-                        y += 1
-                    
-                    # No line found, move to next column
-                    if line_start is None:
-                        break
-                    
-                    # Find end of vertical line
-                    line_end = line_start
-                    y = line_start + 1
-                    while y < self.canvas_h:
-                        if ((x, y) in grid and 
-                            (color_idx, opacity_idx) in grid[(x, y)] and
-                            (x, y) not in processed):
-                            line_end = y
-                            y += 1
-                        else:
-                            break
-                    
-                    # Check if line is long enough
-                    line_length = line_end - line_start + 1
-                    if line_length >= min_line_width:
-                        # Store the vertical line
-                        precomputed_lines[(color_idx, opacity_idx)]['v_lines'].append(
-                            (x, line_start, line_end)
-                        )
-                        # Mark all pixels in this line as processed globally
-                        for i in range(line_start, line_end + 1):
-                            processed.add((x, i))
-                    else:
-                        # Line too short, just increment y to look for the next line
-                        y = line_end + 1
-            
-            # Update progress for vertical lines - scale from 45% to 70%
-            if x % 10 == 0 or x == self.canvas_w - 1:
-                v_percent = grid_building_steps + horizontal_line_steps + int((x / self.canvas_w) * vertical_line_steps)
-                progress_bar.setValue(v_percent)
-                elapsed = time.time() - start_time
-                remaining = (elapsed / v_percent) * (total_progress_steps - v_percent) if v_percent > 0 else 0
-                elapsed_str = time.strftime("%M:%S", time.gmtime(elapsed))
-                remaining_str = time.strftime("%M:%S", time.gmtime(remaining))
-                progress_status.setText(f"Finding vertical lines: {int(x / self.canvas_w * 100)}% | " +
-                                         f"Elapsed: {elapsed_str} | Remaining: {remaining_str}")
-                QApplication.processEvents()
-                
-        # Step 4: Find diagonal lines - 20% of progress (70% to 90%)
-        # Only do diagonal detection if the setting is enabled
-        use_diagonal_lines = bool(self.settings.value("use_diagonal_lines", default_settings["use_diagonal_lines"]))
-        
-        if use_diagonal_lines:
-            progress_status.setText("Finding diagonal lines...")
-            progress_bar.setValue(70)  # Set to start of diagonal processing
+        def update_progress(percent, status):
+            progress_bar.setValue(percent)
+            elapsed = time.time() - start_time
+            remaining = (elapsed / percent) * (100 - percent) if percent > 0 else 0
+            elapsed_str = time.strftime("%M:%S", time.gmtime(elapsed))
+            remaining_str = time.strftime("%M:%S", time.gmtime(remaining))
+            progress_status.setText(f"{status} | Elapsed: {elapsed_str} | Remaining: {remaining_str}")
             QApplication.processEvents()
-            
-            # Process each color for diagonal lines
-            colors_processed = 0
-            for (color_idx, opacity_idx), count in color_opacity_map.items():
-                # Only process colors with enough pixels to potentially form diagonal lines
-                if count < min_line_width:
-                    continue
-                    
-                # Use the diagonal detection algorithm
-                color_key = (color_idx, opacity_idx)
-                diagonal_lines = self.detect_diagonal_lines(grid, color_key, processed, min_line_width)
-                
-                # Store the detected diagonal lines
-                precomputed_lines[color_key]['d_lines'] = diagonal_lines
-                
-                # Update progress for diagonal line detection - scale from 70% to 90%
-                colors_processed += 1
-                if colors_processed % 5 == 0 or colors_processed == total_colors:
-                    d_percent = grid_building_steps + horizontal_line_steps + vertical_line_steps + int((colors_processed / total_colors) * diagonal_line_steps)
-                    progress_bar.setValue(d_percent)
-                    elapsed = time.time() - start_time
-                    remaining = (elapsed / d_percent) * (total_progress_steps - d_percent) if d_percent > 0 else 0
-                    elapsed_str = time.strftime("%M:%S", time.gmtime(elapsed))
-                    remaining_str = time.strftime("%M:%S", time.gmtime(remaining))
-                    progress_status.setText(f"Finding diagonal lines: {int(colors_processed / total_colors * 100)}% | " +
-                                           f"Elapsed: {elapsed_str} | Remaining: {remaining_str}")
-                    QApplication.processEvents()
-        else:
-            # Skip diagonal line detection
-            progress_bar.setValue(90)
-            progress_status.setText("Diagonal line detection disabled - skipping")
-            QApplication.processEvents()
-            time.sleep(0.5)  # Brief pause to show the status message
-        
-        # Step 5: Collect remaining points (90% to 100%)
-        progress_status.setText("Collecting remaining points...")
-        progress_bar.setValue(90)
-        QApplication.processEvents()
         
-        # Find all remaining points for each color
-        for (color_idx, opacity_idx) in color_opacity_map:
-            pixel_points = []
-            # Check each pixel in the layered colors map
-            for (x, y), layers in self.layered_colors_map.items():
-                # If this pixel has this color and hasn't been processed as part of a line, add it as a point
-                if ((color_idx, opacity_idx) in layers and (x, y) not in processed):
-                    pixel_points.append((x, y))
-            
-            precomputed_lines[(color_idx, opacity_idx)]['points'] = pixel_points
+        # (color_idx, opacity_idx) -> { 'h_lines': [...], 'v_lines': [...], 'd_lines': [...], 'points': [...] }
+        from lib.tiled_processing import TiledLayers, plan_tiled
+        if isinstance(self.layered_colors_map, TiledLayers):
+            # Tile by tile, the lines crossing tile seams are stitched together
+            precomputed_lines = plan_tiled(
+                self.layered_colors_map,
+                color_opacity_map,
+                min_line_width=self.snapshot.minimum_line_width,
+                use_diagonal_lines=self.snapshot.use_diagonal_lines,
+                tile_size=self.snapshot.tile_size,
+                progress_callback=update_progress,
+                brush_size=self.snapshot.brush_region_size,
+                opacity_values=self.opacity_values,
+                estimator=self.time_estimator
+            )
+        else:
+            precomputed_lines = plan_painting_lines(
+                self.layered_colors_map,
+                self.canvas_w,
+                self.canvas_h,
+                color_opacity_map,
+                min_line_width=self.snapshot.minimum_line_width,
+                use_diagonal_lines=self.snapshot.use_diagonal_lines,
+                progress_callback=update_progress,
+                brush_size=self.snapshot.brush_region_size,
+                opacity_values=self.opacity_values,
+                estimator=self.time_estimator
+            )
         
         # Calculate statistics
         total_horizontal_lines = sum(len(data['h_lines']) for data in precomputed_lines.values())
@@ -2570,98 +3103,6 @@ class rustDaVinci:
         self.current_ctrl_opacity = None
         self.current_ctrl_color = None
 
-    def is_same_color_pixel(self, grid, x, y, color_key, processed):
-        """Check if a pixel at (x,y) has the specified color and hasn't been processed yet"""
-        return ((x, y) in grid and 
-                color_key in grid[(x, y)] and 
-                (x, y) not in processed)
-
-    def detect_diagonal_lines(self, grid, color_key, processed, min_line_width):
-        """
-        Detect diagonal lines for a specific color key.
-        
-        Args:
-            grid: Dictionary mapping (x, y) coordinates to list of color keys
-            color_key: The (color_idx, opacity_idx) key to detect lines for
-            processed: Set of already processed pixels
-            min_line_width: Minimum number of pixels to consider as a line
-            
-        Returns:
-            List of diagonal lines in format [((start_x, start_y), (end_x, end_y)), ...]
-        """
-        diagonal_lines = []
-        candidates = {}  # Dictionary to track diagonal line candidates
-        
-        # Check for pixels of this color that haven't been processed yet
-        for (x, y), colors in grid.items():
-            if color_key in colors and (x, y) not in processed:
-                # Check for diagonal patterns in 4 directions
-                # Direction 1: 45° (down-right)
-                diag1 = f"dr_{x - y}"  # Down-right diagonal identifier
-                if diag1 not in candidates:
-                    candidates[diag1] = []
-                candidates[diag1].append((x, y))
-                
-                # Direction 2: 135° (down-left)
-                diag2 = f"dl_{x + y}"  # Down-left diagonal identifier
-                if diag2 not in candidates:
-                    candidates[diag2] = []
-                candidates[diag2].append((x, y))
-        
-        # Process diagonal line candidates
-        for diag_id, points in candidates.items():
-            # Only process if we have enough points to make a line
-            if len(points) < min_line_width:
-                continue
-                
-            # Sort points based on the direction
-            if diag_id.startswith("dr_"):  # Down-right: sort by x (or y)
-                points.sort(key=lambda p: p[0])
-            else:  # Down-left: sort by x
-                points.sort(key=lambda p: p[0])
-            
-            # Find continuous segments in the sorted points
-            segments = []
-            current_segment = []
-            
-            for i, point in enumerate(points):
-                if not current_segment:
-                    current_segment.append(point)
-                    continue
-                    
-                prev_point = current_segment[-1]
-                
-                # Check if points are adjacent diagonally
-                is_adjacent = False
-                if diag_id.startswith("dr_"):  # Down-right
-                    is_adjacent = (point[0] == prev_point[0] + 1 and point[1] == prev_point[1] + 1)
-                else:  # Down-left
-                    is_adjacent = (point[0] == prev_point[0] + 1 and point[1] == prev_point[1] - 1)
-                
-                if is_adjacent:
-                    current_segment.append(point)
-                else:
-                    # End current segment if points aren't adjacent
-                    if len(current_segment) >= min_line_width:
-                        segments.append(current_segment)
-                    current_segment = [point]
-            
-            # Add the last segment if it's long enough
-            if len(current_segment) >= min_line_width:
-                segments.append(current_segment)
-            
-            # Convert segments to line format and add to result
-            for segment in segments:
-                start_point = segment[0]
-                end_point = segment[-1]
-                diagonal_lines.append((start_point, end_point))
-                
-                # Mark all pixels in this segment as processed
-                for px, py in segment:
-                    processed.add((px, py))
-        
-        return diagonal_lines
-
     def update_painting_status_ui(self, color_idx, opacity_idx, color_key, precomputed_lines, operation_counter, total_operations, start_time):
         """Update the painting status UI with current progress information
         
@@ -37,3 +37,31 @@ rust_palette = [
     # Row 16 - Red
     (51, 19, 20),    (102, 40, 41),      (255, 51, 52),     (255, 127, 126)
 ]
+
+# (opacity a layer blends with, value typed into the in-game opacity box), measured in game.
+# The box does not map linearly to the blend opacity, levels in between are interpolated.
+rust_opacity_ui_values = [
+    (0.0, 0.0),
+    (0.25, 0.12),
+    (0.5, 0.25),
+    (0.75, 0.37),
+    (1.0, 1.0),
+]
+
+
+def opacity_ui_value(opacity):
+    """
+    Value to type into the in-game opacity box for a blend opacity.
+
+    Args:
+        opacity: Blend opacity (0-1)
+
+    Returns:
+        float: Opacity box value, linearly interpolated between the measured levels
+    """
+    points = rust_opacity_ui_values
+    opacity = min(max(opacity, points[0][0]), points[-1][0])
+    for (low, low_value), (high, high_value) in zip(points, points[1:]):
+        if opacity <= high:
+            return round(low_value + (high_value - low_value) * (opacity - low) / (high - low), 2)
+    return points[-1][1]
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Screen capture backends for Rust Painter.
+Grabs the whole screen or only a region of it. Set the environment variable
+RUSTPAINTER_FAKE_SCREEN to an image file to capture from that file instead of
+the screen (for testing without a display or without the game running).
+"""
+
+from PIL import Image
+
+import numpy as np
+import os
+
+
+FAKE_SCREEN_ENV = "RUSTPAINTER_FAKE_SCREEN"
+
+
+class ScreenCapture:
+    """Base class of the capture backends, regions are (x, y, width, height) tuples"""
+
+    def __init__(self):
+        self._buffers = {}
+
+    def size(self):
+        """Size (width, height) of the screen"""
+        raise NotImplementedError
+
+    def grab(self, region=None):
+        """
+        Grab the screen or a region of it.
+        
+        Args:
+            region: (x, y, width, height) or None for the whole screen
+            
+        Returns:
+            PIL.Image: RGB image of the region
+        """
+        raise NotImplementedError
+
+    def grab_array(self, region=None, gray=False):
+        """
+        Grab into a reusable numpy buffer. The buffer is reused by the next grab of the
+        same size, copy it if it has to be kept.
+        
+        Args:
+            region: (x, y, width, height) or None for the whole screen
+            gray: Return a (H, W) luminance array instead of (H, W, 3) RGB
+            
+        Returns:
+            numpy.ndarray: uint8 array of the region
+        """
+        image = self.grab(region)
+        if gray:
+            image = image.convert("L")
+        shape = (image.height, image.width) if gray else (image.height, image.width, 3)
+        buffer = self._buffers.get(shape)
+        if buffer is None:
+            buffer = self._buffers[shape] = np.empty(shape, dtype=np.uint8)
+        buffer[...] = np.asarray(image)
+        return buffer
+
+    @staticmethod
+    def clip_region(region, screen_size):
+        """Clip a region to the screen, returns None if nothing is left"""
+        screen_w, screen_h = screen_size
+        x, y, w, h = (int(v) for v in region)
+        x0, y0 = max(0, x), max(0, y)
+        x1, y1 = min(screen_w, x + w), min(screen_h, y + h)
+        if x1 <= x0 or y1 <= y0:
+            return None
+        return (x0, y0, x1 - x0, y1 - y0)
+
+
+class PILScreenCapture(ScreenCapture):
+    """Captures the real screen with PIL.ImageGrab, only the requested region is grabbed"""
+
+    def __init__(self):
+        super().__init__()
+        from PIL import ImageGrab
+        self._image_grab = ImageGrab
+        self._size = None
+
+    def size(self):
+        if self._size is None:
+            self._size = self._image_grab.grab().size
+        return self._size
+
+    def grab(self, region=None):
+        if region is None:
+            image = self._image_grab.grab()
+            self._size = image.size
+        else:
+            x, y, w, h = (int(v) for v in region)
+            image = self._image_grab.grab(bbox=(x, y, x + w, y + h))
+        return image if image.mode == "RGB" else image.convert("RGB")
+
+
+class FileScreenCapture(ScreenCapture):
+    """Fake screen backed by an image file (e.g. a saved screenshot)"""
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+        self.image = Image.open(path).convert("RGB")
+
+    def size(self):
+        return self.image.size
+
+    def grab(self, region=None):
+        if region is None:
+            return self.image.copy()
+        clipped = self.clip_region(region, self.image.size)
+        x, y, w, h = (int(v) for v in region)
+        result = Image.new("RGB", (max(1, w), max(1, h)))
+        if clipped is not None:
+            cx, cy, cw, ch = clipped
+            result.paste(self.image.crop((cx, cy, cx + cw, cy + ch)), (cx - x, cy - y))
+        return result
+
+
+_screen_capture = None
+
+
+def get_screen_capture():
+    """
+    Return the shared capture backend: a FileScreenCapture if RUSTPAINTER_FAKE_SCREEN
+    points to an image, otherwise a PILScreenCapture of the real screen.
+    """
+    global _screen_capture
+    fake_screen = os.environ.get(FAKE_SCREEN_ENV)
+    if fake_screen:
+        if not isinstance(_screen_capture, FileScreenCapture) or _screen_capture.path != fake_screen:
+            _screen_capture = FileScreenCapture(fake_screen)
+    elif _screen_capture is None or isinstance(_screen_capture, FileScreenCapture):
+        _screen_capture = PILScreenCapture()
+    return _screen_capture
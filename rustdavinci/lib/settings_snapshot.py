@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Settings snapshot for Rust Painter.
+Reads every setting once into an immutable, typed object that is taken at the start
+of a job (loading, solving, painting) and passed along, so the hot paths never touch
+the registry/ini file. Values written back for the test overlay are collected and
+written in one debounced batch.
+"""
+
+from dataclasses import dataclass, fields
+
+from PyQt6.QtCore import QTimer
+
+from lib.color_functions import hex_to_rgb
+from ui.settings.default_settings import default_settings
+
+
+def _to_bool(value):
+    """QSettings value to bool, ini files return "0"/"1"/"true"/"false" strings"""
+    if isinstance(value, str):
+        return value.strip().lower() not in ("", "0", "false", "no", "off")
+    return bool(value)
+
+
+def _to_tuple(value):
+    """QSettings list value to a tuple, a single item list is returned as a plain string"""
+    if value is None or value == "":
+        return ()
+    if isinstance(value, (list, tuple)):
+        return tuple(value)
+    return (value,)
+
+
+_CONVERTERS = {
+    bool: _to_bool,
+    int: lambda value: int(float(value)),
+    float: float,
+    str: str,
+    tuple: _to_tuple,
+}
+
+
+@dataclass(frozen=True)
+class SettingsSnapshot:
+    """Typed, read-only copy of the settings, one field per key of default_settings"""
+
+    window_topmost: bool
+    ctrl_x: int
+    ctrl_y: int
+    ctrl_w: int
+    ctrl_h: int
+    skip_background_color: bool
+    background_color: str
+    skip_colors: tuple
+    pause_key: str
+    skip_key: str
+    abort_key: str
+    update_canvas: bool
+    update_canvas_end: bool
+    draw_lines: bool
+    show_information: bool
+    show_preview_load: bool
+    hide_preview_paint: bool
+    paint_background: bool
+    brush_opacities: bool
+    click_delay: int
+    ctrl_area_delay: int
+    line_delay: int
+    minimum_line_width: int
+    brush_type: int
+    use_diagonal_lines: bool
+    brush_region_size: int
+    importance_threshold: float
+    importance_dilation: int
+    opacity_values: tuple
+    use_blend_calibration: bool
+    dither_mode: str
+    dither_isolation_penalty: float
+    stroke_smoothing_delta_e: float
+    numba_warm_up: bool
+    max_source_size: int
+    memory_report: bool
+    tiled_processing_pixels: int
+    tile_size: int
+    mosaic_gap: int
+    enable_profiling: bool
+    profiling_hook: str
+    profiling_stage: str
+    use_cached_data: bool
+    auto_save_cache: bool
+    theme: str
+
+    @classmethod
+    def from_qsettings(cls, settings):
+        """
+        Read and convert every setting once.
+
+        Args:
+            settings: QSettings object (or anything with a value(key, default) method)
+
+        Returns:
+            SettingsSnapshot: The current settings, invalid values fall back to the default
+        """
+        values = {}
+        for field in fields(cls):
+            default = default_settings[field.name]
+            convert = _CONVERTERS[field.type]
+            try:
+                values[field.name] = convert(settings.value(field.name, default))
+            except (TypeError, ValueError):
+                values[field.name] = convert(default)
+        return cls(**values)
+
+    @classmethod
+    def defaults(cls):
+        """Snapshot of the default settings"""
+        return cls.from_qsettings(_DefaultSettings())
+
+    @property
+    def background_rgb(self):
+        """Background color as an (r, g, b) tuple"""
+        return hex_to_rgb(self.background_color)
+
+    @property
+    def opacity_levels(self):
+        """
+        Opacity levels of the solver and the painting as floats, duplicates removed.
+        Falls back to the default levels if any value is not an opacity in (0, 1].
+        """
+        try:
+            levels = tuple(dict.fromkeys(float(value) for value in self.opacity_values))
+        except (TypeError, ValueError):
+            levels = ()
+        if not levels or not all(0 < level <= 1 for level in levels):
+            levels = tuple(default_settings["opacity_values"])
+        return levels
+
+    @property
+    def has_control_area(self):
+        """True when a painting control area has been captured"""
+        return self.ctrl_w != 0 and self.ctrl_h != 0
+
+
+class _DefaultSettings:
+    """Stand-in for QSettings that only knows the defaults"""
+
+    def value(self, key, default=None):
+        return default
+
+
+class BatchedSettingsWriter:
+    """Collects settings writes and stores them together once no write came in for delay_ms"""
+
+    def __init__(self, settings, delay_ms=500):
+        """
+        Args:
+            settings: QSettings object the values are written to
+            delay_ms: Milliseconds without a new write before the batch is stored
+        """
+        self.settings = settings
+        self.pending = {}
+        self.written = {}
+        self.timer = QTimer()
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(delay_ms)
+        self.timer.timeout.connect(self.flush)
+
+    def set_values(self, values):
+        """Queue values {key: value} and restart the debounce timer"""
+        self.pending.update(values)
+        self.timer.start()
+
+    def flush(self):
+        """Write the queued values that changed since the last flush in one batch"""
+        self.timer.stop()
+        changed = {key: value for key, value in self.pending.items() if self.written.get(key) != value}
+        self.pending = {}
+        if not changed:
+            return 0
+        for key, value in changed.items():
+            self.settings.setValue(key, value)
+        self.settings.sync()
+        self.written.update(changed)
+        return len(changed)
@@ -0,0 +1,601 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Tiled processing for Rust Painter.
+Large canvases are solved, smoothed and planned in tiles so the per pixel Python
+structures never hold more than one tile. The layers of every pixel are streamed
+into a memory-mapped array (TiledLayers) that stands in for the layered colors map.
+The importance mask is computed with a halo around every tile and the line runs
+of neighboring tiles are stitched together, so tile seams do not show in the plan.
+"""
+
+from collections.abc import Mapping
+
+import os
+import tempfile
+import time
+
+import numpy as np
+from PIL import Image
+
+from lib.color_blending import compute_importance_mask, create_layered_colors_map_numba, find_optimal_layers_numba
+from lib.painting_plan import plan_brush_strokes, plan_painting_lines, smooth_layer_runs
+from lib.profiling import profiler
+
+
+DEFAULT_TILE_SIZE = 512
+
+# Rows per strip when a whole row is needed (smoothing, simulation, counting)
+STRIP_ROWS = 256
+
+
+def iter_tiles(width, height, tile_size=DEFAULT_TILE_SIZE):
+    """Yield (x0, y0, x1, y1) of every tile in row-major order, the last tile of a row/column may be smaller"""
+    for y0 in range(0, height, tile_size):
+        for x0 in range(0, width, tile_size):
+            yield x0, y0, min(x0 + tile_size, width), min(y0 + tile_size, height)
+
+
+def tile_seams(x0, y0, x1, y1, width, height):
+    """Sides of a tile that border another tile, see plan_painting_lines"""
+    seams = []
+    if x0 > 0:
+        seams.append('left')
+    if y0 > 0:
+        seams.append('top')
+    if x1 < width:
+        seams.append('right')
+    if y1 < height:
+        seams.append('bottom')
+    return tuple(seams)
+
+
+def tile_importance_mask(image, x0, y0, x1, y1, threshold=30, dilation=0):
+    """
+    Importance mask of one tile, identical to the same area of the whole image mask.
+    The mask is computed on the tile grown by a halo of dilation + 1 pixels: edges
+    between tile pixels and their neighbors are seen, and the border of the halo
+    (which compute_importance_mask clears) is too far away for the dilation to reach.
+
+    Args:
+        image: Whole PIL Image
+        x0, y0, x1, y1: Tile bounds
+        threshold: Weighted color distance that counts as high contrast
+        dilation: Number of pixels the mask is grown by
+
+    Returns:
+        numpy.ndarray: (y1 - y0, x1 - x0) boolean mask
+    """
+    halo = int(dilation) + 1
+    hx0, hy0 = max(0, x0 - halo), max(0, y0 - halo)
+    hx1, hy1 = min(image.width, x1 + halo), min(image.height, y1 + halo)
+    mask = compute_importance_mask(image.crop((hx0, hy0, hx1, hy1)), threshold, dilation)
+    return mask[y0 - hy0:y1 - hy0, x0 - hx0:x1 - hx0]
+
+
+def bucket_colors(image, rows=STRIP_ROWS):
+    """
+    Pixel-weighted average color of every color bucket of the whole image, the same
+    buckets as color_blending._group_unique_colors, accumulated strip by strip.
+
+    Returns:
+        dict: {bucket_key: (r, g, b)} of every bucket that occurs in the image
+    """
+    side = 256 // 5 + 1
+    counts = np.zeros(side ** 3, dtype=np.float64)
+    sums = np.zeros((3, side ** 3), dtype=np.float64)
+    for y0 in range(0, image.height, rows):
+        pixels = np.asarray(image.crop((0, y0, image.width, min(y0 + rows, image.height))), dtype=np.int64).reshape(-1, 3)
+        buckets = pixels // 5
+        index = (buckets[:, 0] * side + buckets[:, 1]) * side + buckets[:, 2]
+        counts += np.bincount(index, minlength=side ** 3)
+        for channel in range(3):
+            sums[channel] += np.bincount(index, weights=pixels[:, channel], minlength=side ** 3)
+
+    used = np.flatnonzero(counts)
+    averages = (sums[:, used] / counts[used]).astype(int).T.tolist()
+    return {
+        (int(index // (side * side)), int(index // side % side), int(index % side)): tuple(color)
+        for index, color in zip(used.tolist(), averages)
+    }
+
+
+class TiledLayers(Mapping):
+    """
+    Layered colors map of a large canvas, stored as a memory-mapped (max_layers, H, W)
+    uint16 array. Layer i of a pixel is stored as color_idx * opacity_count + opacity_idx + 1,
+    0 means no layer. Reads as a read-only {(x, y): [(color_idx, opacity_idx), ...]} mapping.
+    """
+
+    def __init__(self, width, height, opacity_count, max_layers=2, directory=None):
+        """
+        Args:
+            width: Width of the canvas
+            height: Height of the canvas
+            opacity_count: Number of opacity values
+            max_layers: Maximum number of layers per pixel
+            directory: Directory of the memory-mapped file (system temp directory if None)
+        """
+        self.width = width
+        self.height = height
+        self.opacity_count = opacity_count
+        self.max_layers = max_layers
+        self.path = None
+        self.codes = None
+        self._painted = 0
+        self._open(directory)
+
+    @classmethod
+    def from_codes(cls, codes, opacity_count, directory=None):
+        """
+        Layers of an already encoded (max_layers, H, W) code array, e.g. an imported plan.
+
+        Args:
+            codes: Array of layer codes, see the class docstring
+            opacity_count: Number of opacity values the codes were encoded with
+            directory: Directory of the memory-mapped file (system temp directory if None)
+
+        Returns:
+            TiledLayers: New map holding a copy of the codes
+        """
+        max_layers, height, width = codes.shape
+        layers = cls(width, height, opacity_count, max_layers, directory)
+        layers.codes[:] = codes
+        layers._painted = int(np.count_nonzero(codes[0]))
+        return layers
+
+    def _open(self, directory=None):
+        handle, self.path = tempfile.mkstemp(prefix="rustdavinci_", suffix=".layers", dir=directory)
+        os.close(handle)
+        self.codes = np.memmap(self.path, dtype=np.uint16, mode="w+",
+                               shape=(self.max_layers, self.height, self.width))
+
+    def close(self):
+        """Release and delete the memory-mapped file"""
+        if self.codes is not None:
+            self.codes._mmap.close()
+            self.codes = None
+        if self.path is not None:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+            self.path = None
+
+    def __del__(self):
+        self.close()
+
+    def __getstate__(self):
+        """Pickled with the layer array itself, e.g. in the calculation cache"""
+        return {
+            "width": self.width,
+            "height": self.height,
+            "opacity_count": self.opacity_count,
+            "max_layers": self.max_layers,
+            "codes": np.array(self.codes),
+        }
+
+    def __setstate__(self, state):
+        codes = state.pop("codes")
+        self.__dict__.update(state)
+        self.path = None
+        self.codes = None
+        self._open()
+        self.codes[:] = codes
+        self._painted = int(np.count_nonzero(codes[0]))
+
+    def write(self, x0, y0, x1, y1, layered_colors):
+        """
+        Store the layers of one area, replacing everything that was stored there.
+
+        Args:
+            x0, y0, x1, y1: Bounds of the area
+            layered_colors: {(x, y): layers} with coordinates relative to (x0, y0)
+        """
+        block = np.zeros((self.max_layers, y1 - y0, x1 - x0), dtype=np.uint16)
+        if layered_colors:
+            # Solvers share one layers list between the pixels of a color, encode every list once
+            opacity_count, max_layers = self.opacity_count, self.max_layers
+            encoded = {}
+            rows = []
+            for layers in layered_colors.values():
+                row = encoded.get(id(layers))
+                if row is None:
+                    row = [color_idx * opacity_count + opacity_idx + 1 for color_idx, opacity_idx in layers[:max_layers]]
+                    row = encoded[id(layers)] = row + [0] * (max_layers - len(row))
+                rows.append(row)
+            pixels = np.array(list(layered_colors), dtype=np.int64).reshape(-1, 2)
+            block[:, pixels[:, 1], pixels[:, 0]] = np.array(rows, dtype=np.uint16).T
+        self._painted += int(np.count_nonzero(block[0])) - int(np.count_nonzero(self.codes[0, y0:y1, x0:x1]))
+        self.codes[:, y0:y1, x0:x1] = block
+
+    def read(self, x0, y0, x1, y1):
+        """
+        Layers of one area.
+
+        Returns:
+            dict: {(x, y): layers} with coordinates relative to (x0, y0), pixels
+                  with the same layers share one list
+        """
+        block = np.asarray(self.codes[:, y0:y1, x0:x1])
+        ys, xs = np.nonzero(block[0])
+        stacked = block[:, ys, xs].T.tolist()
+        opacity_count = self.opacity_count
+        stacks = {}
+        result = {}
+        for x, y, codes in zip(xs.tolist(), ys.tolist(), stacked):
+            codes = tuple(codes)
+            layers = stacks.get(codes)
+            if layers is None:
+                layers = stacks[codes] = [
+                    ((code - 1) // opacity_count, (code - 1) % opacity_count) for code in codes if code
+                ]
+            result[(x, y)] = layers
+        return result
+
+    def iter_strips(self, rows=STRIP_ROWS):
+        """Yield (y0, y1, {(x, y): layers}) of full width strips, y relative to y0"""
+        for y0 in range(0, self.height, rows):
+            y1 = min(y0 + rows, self.height)
+            yield y0, y1, self.read(0, y0, self.width, y1)
+
+    def __len__(self):
+        """Number of pixels with at least one layer"""
+        return self._painted
+
+    def __iter__(self):
+        for y0, _, strip in self.iter_strips():
+            for x, y in strip:
+                yield x, y + y0
+
+    def __getitem__(self, pixel):
+        x, y = pixel
+        if not (0 <= x < self.width and 0 <= y < self.height) or not self.codes[0, y, x]:
+            raise KeyError(pixel)
+        return self.read(x, y, x + 1, y + 1)[(0, 0)]
+
+    def __contains__(self, pixel):
+        x, y = pixel
+        return 0 <= x < self.width and 0 <= y < self.height and bool(self.codes[0, y, x])
+
+    def items(self):
+        """(pixel, layers) pairs strip by strip, without building the whole map"""
+        for y0, _, strip in self.iter_strips():
+            for (x, y), layers in strip.items():
+                yield (x, y + y0), layers
+
+    def values(self):
+        for _, _, strip in self.iter_strips():
+            yield from strip.values()
+
+    def count_keys(self):
+        """
+        Count the pixels of every (color_idx, opacity_idx) key, see painting_plan.count_color_keys.
+
+        Returns:
+            dict: {(color_idx, opacity_idx): pixel count} in order of first appearance
+        """
+        counts = {}
+        first = {}
+        for y0 in range(0, self.height, STRIP_ROWS):
+            block = np.asarray(self.codes[:, y0:y0 + STRIP_ROWS])
+            # Scan order: pixel by pixel, the layers of a pixel in order
+            flat = np.moveaxis(block, 0, -1).reshape(-1)
+            for code, index, count in zip(*(values.tolist() for values in np.unique(
+                    flat, return_index=True, return_counts=True))):
+                if code == 0:
+                    continue
+                counts[code] = counts.get(code, 0) + count
+                first.setdefault(code, y0 * self.width * self.max_layers + index)
+        return {
+            ((code - 1) // self.opacity_count, (code - 1) % self.opacity_count): counts[code]
+            for code in sorted(first, key=first.get)
+        }
+
+    def simulate(self, background_color, palette_colors, opacity_values):
+        """
+        Simulated image after painting every layer, blended like alpha_blend, strip by strip.
+
+        Returns:
+            PIL Image: Simulated RGB image of the canvas size
+        """
+        code_count = len(palette_colors) * self.opacity_count + 1
+        codes = np.arange(1, code_count)
+        code_colors = np.zeros((code_count, 3), dtype=np.float64)
+        code_opacity = np.zeros(code_count, dtype=np.float64)
+        code_colors[1:] = np.asarray(palette_colors, dtype=np.float64)[(codes - 1) // self.opacity_count]
+        code_opacity[1:] = np.asarray(opacity_values, dtype=np.float64)[(codes - 1) % self.opacity_count]
+
+        simulated = Image.new("RGB", (self.width, self.height), tuple(background_color))
+        for y0 in range(0, self.height, STRIP_ROWS):
+            block = np.asarray(self.codes[:, y0:y0 + STRIP_ROWS])
+            canvas = np.empty(block.shape[1:] + (3,), dtype=np.float64)
+            canvas[:, :] = background_color
+            for plane in block:
+                painted = plane != 0
+                layer = plane[painted]
+                opacity = code_opacity[layer][:, None]
+                canvas[painted] = np.floor(canvas[painted] * (1 - opacity) + code_colors[layer] * opacity)
+            simulated.paste(Image.fromarray(canvas.astype(np.uint8)), (0, y0))
+        return simulated
+
+    def smooth(self, background_color, palette_colors, opacity_values, max_delta_e=2.3, min_line_width=10):
+        """
+        smooth_layer_runs over full width strips. Smoothing works row by row, so the
+        result is the same as smoothing the whole map at once.
+
+        Returns:
+            tuple: (new TiledLayers, report of all strips, see smooth_layer_runs)
+        """
+        smoothed = TiledLayers(self.width, self.height, self.opacity_count, self.max_layers,
+                               os.path.dirname(self.path))
+        total = {'strokes_before': 0, 'strokes_after': 0, 'pixels_changed': 0, 'mean_delta_e': 0.0, 'max_delta_e': 0.0}
+        delta_e_sum = 0.0
+        for y0, y1, strip in self.iter_strips():
+            strip_smoothed, report = smooth_layer_runs(
+                strip, self.width, y1 - y0, background_color, palette_colors, opacity_values,
+                max_delta_e=max_delta_e, min_line_width=min_line_width
+            )
+            if report['pixels_changed']:
+                smoothed.write(0, y0, self.width, y1, strip_smoothed)
+            else:
+                smoothed.codes[:, y0:y1] = self.codes[:, y0:y1]
+                smoothed._painted += int(np.count_nonzero(self.codes[0, y0:y1]))
+            for key in ('strokes_before', 'strokes_after', 'pixels_changed'):
+                total[key] += report[key]
+            delta_e_sum += report['mean_delta_e'] * report['pixels_changed']
+            total['max_delta_e'] = max(total['max_delta_e'], report['max_delta_e'])
+        if total['pixels_changed']:
+            total['mean_delta_e'] = delta_e_sum / total['pixels_changed']
+        return smoothed, total
+
+
+def solve_tiled(image, background_color, palette_colors, opacity_values, max_layers=2, tile_size=DEFAULT_TILE_SIZE,
+                update_callback=None, solution_cache=None, importance_threshold=30, importance_dilation=0,
+                directory=None):
+    """
+    Solve the optimal color layering of a large image tile by tile.
+    The color buckets are solved first from their averages over the whole image and
+    stored in the solution cache, so every tile gets the same layers for a bucket as a
+    solve of the whole image would; the importance mask is stitched across the tile seams.
+
+    Args:
+        image: PIL Image object
+        background_color: RGB tuple of background color
+        palette_colors: List of base RGB colors
+        opacity_values: List of opacity values (0-1)
+        max_layers: Maximum number of layers to apply
+        tile_size: Width and height of a tile
+        update_callback: Function to call with progress updates (percentage, time_elapsed, time_remaining),
+                         returning True stops the solve
+        solution_cache: Optional cache from create_solution_cache() that is reused between solves
+        importance_threshold: Color distance to a neighbor that marks a pixel as important
+        importance_dilation: Number of pixels the importance mask is grown by
+        directory: Directory of the memory-mapped layer file
+
+    Returns:
+        TiledLayers: The layers of every pixel, or None if the solve was cancelled
+    """
+    from lib.color_blending import create_solution_cache
+
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    if solution_cache is None:
+        solution_cache = create_solution_cache()
+    width, height = image.size
+    tiles = list(iter_tiles(width, height, tile_size))
+    start_time = time.time()
+    state = {'done': 0, 'cancelled': False, 'solved': 0, 'reused': 0}
+
+    # First 20% - the color buckets of the whole image
+    base_colors_array = np.array(palette_colors, dtype=np.int32)
+    opacity_array = np.array(opacity_values, dtype=np.float32)
+    color_cache = solution_cache['color_cache']
+    cached_bucket_layers = solution_cache['bucket_layers'].setdefault(background_color, {})
+    with profiler.span("solve_buckets", "solve"):
+        buckets = bucket_colors(image)
+        last_update_time = start_time
+        for i, (bucket_key, color) in enumerate(buckets.items()):
+            if bucket_key in cached_bucket_layers:
+                state['reused'] += 1
+                continue
+            cached_bucket_layers[bucket_key] = find_optimal_layers_numba(
+                color, background_color, base_colors_array, opacity_array, max_layers, color_cache
+            )
+            state['solved'] += 1
+            if update_callback and time.time() - last_update_time > 0.25:
+                last_update_time = time.time()
+                percent = int((i + 1) / len(buckets) * 20)
+                elapsed = last_update_time - start_time
+                if update_callback(percent, elapsed, elapsed / max(percent, 1) * (100 - percent)):
+                    return None
+
+    # 20% to 100% - the pixels, tile by tile
+    layers = TiledLayers(width, height, len(opacity_values), max_layers, directory)
+
+    def tile_progress(percent, elapsed, remaining):
+        overall = 20 + int((state['done'] + percent / 100) / len(tiles) * 80)
+        elapsed = time.time() - start_time
+        remaining = elapsed / overall * (100 - overall) if overall > 0 else 0
+        if update_callback and update_callback(overall, elapsed, remaining):
+            state['cancelled'] = True
+        return state['cancelled']
+
+    for x0, y0, x1, y1 in tiles:
+        with profiler.span("solve_tile", "solve", x=x0, y=y0):
+            tile = image.crop((x0, y0, x1, y1))
+            mask = tile_importance_mask(image, x0, y0, x1, y1, importance_threshold, importance_dilation)
+            tile_layers = create_layered_colors_map_numba(
+                tile, background_color, palette_colors, opacity_values, max_layers,
+                update_callback=tile_progress, solution_cache=solution_cache, importance_mask=mask
+            )
+        if state['cancelled']:
+            layers.close()
+            return None
+        layers.write(x0, y0, x1, y1, tile_layers)
+        state['done'] += 1
+        tile_progress(0, 0, 0)
+        if state['cancelled']:
+            layers.close()
+            return None
+
+    # Bucket statistics of the whole image instead of the last tile
+    solution_cache['last_stats'] = {'solved': state['solved'], 'reused': state['reused']}
+    return layers
+
+
+def _stitch_runs(lines, min_line_width, horizontal):
+    """
+    Join straight lines that continue each other (a run split at a tile seam).
+
+    Returns:
+        tuple: (lines, points) where joined lines that are still shorter than
+               min_line_width are returned as single points
+    """
+    # As (row or column, start, end)
+    runs = sorted((y, start_x, end_x) for start_x, y, end_x in lines) if horizontal else sorted(lines)
+    joined = []
+    for key, start, end in runs:
+        if joined and joined[-1][0] == key and joined[-1][2] + 1 == start:
+            joined[-1][2] = end
+        else:
+            joined.append([key, start, end])
+
+    stitched, points = [], []
+    for key, start, end in joined:
+        if end - start + 1 >= min_line_width:
+            stitched.append((start, key, end) if horizontal else (key, start, end))
+        else:
+            points.extend((i, key) if horizontal else (key, i) for i in range(start, end + 1))
+    return stitched, points
+
+
+def _stitch_diagonals(lines):
+    """Join diagonal lines that continue each other across a tile seam"""
+    def diagonal(line):
+        (start_x, start_y), (end_x, end_y) = line
+        down = end_y >= start_y
+        return (down, start_x - start_y if down else start_x + start_y, start_x)
+
+    joined = []
+    for line in sorted(lines, key=diagonal):
+        if joined:
+            (start, (end_x, end_y)) = joined[-1]
+            step_y = 1 if diagonal(joined[-1])[0] else -1
+            if diagonal(joined[-1])[:2] == diagonal(line)[:2] and line[0] == (end_x + 1, end_y + step_y):
+                joined[-1] = (start, line[1])
+                continue
+        joined.append(line)
+    return joined
+
+
+def _stitch_brush_lines(lines):
+    """Join large brush strokes of the same row that continue each other across a seam"""
+    joined = []
+    for start_x, y, end_x in sorted(lines, key=lambda line: (line[1], line[0])):
+        if joined and joined[-1][1] == y and start_x <= joined[-1][2] + 1:
+            joined[-1] = (joined[-1][0], y, max(end_x, joined[-1][2]))
+            continue
+        joined.append((start_x, y, end_x))
+    return joined
+
+
+def stitch_plan(plan, min_line_width):
+    """
+    Join the lines of a plan that was built tile by tile, in place.
+    Runs touching a seam were kept at any length by the tile planner; after joining,
+    the ones that are still shorter than min_line_width become points again.
+    Large brush strokes are joined as well, they are never turned into points.
+
+    Returns:
+        dict: The plan
+    """
+    for data in plan.values():
+        data['h_lines'], h_points = _stitch_runs(data['h_lines'], min_line_width, True)
+        data['v_lines'], v_points = _stitch_runs(data['v_lines'], min_line_width, False)
+        data['d_lines'] = _stitch_diagonals(data['d_lines'])
+        data['points'].extend(h_points)
+        data['points'].extend(v_points)
+        if 'brush_lines' in data:
+            data['brush_lines'] = _stitch_brush_lines(data['brush_lines'])
+    return plan
+
+
+def _tile_brush_strokes(layers, x0, y0, x1, y1, opacity_values, brush_size, min_line_width, estimator):
+    """
+    plan_brush_strokes of one tile, found on the tile and brush_size pixels around it so a
+    stroke can reach up to the seam. The strokes stay centered in the tile.
+
+    Returns:
+        tuple: (brush strokes in tile coordinates, (tile H, tile W) bool array of the covered tile pixels)
+    """
+    hx0, hy0 = max(0, x0 - brush_size), max(0, y0 - brush_size)
+    hx1, hy1 = min(layers.width, x1 + brush_size), min(layers.height, y1 + brush_size)
+    brush_lines, covered = plan_brush_strokes(
+        layers.read(hx0, hy0, hx1, hy1), hx1 - hx0, hy1 - hy0, opacity_values, brush_size, min_line_width, estimator,
+        bounds=(x0 - hx0, y0 - hy0, x1 - hx0, y1 - hy0)
+    )
+    dx, dy = x0 - hx0, y0 - hy0
+    brush_lines = {
+        color_key: [(sx - dx, y - dy, ex - dx) for sx, y, ex in lines]
+        for color_key, lines in brush_lines.items()
+    }
+    return brush_lines, covered[dy:dy + y1 - y0, dx:dx + x1 - x0]
+
+
+def plan_tiled(layers, color_counts=None, min_line_width=10, use_diagonal_lines=True,
+               tile_size=DEFAULT_TILE_SIZE, progress_callback=None, brush_size=0, opacity_values=None, estimator=None):
+    """
+    plan_painting_lines for a TiledLayers map, one tile at a time.
+    Every tile is planned in the same color order (the counts of the whole canvas),
+    then the lines that cross tile seams are stitched together.
+
+    Args:
+        layers: TiledLayers map
+        color_counts: {(color_idx, opacity_idx): pixel count} of the whole canvas (computed if None)
+        min_line_width: Minimum number of pixels to consider as a line
+        use_diagonal_lines: Also search for diagonal lines
+        tile_size: Width and height of a tile
+        progress_callback: Called with (percent, status text) while planning
+        brush_size: Brush size of the large brush strokes (0 = off), see plan_painting_lines.
+                    Every tile is read with brush_size pixels around it, so the brush reaches
+                    up to the seams, and the strokes are stitched across the seams
+        opacity_values: List of opacity values (0-1), needed for the large brush strokes
+        estimator: PaintTimeEstimator the large brush strokes are weighed with
+
+    Returns:
+        dict: Painting plan, see plan_painting_lines
+    """
+    if color_counts is None:
+        color_counts = layers.count_keys()
+    report = progress_callback or (lambda percent, status: None)
+    plan = {color_key: {'h_lines': [], 'v_lines': [], 'd_lines': [], 'points': []} for color_key in color_counts}
+    tiles = list(iter_tiles(layers.width, layers.height, tile_size))
+
+    for i, (x0, y0, x1, y1) in enumerate(tiles):
+        report(int(i / len(tiles) * 95), f"Planning tile {i + 1} of {len(tiles)}...")
+        with profiler.span("plan_tile", "plan", x=x0, y=y0):
+            brush_strokes = None
+            if brush_size > 0 and opacity_values is not None:
+                brush_strokes = _tile_brush_strokes(layers, x0, y0, x1, y1, opacity_values, brush_size,
+                                                    min_line_width, estimator)
+            tile_plan = plan_painting_lines(
+                layers.read(x0, y0, x1, y1), x1 - x0, y1 - y0, color_counts, min_line_width, use_diagonal_lines,
+                seams=tile_seams(x0, y0, x1, y1, layers.width, layers.height), brush_size=brush_size,
+                estimator=estimator, brush_strokes=brush_strokes
+            )
+        for color_key, data in tile_plan.items():
+            target = plan[color_key]
+            if 'brush_lines' in data:
+                target.setdefault('brush_lines', []).extend((sx + x0, y + y0, ex + x0) for sx, y, ex in data['brush_lines'])
+                target['brush_size'] = brush_size
+            target['h_lines'].extend((sx + x0, y + y0, ex + x0) for sx, y, ex in data['h_lines'])
+            target['v_lines'].extend((x + x0, sy + y0, ey + y0) for x, sy, ey in data['v_lines'])
+            target['d_lines'].extend(((sx + x0, sy + y0), (ex + x0, ey + y0)) for (sx, sy), (ex, ey) in data['d_lines'])
+            target['points'].extend((x + x0, y + y0) for x, y in data['points'])
+
+    report(95, "Stitching lines across tiles...")
+    stitch_plan(plan, min_line_width)
+    report(100, "Line optimization complete")
+    return plan
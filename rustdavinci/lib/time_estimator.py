@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Painting time estimator for Rust Painter.
+Records how long every painting operation takes on this machine and fits a
+small linear model per operation type, which replaces the fixed constants
+used for the estimated painting time.
+"""
+
+import json
+import os
+import time
+
+import numpy as np
+
+
+# Operation types that are recorded while painting
+OPERATION_KINDS = ("click", "h_line", "v_line", "d_line", "brush_line", "control_change", "canvas_save")
+
+# Line types of the normal brush, see precompute_painting_lines
+LINE_KINDS = ("h_line", "v_line", "d_line")
+
+# Line operations are modelled as intercept + slope * length, the rest as a constant.
+# Large brush strokes are timed apart, the game takes longer to draw a wide stroke
+LENGTH_KINDS = LINE_KINDS + ("brush_line",)
+
+# Samples needed before the recorded timings replace the default constants
+MIN_SAMPLES = 20
+
+# Samples kept per delay profile and operation type (the newest ones are kept)
+MAX_SAMPLES = 2000
+
+DEFAULT_TIMINGS_PATH = os.path.join(os.path.expanduser("~"), ".rustdavinci", "paint_timings.json")
+
+
+def line_length(kind, line):
+    """
+    Length in pixels of a precomputed line.
+
+    Args:
+        kind: 'h_line', 'v_line', 'd_line' or 'brush_line'
+        line: Line tuple as stored by precompute_painting_lines
+
+    Returns:
+        int: Number of pixels covered by the line
+    """
+    if kind == "d_line":
+        (x1, y1), (x2, y2) = line
+        return max(abs(x2 - x1), abs(y2 - y1)) + 1
+    return abs(line[2] - line[1] if kind == "v_line" else line[2] - line[0]) + 1
+
+
+def summarize_plan(precomputed_lines):
+    """
+    Count the operations of a painting plan.
+
+    Args:
+        precomputed_lines: Dictionary {color_key: {'h_lines', 'v_lines', 'd_lines', 'points'}}
+
+    Returns:
+        dict: Operation counts and summed line lengths per operation type, 'size_change'
+              is the number of brush size changes for the large brush strokes
+    """
+    summary = {"click": 0, "control_change": len(precomputed_lines), "size_change": 0}
+    for kind in LENGTH_KINDS:
+        summary[kind] = 0
+        summary[kind + "_length"] = 0
+    for data in precomputed_lines.values():
+        summary["click"] += len(data['points'])
+        for kind in LINE_KINDS:
+            lines = data[kind + "s"]
+            summary[kind] += len(lines)
+            summary[kind + "_length"] += sum(line_length(kind, line) for line in lines)
+        brush_lines = data.get('brush_lines')
+        if brush_lines:
+            # The large brush strokes are painted before the rest, selecting the color once more
+            summary["control_change"] += 1
+            summary["brush_line"] += len(brush_lines)
+            summary["brush_line_length"] += sum(line_length("brush_line", line) for line in brush_lines)
+    if summary["brush_line"]:
+        summary["size_change"] = 2  # To the large brush and back
+    return summary
+
+
+def control_switches(precomputed_lines):
+    """
+    Count the control changes of a painting plan. The keys are painted by color index,
+    then opacity index, and a control is only changed when it differs from the last key.
+    Keys with large brush strokes are painted with the large brush first.
+
+    Args:
+        precomputed_lines: Dictionary {color_key: {'h_lines', 'v_lines', 'd_lines', 'points'}}
+
+    Returns:
+        dict: {'color': color selections, 'opacity': opacity changes, 'size': brush size changes}
+    """
+    switches = {"color": 0, "opacity": 0, "size": 0}
+    brush_keys = sorted(key for key, data in precomputed_lines.items() if data.get('brush_lines'))
+    if brush_keys:
+        switches["size"] = 2
+    current_color = current_opacity = None
+    for color_idx, opacity_idx in brush_keys + sorted(precomputed_lines):
+        switches["color"] += color_idx != current_color
+        switches["opacity"] += opacity_idx != current_opacity
+        current_color, current_opacity = color_idx, opacity_idx
+    return switches
+
+
+class PaintTimeEstimator:
+    """Per-machine painting time model fitted from recorded operation timings"""
+
+    def __init__(self, path=DEFAULT_TIMINGS_PATH):
+        """
+        Args:
+            path: JSON file the recorded timings are kept in, None keeps them in memory only
+        """
+        self.path = path
+        self.samples = {}       # {profile: {kind: [[duration, length], ...]}}
+        self.profile = "default"
+        self.defaults = {}
+        self.model = {}         # {kind: (intercept, slope)}
+        self.load()
+
+    def set_delays(self, click_delay, line_delay, ctrl_area_delay):
+        """
+        Select the delay profile to record and estimate for. Timings only carry over
+        between sessions that use the same delays.
+
+        Args:
+            click_delay: Click delay in seconds
+            line_delay: Line delay in seconds
+            ctrl_area_delay: Control area delay in seconds
+        """
+        self.profile = f"{click_delay:.3f}/{line_delay:.3f}/{ctrl_area_delay:.3f}"
+        one_click_time = click_delay + 0.001
+        one_line_time = (line_delay * 5) + 0.0035
+        self.defaults = {
+            "click": (one_click_time, 0.0),
+            "h_line": (one_line_time, 0.0),
+            "v_line": (one_line_time, 0.0),
+            "d_line": (one_line_time, 0.0),
+            "brush_line": (one_line_time, 0.0),
+            "control_change": ((2 * click_delay) + (2 * ctrl_area_delay), 0.0),
+            "canvas_save": (ctrl_area_delay + 0.1, 0.0),
+        }
+        self.fit()
+
+    def record(self, kind, duration, length=0):
+        """
+        Record the duration of one painting operation.
+
+        Args:
+            kind: One of OPERATION_KINDS
+            duration: Seconds the operation took
+            length: Line length in pixels (lines only)
+        """
+        kind_samples = self.samples.setdefault(self.profile, {}).setdefault(kind, [])
+        kind_samples.append([float(duration), int(length)])
+        if len(kind_samples) > MAX_SAMPLES:
+            del kind_samples[:len(kind_samples) - MAX_SAMPLES]
+
+    def sample_count(self, kind=None):
+        """Number of recorded samples for the current delay profile"""
+        profile_samples = self.samples.get(self.profile, {})
+        if kind is not None:
+            return len(profile_samples.get(kind, []))
+        return sum(len(s) for s in profile_samples.values())
+
+    def is_calibrated(self):
+        """True when clicks and at least one line type are fitted from recorded timings"""
+        return self.sample_count("click") >= MIN_SAMPLES and any(
+            self.sample_count(kind) >= MIN_SAMPLES for kind in LINE_KINDS
+        )
+
+    def fit(self):
+        """Fit intercept and slope per operation type, falling back to the default constants"""
+        profile_samples = self.samples.get(self.profile, {})
+        self.model = {}
+        for kind in OPERATION_KINDS:
+            data = profile_samples.get(kind, [])
+            if len(data) < MIN_SAMPLES:
+                self.model[kind] = self.defaults.get(kind, (0.0, 0.0))
+                continue
+            data = np.asarray(data, dtype=np.float64)
+            durations, lengths = data[:, 0], data[:, 1]
+
+            # Median is robust against operations that were interrupted by the game
+            if kind not in LENGTH_KINDS or np.ptp(lengths) == 0:
+                self.model[kind] = (float(np.median(durations)), 0.0)
+                continue
+            design = np.column_stack((np.ones_like(lengths), lengths))
+            (intercept, slope), *_ = np.linalg.lstsq(design, durations, rcond=None)
+            self.model[kind] = (max(float(intercept), 0.0), max(float(slope), 0.0))
+
+    def operation_time(self, kind, length=0):
+        """Estimated seconds for one operation"""
+        intercept, slope = self.model.get(kind, self.defaults.get(kind, (0.0, 0.0)))
+        return intercept + slope * length
+
+    def estimate(self, summary, canvas_saves=0):
+        """
+        Estimate the painting time of a plan.
+
+        Args:
+            summary: Operation counts as returned by summarize_plan
+            canvas_saves: Number of canvas saves (Ctrl+S) during the painting
+
+        Returns:
+            float: Estimated painting time in seconds
+        """
+        total = summary.get("click", 0) * self.operation_time("click")
+        total += (summary.get("control_change", 0) + summary.get("size_change", 0)) * self.operation_time("control_change")
+        total += canvas_saves * self.operation_time("canvas_save")
+        for kind in LENGTH_KINDS:
+            intercept, slope = self.model.get(kind, self.defaults.get(kind, (0.0, 0.0)))
+            total += summary.get(kind, 0) * intercept + summary.get(kind + "_length", 0) * slope
+        return total
+
+    def load(self):
+        """Load recorded timings from disk"""
+        if self.path is None:
+            self.samples = {}
+            return
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+            self.samples = data.get("samples", {})
+        except (OSError, ValueError):
+            self.samples = {}
+
+    def save(self):
+        """Save recorded timings to disk"""
+        if self.path is None:
+            return False
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, "w") as f:
+                json.dump({"version": 1, "saved": time.time(), "samples": self.samples}, f)
+            return True
+        except OSError:
+            return False
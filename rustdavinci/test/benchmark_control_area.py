@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+
+"""
+Offline benchmark of the painting control area detection.
+
+Synthetic screens are made by pasting the control area template at a random scale
+and position onto the images in ../screenshots. Saved screenshots of the game can
+be added with --screens. Run from the rustdavinci directory:
+
+    python test/benchmark_control_area.py --legacy --screens my_captures/*.png
+"""
+
+import argparse
+import glob
+import os
+import random
+import sys
+import time
+
+import cv2
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from lib.control_area_detection import ControlAreaDetector, DEFAULT_TEMPLATE_PATH
+
+
+def legacy_locate(screenshot, template_path=DEFAULT_TEMPLATE_PATH):
+    """The previous detector: up to 50 full screen matches with the template grown by 3.5%"""
+    screen_w, screen_h = screenshot.size
+    image_gray = cv2.cvtColor(np.array(screenshot), cv2.COLOR_BGR2GRAY)
+    tmpl = cv2.imread(template_path, 0)
+    tmpl_w, tmpl_h = tmpl.shape[::-1]
+
+    for loop in range(50):
+        if tmpl_w > screen_w or tmpl_h > screen_h:
+            return False
+        matches = cv2.matchTemplate(image_gray, tmpl, cv2.TM_CCOEFF_NORMED)
+        loc = np.where(matches >= 0.8)
+        if len(loc[0]):
+            return int(np.mean(loc[1])), int(np.mean(loc[0])), tmpl_w, tmpl_h
+        tmpl_w, tmpl_h = int(tmpl.shape[1] * 1.035), int(tmpl.shape[0] * 1.035)
+        tmpl = cv2.resize(tmpl, (int(tmpl_w), int(tmpl_h)))
+    return False
+
+
+def synthetic_screens(count, screen_size, scale_range, seed):
+    """Yield (screen, expected (x, y, w, h)) with the template pasted onto a background image"""
+    rng = random.Random(seed)
+    template = Image.open(DEFAULT_TEMPLATE_PATH).convert("RGB")
+    backgrounds = sorted(glob.glob(os.path.join("..", "screenshots", "*.jpg")))
+    for i in range(count):
+        if backgrounds:
+            screen = Image.open(backgrounds[i % len(backgrounds)]).convert("RGB").resize(screen_size)
+        else:
+            screen = Image.new("RGB", screen_size, (40, 40, 40))
+        scale = rng.uniform(*scale_range)
+        tmpl = template.resize((int(template.width * scale), int(template.height * scale)), Image.LANCZOS)
+        x = rng.randint(0, screen_size[0] - tmpl.width)
+        y = rng.randint(0, screen_size[1] - tmpl.height)
+        screen.paste(tmpl, (x, y))
+        yield screen, (x, y, tmpl.width, tmpl.height)
+
+
+def run(screens, legacy):
+    """Time the detectors on every screen and print one line per screen"""
+    detector = ControlAreaDetector()
+    totals = {"cold": [], "cached": [], "legacy": []}
+    for name, screen, expected in screens:
+        detector.last_scale = detector.last_position = None
+        start = time.perf_counter()
+        found = detector.detect(screen)
+        cold = time.perf_counter() - start
+
+        start = time.perf_counter()
+        detector.detect(screen)
+        cached = time.perf_counter() - start
+        totals["cold"].append(cold)
+        totals["cached"].append(cached)
+
+        line = f"{name:<28} found={found}  cold={cold * 1000:7.1f} ms  cached={cached * 1000:6.1f} ms"
+        if expected is not None:
+            error = max(abs(a - b) for a, b in zip(found, expected)) if found else None
+            line += f"  expected={expected} error={error}"
+        if legacy:
+            start = time.perf_counter()
+            legacy_found = legacy_locate(screen)
+            totals["legacy"].append(time.perf_counter() - start)
+            line += f"  legacy={totals['legacy'][-1] * 1000:7.1f} ms ({'found' if legacy_found else 'not found'})"
+        print(line)
+
+    for key, values in totals.items():
+        if values:
+            print(f"{key:>7}: mean {np.mean(values) * 1000:.1f} ms, max {np.max(values) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--screens", nargs="*", default=[], help="Saved screenshots of the game")
+    parser.add_argument("--synthetic", type=int, default=8, help="Number of synthetic screens")
+    parser.add_argument("--size", default="2560x1440", help="Size of the synthetic screens")
+    parser.add_argument("--scales", default="0.5,1.15", help="Template scale range of the synthetic screens")
+    parser.add_argument("--legacy", action="store_true", help="Also time the previous detector")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    screen_size = tuple(int(v) for v in args.size.split("x"))
+    scale_range = tuple(float(v) for v in args.scales.split(","))
+    screens = [(f"synthetic #{i}", screen, expected) for i, (screen, expected) in
+               enumerate(synthetic_screens(args.synthetic, screen_size, scale_range, args.seed))]
+    screens += [(os.path.basename(path), Image.open(path).convert("RGB"), None) for path in args.screens]
+    run(screens, args.legacy)
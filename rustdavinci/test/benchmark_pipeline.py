@@ -0,0 +1,365 @@
+#!/usr/bin/env python3
+
+"""
+Headless benchmark of the color solver, simulator and painting planner.
+
+Runs solve -> simulate -> plan -> statistics on synthetic images (gradient, photo,
+pixel art, noise) and on images given with --images, and records per stage time,
+peak traced memory, strokes and color error (CIE76 delta-E against the source).
+Every run is appended to a history file and compared with the previous run, or
+with the run named by --baseline, so regressions show up between versions.
+Run from the rustdavinci directory:
+
+    python test/benchmark_pipeline.py --sizes 128,256,512 --label my-change
+    python test/benchmark_pipeline.py --sizes 1024,2048 --kinds photo,pixel_art --baseline my-change
+"""
+
+import argparse
+import datetime
+import glob
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+from PIL import Image
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from lib import color_blending
+from lib.color_functions import rgb_to_lab, delta_e
+from lib.painting_plan import (count_color_keys, plan_painting_lines, plan_pixels, run_length_statistics, simulate_plan,
+                               smooth_layer_runs)
+from lib.rustPaletteData import rust_palette
+from lib.tiled_processing import TiledLayers, plan_tiled
+from lib.time_estimator import PaintTimeEstimator, control_switches, summarize_plan
+from ui.settings.default_settings import default_settings
+
+KINDS = ("gradient", "photo", "pixel_art", "noise")
+OPACITY_VALUES = [1.0, 0.75, 0.5, 0.25]
+PALETTE = rust_palette[:64]
+DEFAULT_HISTORY = os.path.join(ROOT, "test", "benchmark_history.json")
+
+SOLVERS = {
+    "numba": color_blending.create_layered_colors_map_numba,
+    "python": color_blending.create_layered_colors_map,
+}
+
+
+def make_image(kind, size, seed=1):
+    """Synthetic RGB test image of a kind in KINDS, size x size pixels"""
+    rng = np.random.default_rng(seed)
+    if kind == "gradient":
+        x = np.linspace(0, 1, size)[None, :]
+        y = np.linspace(0, 1, size)[:, None]
+        pixels = np.stack([255 * x * (1 - y), 255 * y + 0 * x, 255 * (1 - x) * (1 - y) + 64 * y], axis=2)
+        return Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8))
+    if kind == "photo":
+        photos = sorted(glob.glob(os.path.join(ROOT, "..", "screenshots", "*.jpg")))
+        if photos:
+            photo = Image.open(photos[seed % len(photos)]).convert("RGB")
+            side = min(photo.size)
+            left, top = (photo.width - side) // 2, (photo.height - side) // 2
+            return photo.crop((left, top, left + side, top + side)).resize((size, size), Image.LANCZOS)
+        # Smooth random field when the screenshots are not available
+        small = Image.fromarray(rng.integers(0, 256, (12, 12, 3), dtype=np.uint8))
+        return small.resize((size, size), Image.BICUBIC)
+    if kind == "pixel_art":
+        colors = np.array(PALETTE, dtype=np.uint8)[rng.choice(len(PALETTE), 8, replace=False)]
+        cells = rng.integers(0, len(colors), (16, 16))
+        return Image.fromarray(colors[cells]).resize((size, size), Image.NEAREST)
+    if kind == "noise":
+        return Image.fromarray(rng.integers(0, 256, (size, size, 3), dtype=np.uint8))
+    raise ValueError(f"Unknown image kind: {kind}")
+
+
+def measure(function, memory):
+    """
+    Run function once for the time and, if memory is set, once more under tracemalloc.
+
+    Returns:
+        tuple: (result of the timed run, {'seconds', 'peak_mb'})
+    """
+    start = time.perf_counter()
+    result = function()
+    stats = {"seconds": round(time.perf_counter() - start, 4)}
+    if memory:
+        tracemalloc.start()
+        function()
+        stats["peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 2)
+        tracemalloc.stop()
+    return result, stats
+
+
+def color_error(source, simulated):
+    """Mean and 95th percentile CIE76 delta-E between two RGB images of the same size"""
+    error = delta_e(
+        rgb_to_lab(np.asarray(source, dtype=np.float64).reshape(-1, 3)),
+        rgb_to_lab(np.asarray(simulated, dtype=np.float64).reshape(-1, 3)),
+    )
+    return float(error.mean()), float(np.percentile(error, 95))
+
+
+def index_image(image):
+    """(H, W) index of the distinct colors of an RGB image, as calculate_statistics does"""
+    pixels = np.asarray(image, dtype=np.uint32)
+    packed = (pixels[:, :, 0] << 16) | (pixels[:, :, 1] << 8) | pixels[:, :, 2]
+    _, inverse = np.unique(packed, return_inverse=True)
+    return inverse.reshape(packed.shape)
+
+
+def planned_layer_count(plan):
+    """Number of pixel layers the plan paints (line pixels, large brush strokes and points)"""
+    total = 0
+    for data in plan.values():
+        xs, ys = plan_pixels(data)
+        total += len(np.unique(ys * (xs.max(initial=0) + 1) + xs))  # Overlapping large brush strokes count once
+    return total
+
+
+def run_pipeline(image, solver="numba", background_color=(255, 255, 255), min_line_width=10,
+                 use_diagonal_lines=True, smoothing_delta_e=default_settings["stroke_smoothing_delta_e"],
+                 memory=True, opacity_values=OPACITY_VALUES, brush_size=0, tile_size=None):
+    """
+    Run the headless pipeline on one image, in the order the painting uses:
+    solve, stroke smoothing, simulate, plan. With tile_size the solved layers are
+    planned tile by tile, see tiled_processing.plan_tiled.
+
+    Returns:
+        tuple: (metrics dict, {'layered', 'simulated', 'plan'})
+    """
+    image = image.convert("RGB")
+    width, height = image.size
+    stages = {}
+
+    layered, stages["solve"] = measure(lambda: SOLVERS[solver](
+        image, background_color, PALETTE, opacity_values, max_layers=2,
+        solution_cache=color_blending.create_solution_cache()
+    ), memory)
+    if smoothing_delta_e > 0:
+        (layered, _), stages["smoothing"] = measure(lambda: smooth_layer_runs(
+            layered, width, height, background_color, PALETTE, opacity_values,
+            max_delta_e=smoothing_delta_e, min_line_width=min_line_width
+        ), memory)
+    simulated, stages["simulate"] = measure(lambda: color_blending.simulate_layered_image(
+        image, background_color, PALETTE, opacity_values, layered
+    ), memory)
+    _, stages["simulate_numba"] = measure(lambda: color_blending.simulate_layered_image_numba(
+        image, background_color, PALETTE, opacity_values, layered
+    ), memory)
+    estimator = PaintTimeEstimator(path=None)
+    estimator.set_delays(0.02, 0.03, 0.18)  # Default click, line and control area delays
+    color_counts = count_color_keys(layered)
+    if tile_size:
+        tiled = TiledLayers(width, height, len(opacity_values))
+        tiled.write(0, 0, width, height, layered)
+        plan, stages["plan"] = measure(lambda: plan_tiled(
+            tiled, color_counts, min_line_width, use_diagonal_lines, tile_size,
+            brush_size=brush_size, opacity_values=opacity_values, estimator=estimator
+        ), memory)
+        tiled.close()
+    else:
+        plan, stages["plan"] = measure(lambda: plan_painting_lines(
+            layered, width, height, color_counts, min_line_width, use_diagonal_lines,
+            brush_size=brush_size, opacity_values=opacity_values, estimator=estimator
+        ), memory)
+    _, stages["statistics"] = measure(lambda: run_length_statistics(index_image(simulated), min_line_width), memory)
+
+    summary = summarize_plan(plan)
+    mean_error, p95_error = color_error(image, simulated)
+    # What the plan actually paints, in painting order
+    painted_mean_error, painted_p95_error = color_error(image, simulate_plan(
+        plan, width, height, background_color, PALETTE, opacity_values
+    ))
+
+    metrics = {
+        "stages": stages,
+        "painted_pixels": len(layered),
+        # Layers of the solved map that no line or point of the plan paints
+        "unplanned_layers": sum(color_counts.values()) - planned_layer_count(plan),
+        "strokes": {kind: summary[kind] for kind in ("h_line", "v_line", "d_line", "brush_line", "click", "control_change")},
+        "control_switches": control_switches(plan),
+        "strokes_total": sum(summary[kind] for kind in ("h_line", "v_line", "d_line", "brush_line", "click")),
+        "delta_e_mean": round(mean_error, 3),
+        "delta_e_p95": round(p95_error, 3),
+        "painted_delta_e_mean": round(painted_mean_error, 3),
+        "painted_delta_e_p95": round(painted_p95_error, 3),
+        "estimated_paint_seconds": round(estimator.estimate(summary), 1),
+    }
+    return metrics, {"layered": layered, "simulated": simulated, "plan": plan}
+
+
+def benchmark_layer_search(image, samples, seed=1):
+    """Milliseconds per color of find_optimal_layers and find_optimal_layers_numba (no cache)"""
+    pixels = np.asarray(image.convert("RGB")).reshape(-1, 3)
+    rng = random.Random(seed)
+    colors = [tuple(int(c) for c in pixels[rng.randrange(len(pixels))]) for _ in range(samples)]
+    palette_array = np.array(PALETTE, dtype=np.int32)
+    opacity_array = np.array(OPACITY_VALUES, dtype=np.float32)
+
+    result = {}
+    for name, function, palette, opacities in (
+        ("find_optimal_layers", color_blending.find_optimal_layers, PALETTE, OPACITY_VALUES),
+        ("find_optimal_layers_numba", color_blending.find_optimal_layers_numba, palette_array, opacity_array),
+    ):
+        start = time.perf_counter()
+        for color in colors:
+            function(color, (255, 255, 255), palette, opacities, 2, None)
+        result[name] = round((time.perf_counter() - start) / samples * 1000, 4)
+    return result
+
+
+def git_revision():
+    """Short hash of the checked out commit, None outside a git checkout"""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_history(path):
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"runs": []}
+
+
+def find_baseline(history, baseline):
+    """The run labelled (or with the revision) baseline, or the latest run if baseline is None"""
+    runs = history["runs"]
+    if baseline is None:
+        return runs[-1] if runs else None
+    for run in reversed(runs):
+        if baseline in (run.get("label"), run.get("revision")):
+            return run
+    return None
+
+
+def compare(results, baseline, time_tolerance, quality_tolerance):
+    """
+    Compare results with a baseline run.
+
+    Returns:
+        list: Regression descriptions, empty if nothing got worse beyond the tolerances
+    """
+    regressions = []
+    for case, metrics in results.items():
+        old = baseline["results"].get(case)
+        if old is None:
+            continue
+        for stage, stats in metrics.get("stages", {}).items():
+            old_stats = old.get("stages", {}).get(stage)
+            if not old_stats:
+                continue
+            # Small absolute differences are noise, whatever the ratio
+            if (stats["seconds"] > old_stats["seconds"] * (1 + time_tolerance)
+                    and stats["seconds"] - old_stats["seconds"] > 0.05):
+                regressions.append(f"{case} {stage}: {old_stats['seconds']:.3f} s -> {stats['seconds']:.3f} s")
+            if "peak_mb" in stats and "peak_mb" in old_stats and \
+                    stats["peak_mb"] > old_stats["peak_mb"] * (1 + time_tolerance) + 1:
+                regressions.append(f"{case} {stage}: peak {old_stats['peak_mb']:.1f} MB -> {stats['peak_mb']:.1f} MB")
+        for key in ("strokes_total", "estimated_paint_seconds"):
+            if key in old and metrics[key] > old[key] * (1 + quality_tolerance):
+                regressions.append(f"{case} {key}: {old[key]} -> {metrics[key]}")
+        for key in ("delta_e_mean", "delta_e_p95", "painted_delta_e_mean", "painted_delta_e_p95"):
+            if key in old and metrics[key] > old[key] + 0.5:
+                regressions.append(f"{case} {key}: {old[key]:.2f} -> {metrics[key]:.2f}")
+    return regressions
+
+
+def print_case(case, metrics):
+    stages = "  ".join(
+        f"{stage} {stats['seconds']:.3f}s" + (f"/{stats['peak_mb']:.0f}MB" if "peak_mb" in stats else "")
+        for stage, stats in metrics["stages"].items()
+    )
+    strokes = metrics["strokes"]
+    print(f"{case:<22} {stages}")
+    print(f"{'':<22} strokes {metrics['strokes_total']:,} (h {strokes['h_line']:,} v {strokes['v_line']:,} "
+          f"d {strokes['d_line']:,} brush {strokes['brush_line']:,} points {strokes['click']:,})  delta-E mean {metrics['delta_e_mean']:.2f} "
+          f"p95 {metrics['delta_e_p95']:.2f} (painted {metrics['painted_delta_e_mean']:.2f}/"
+          f"{metrics['painted_delta_e_p95']:.2f})  est. paint {metrics['estimated_paint_seconds'] / 60:.1f} min")
+    if "layer_search_ms" in metrics:
+        print(f"{'':<22} " + "  ".join(f"{name} {ms:.3f} ms/color" for name, ms in metrics["layer_search_ms"].items()))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--kinds", default=",".join(KINDS), help="Synthetic image kinds")
+    parser.add_argument("--sizes", default="128,256,512", help="Synthetic image sizes (up to 2048)")
+    parser.add_argument("--images", nargs="*", default=[], help="Extra images, benchmarked at their own size")
+    parser.add_argument("--solver", choices=sorted(SOLVERS), default="numba")
+    parser.add_argument("--min-line-width", type=int, default=10)
+    parser.add_argument("--no-diagonal", action="store_true", help="Skip diagonal line detection")
+    parser.add_argument("--brush-size", type=int, default=0, help="Brush size of the large area strokes (0 = off)")
+    parser.add_argument("--smoothing", type=float, default=default_settings["stroke_smoothing_delta_e"],
+                        help="Stroke smoothing delta-E (0 = off)")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the tracemalloc runs (halves the run time)")
+    parser.add_argument("--layer-samples", type=int, default=200,
+                        help="Colors timed with find_optimal_layers/_numba (0 = skip)")
+    parser.add_argument("--history", default=DEFAULT_HISTORY, help="JSON file the runs are stored in")
+    parser.add_argument("--label", help="Name of this run, usable as --baseline later")
+    parser.add_argument("--baseline", help="Label or revision to compare with (default: the previous run)")
+    parser.add_argument("--time-tolerance", type=float, default=0.25, help="Allowed relative slowdown")
+    parser.add_argument("--quality-tolerance", type=float, default=0.02, help="Allowed relative stroke/paint time increase")
+    parser.add_argument("--no-save", action="store_true", help="Do not append this run to the history")
+    parser.add_argument("--fail-on-regression", action="store_true", help="Exit with status 1 on a regression")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    warm_up = color_blending.warm_up_kernels()
+    print(f"Kernel warm-up: {warm_up:.2f} s (not included below)")
+
+    cases = []
+    for size in (int(v) for v in args.sizes.split(",")):
+        for kind in args.kinds.split(","):
+            cases.append((f"{kind}/{size}", make_image(kind, size, args.seed)))
+    for path in args.images:
+        cases.append((os.path.basename(path), Image.open(path).convert("RGB")))
+
+    results = {}
+    for case, image in cases:
+        metrics, _ = run_pipeline(
+            image, args.solver, min_line_width=args.min_line_width,
+            use_diagonal_lines=not args.no_diagonal, smoothing_delta_e=args.smoothing, memory=not args.no_memory,
+            brush_size=args.brush_size
+        )
+        if args.layer_samples:
+            metrics["layer_search_ms"] = benchmark_layer_search(image, args.layer_samples, args.seed)
+        results[case] = metrics
+        print_case(case, metrics)
+
+    history = load_history(args.history)
+    baseline = find_baseline(history, args.baseline)
+    regressions = []
+    if baseline is not None:
+        regressions = compare(results, baseline, args.time_tolerance, args.quality_tolerance)
+        name = baseline.get("label") or baseline.get("revision") or baseline.get("date")
+        print(f"\nCompared with {name}: " + ("no regressions" if not regressions else f"{len(regressions)} regressions"))
+        for regression in regressions:
+            print("  " + regression)
+
+    if not args.no_save:
+        history["runs"].append({
+            "date": datetime.datetime.now().isoformat(timespec="seconds"),
+            "revision": git_revision(),
+            "label": args.label,
+            "machine": {"python": platform.python_version(), "platform": platform.platform(),
+                        "cpus": os.cpu_count()},
+            "solver": args.solver,
+            "kernel_warm_up_seconds": round(warm_up, 2),
+            "results": results,
+        })
+        with open(args.history, "w") as f:
+            json.dump(history, f, indent=1)
+        print(f"Saved to {args.history}")
+
+    sys.exit(1 if regressions and args.fail_on_regression else 0)
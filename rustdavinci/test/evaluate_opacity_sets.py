@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+
+"""
+Compare opacity sets (the "opacity_values" setting) on a corpus.
+
+Runs the headless pipeline (see benchmark_pipeline.py) with every candidate set on
+the golden corpus (see golden_plans.py) and reports the painted color error, the
+strokes and the control changes of the plan. Every opacity change means clicking
+and typing into the opacity box, so a set with fewer levels can be faster to paint
+even if it needs a few more strokes. Sets that no other set beats on quality,
+strokes and opacity changes together are marked with *. Run from the rustdavinci
+directory:
+
+    python test/evaluate_opacity_sets.py
+    python test/evaluate_opacity_sets.py --sets "1,0.75,0.5,0.25;1,0.5" --only photo_128_a,photo_192
+"""
+
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from benchmark_pipeline import OPACITY_VALUES, make_image, run_pipeline
+from golden_plans import CORPUS
+from lib import color_blending
+from lib.rustPaletteData import opacity_ui_value
+
+DEFAULT_SETS = [
+    OPACITY_VALUES,
+    [1.0, 0.5],
+    [1.0, 0.5, 0.25],
+    [1.0, 0.75, 0.5],
+    [1.0, 0.67, 0.33],
+    [1.0, 0.6, 0.3, 0.15],
+    [1.0, 0.8, 0.6, 0.4, 0.2],
+]
+
+# Summed over the corpus, lower is better for every metric
+TOTALS = ("strokes_total", "color_switches", "opacity_switches", "estimated_paint_seconds")
+
+
+def parse_sets(text):
+    """ "1,0.5;1,0.75,0.5" -> [[1.0, 0.5], [1.0, 0.75, 0.5]] """
+    return [[float(value) for value in group.split(",")] for group in text.split(";") if group.strip()]
+
+
+def evaluate(opacity_values, corpus):
+    """
+    Run the pipeline with one opacity set on every corpus image.
+
+    Returns:
+        dict: Mean painted delta-E (mean and 95th percentile) over the corpus and the totals of TOTALS
+    """
+    result = {"painted_delta_e_mean": 0.0, "painted_delta_e_p95": 0.0}
+    result.update({key: 0 for key in TOTALS})
+    for _, kind, size, seed in corpus:
+        metrics, _ = run_pipeline(make_image(kind, size, seed), memory=False, opacity_values=opacity_values)
+        result["painted_delta_e_mean"] += metrics["painted_delta_e_mean"] / len(corpus)
+        result["painted_delta_e_p95"] += metrics["painted_delta_e_p95"] / len(corpus)
+        result["strokes_total"] += metrics["strokes_total"]
+        result["color_switches"] += metrics["control_switches"]["color"]
+        result["opacity_switches"] += metrics["control_switches"]["opacity"]
+        result["estimated_paint_seconds"] += metrics["estimated_paint_seconds"]
+    return result
+
+
+def dominated(result, others):
+    """True if another result is at least as good on quality, strokes and opacity changes and better on one"""
+    keys = ("painted_delta_e_mean", "strokes_total", "opacity_switches")
+    for other in others:
+        if other is result:
+            continue
+        if all(other[key] <= result[key] for key in keys) and any(other[key] < result[key] for key in keys):
+            return True
+    return False
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sets", help="Opacity sets to compare, e.g. \"1,0.75,0.5,0.25;1,0.5\"")
+    parser.add_argument("--only", help="Comma separated corpus names to run")
+    parser.add_argument("--json", help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    sets = parse_sets(args.sets) if args.sets else DEFAULT_SETS
+    only = set(args.only.split(",")) if args.only else None
+    corpus = [entry for entry in CORPUS if not only or entry[0] in only]
+
+    color_blending.warm_up_kernels()
+    results = []
+    for opacity_values in sets:
+        result = evaluate(opacity_values, corpus)
+        result["opacity_values"] = opacity_values
+        result["opacity_ui_values"] = [opacity_ui_value(opacity) for opacity in opacity_values]
+        results.append(result)
+        print(f"{','.join(f'{v:g}' for v in opacity_values):<24} done")
+
+    print(f"\n{len(corpus)} corpus images, painted delta-E is the corpus mean, the rest are totals\n")
+    print(f"  {'opacity set':<24} {'dE mean':>8} {'dE p95':>8} {'strokes':>9} {'colors':>7} {'opacity':>8} {'est. min':>9}")
+    for result in results:
+        mark = " " if dominated(result, results) else "*"
+        name = ",".join(f"{v:g}" for v in result["opacity_values"])
+        print(f"{mark} {name:<24} {result['painted_delta_e_mean']:>8.2f} {result['painted_delta_e_p95']:>8.2f} "
+              f"{result['strokes_total']:>9,} {result['color_switches']:>7,} {result['opacity_switches']:>8,} "
+              f"{result['estimated_paint_seconds'] / 60:>9.1f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=1)
+        print(f"\nSaved the results to {args.json}")
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+
+"""
+Quality/speed regression check against stored golden plans.
+
+Runs the headless pipeline (see benchmark_pipeline.py) on a fixed corpus and compares
+the color error against the source (mean and 95th percentile delta-E, of the solved
+layers and of what the plan actually paints), the stroke counts by type (large brush
+strokes included) and the estimated painting time with the values stored in
+test/golden_plans.json. A result that is worse than a golden by more than its
+tolerance fails the check, a result that is better is reported so the goldens can be
+updated on purpose. Run from the rustdavinci directory:
+
+    python test/golden_plans.py            # check, exit status 1 on a failure
+    python test/golden_plans.py --update   # accept the current results as the new goldens
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from benchmark_pipeline import ROOT, make_image, run_pipeline
+
+DEFAULT_GOLDENS = os.path.join(ROOT, "test", "golden_plans.json")
+
+# (name, image kind, size, seed), kept small so the check runs in seconds
+CORPUS = [
+    ("gradient_96", "gradient", 96, 1),
+    ("gradient_192", "gradient", 192, 1),
+    ("photo_128_a", "photo", 128, 1),
+    ("photo_128_b", "photo", 128, 4),
+    ("photo_192", "photo", 192, 6),
+    ("pixel_art_160", "pixel_art", 160, 2),
+    ("pixel_art_320", "pixel_art", 320, 3),
+    ("noise_64", "noise", 64, 1),
+]
+
+# (name, image kind, size, seed, run_pipeline options) for plan options that are off by default,
+# not part of CORPUS so tools comparing solver settings on CORPUS do not run them
+OPTION_CORPUS = [
+    ("pixel_art_320_brush", "pixel_art", 320, 3, {"brush_size": 2}),
+    ("pixel_art_320_brush_tiled", "pixel_art", 320, 3, {"brush_size": 2, "tile_size": 128}),
+]
+
+# metric: (tolerance, relative) - worse means higher for every metric
+TOLERANCES = {
+    "delta_e_mean": (0.25, False),
+    "delta_e_p95": (0.5, False),
+    "painted_delta_e_mean": (0.25, False),
+    "painted_delta_e_p95": (0.5, False),
+    "strokes_total": (0.02, True),
+    "h_line": (0.03, True),
+    "v_line": (0.03, True),
+    "d_line": (0.03, True),
+    "click": (0.03, True),
+    "brush_line": (0.03, True),
+    "estimated_paint_seconds": (0.02, True),
+    "unplanned_layers": (0.02, True),
+}
+
+# Counts this small are compared with an absolute slack instead of only the relative tolerance
+MIN_COUNT_SLACK = 5
+
+
+def plan_checksum(plan):
+    """Short hash of the exact plan, changes whenever any line or point changes"""
+    digest = hashlib.sha256()
+    for color_key in sorted(plan):
+        data = plan[color_key]
+        digest.update(repr((color_key, sorted(data['h_lines']), sorted(data['v_lines']),
+                            sorted(data['d_lines']), sorted(data['points']))).encode())
+        if data.get('brush_lines'):
+            digest.update(repr((data['brush_size'], sorted(data['brush_lines']))).encode())
+    return digest.hexdigest()[:16]
+
+
+def collect(name, kind, size, seed, options=None):
+    """Golden values of one corpus entry"""
+    metrics, products = run_pipeline(make_image(kind, size, seed), memory=False, **(options or {}))
+    values = {
+        "delta_e_mean": metrics["delta_e_mean"],
+        "delta_e_p95": metrics["delta_e_p95"],
+        "painted_delta_e_mean": metrics["painted_delta_e_mean"],
+        "painted_delta_e_p95": metrics["painted_delta_e_p95"],
+        "strokes_total": metrics["strokes_total"],
+        "estimated_paint_seconds": metrics["estimated_paint_seconds"],
+        "unplanned_layers": metrics["unplanned_layers"],
+        "painted_pixels": metrics["painted_pixels"],
+        "checksum": plan_checksum(products["plan"]),
+        "solve_seconds": metrics["stages"]["solve"]["seconds"],
+        "plan_seconds": metrics["stages"]["plan"]["seconds"],
+    }
+    for stroke_kind in ("h_line", "v_line", "d_line", "brush_line", "click"):
+        values[stroke_kind] = metrics["strokes"][stroke_kind]
+    return values
+
+
+def check(current, golden):
+    """
+    Compare one corpus entry with its golden.
+
+    Returns:
+        tuple: (failures, improvements) as lists of descriptions
+    """
+    failures, improvements = [], []
+    for metric, (tolerance, relative) in TOLERANCES.items():
+        if metric not in golden:
+            continue
+        old, new = golden[metric], current[metric]
+        allowed = max(abs(old) * tolerance, MIN_COUNT_SLACK) if relative else tolerance
+        if new > old + allowed:
+            failures.append(f"{metric}: {old} -> {new} (tolerance {allowed:g})")
+        elif new < old - allowed:
+            improvements.append(f"{metric}: {old} -> {new}")
+    return failures, improvements
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--goldens", default=DEFAULT_GOLDENS, help="JSON file of the golden values")
+    parser.add_argument("--update", action="store_true", help="Store the current results as the goldens")
+    parser.add_argument("--only", help="Comma separated corpus names to run")
+    args = parser.parse_args()
+
+    try:
+        with open(args.goldens, "r") as f:
+            goldens = json.load(f)
+    except (OSError, ValueError):
+        goldens = {}
+
+    only = set(args.only.split(",")) if args.only else None
+    results = {}
+    failed = 0
+    for name, kind, size, seed, options in [entry + ({},) for entry in CORPUS] + OPTION_CORPUS:
+        if only and name not in only:
+            continue
+        current = results[name] = collect(name, kind, size, seed, options)
+        golden = goldens.get(name)
+        if args.update:
+            print(f"{name:<26} stored")
+            continue
+        if golden is None:
+            print(f"{name:<26} NO GOLDEN (run with --update)")
+            continue
+
+        failures, improvements = check(current, golden)
+        changed = "" if current["checksum"] == golden.get("checksum") else "  (plan changed)"
+        timing = f"solve {current['solve_seconds']:.2f}s (was {golden['solve_seconds']:.2f}s), " \
+                 f"plan {current['plan_seconds']:.2f}s (was {golden['plan_seconds']:.2f}s)"
+        print(f"{name:<26} {'FAIL' if failures else 'ok':<5} {timing}{changed}")
+        for failure in failures:
+            print(f"    worse: {failure}")
+        for improvement in improvements:
+            print(f"    better: {improvement}")
+        failed += bool(failures)
+
+    if args.update:
+        goldens.update(results)
+        with open(args.goldens, "w") as f:
+            json.dump(goldens, f, indent=1, sort_keys=True)
+        print(f"Saved {len(results)} goldens to {args.goldens}")
+        sys.exit(0)
+
+    print(f"\n{len(results) - failed} of {len(results)} corpus images within tolerance")
+    sys.exit(1 if failed else 0)
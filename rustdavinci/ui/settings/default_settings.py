@@ -29,6 +29,28 @@ default_settings = {
     "minimum_line_width": 10,
     "brush_type": 1,
     "use_diagonal_lines": 1,      # Enable diagonal line detection (greatly improves efficiency)
+    "brush_region_size": 0,       # Brush size of the strokes that fill large single color areas first (0 = off)
+    # Importance mask (high contrast pixels get an exact color solution)
+    "importance_threshold": 30,   # Color distance to a neighbor that marks a pixel as important
+    "importance_dilation": 0,     # Number of pixels the importance mask is grown by
+    # Opacity levels the solver blends with and the painting sets (0-1), fewer levels mean fewer opacity changes
+    "opacity_values": [1.0, 0.75, 0.5, 0.25],
+    "use_blend_calibration": 1,   # Solve with the measured in-game blend opacities (once the blending is calibrated)
+    # Dithering of the layered colors ("none", "floyd-steinberg", "atkinson" or "bayer")
+    "dither_mode": "none",
+    "dither_isolation_penalty": 0.0,  # Color distance penalty for isolated pixels (higher = longer lines)
+    "stroke_smoothing_delta_e": 2.3,  # Max color difference (CIE76) a pixel may change by to extend a line (0 = off)
+    "numba_warm_up": 1,           # Compile the color solver kernels in the background at startup
+    "max_source_size": 2048,      # Larger source images are decoded down to about this size (or the canvas size)
+    "memory_report": 0,           # Log the memory held by the image buffers after loading/converting
+    # Tiled processing (larger images are solved and planned tile by tile, layers kept in a memory-mapped file)
+    "tiled_processing_pixels": 500000,  # Pixel count above which the tiled engine is used
+    "tile_size": 512,             # Width and height of a tile in pixels
+    "mosaic_gap": 0,              # Image pixels hidden behind the frame between two signs of a mosaic
+    # Profiling (per stage timing report, JSON and Chrome trace in ~/.rustdavinci/profiles)
+    "enable_profiling": 0,
+    "profiling_hook": "none",     # Profiler run around profiling_stage ("none", "cprofile" or "sampling")
+    "profiling_stage": "solve",   # Stage the profiler runs around (e.g. "load", "solve", "plan")
     # New cache settings
     "use_cached_data": 1,         # Whether to use cached color calculations if available
     "auto_save_cache": 1,         # Whether to automatically save color calculations to cache
@@ -8,7 +8,6 @@ from PyQt6.QtWidgets import QDialog, QColorDialog, QListWidgetItem
 from ui.settings.default_settings import default_settings
 from ui.settings.settingsui import Ui_SettingsUI
 from lib.color_functions import hex_to_rgb, rgb_to_hex, closest_color
-from lib.captureArea import show_area
 from ui.dialogs.colors.colors import Colors
 from ui.dialogs.click_color.click_color import Click_Color
 from ui.theme.theme import apply_theme
@@ -363,6 +362,7 @@ class Settings(QDialog):
         y = int(self.settings.value("ctrl_y", default_settings["ctrl_y"]))
         w = int(self.settings.value("ctrl_w", default_settings["ctrl_w"]))
         h = int(self.settings.value("ctrl_h", default_settings["ctrl_h"]))
+        from lib.captureArea import show_area
         show_area(x, y, w, h)
 
 
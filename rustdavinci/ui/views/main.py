@@ -2,6 +2,7 @@
 # -*- coding: utf-8 -*-
 
 from PyQt6.QtCore import QRect, QSettings, QSize, Qt
+from PyQt6.QtGui import QAction
 from PyQt6.QtWidgets import QMenu, QLabel, QFrame, QMainWindow, QPushButton
 
 from ui.settings.settings import Settings
@@ -24,8 +25,9 @@ class MainWindow(QMainWindow):
         # Setup rustDaVinci object
         self.rustDaVinci = rustDaVinci(self)
 
-        # Clear Image action
+        # Clear Image and Export plan actions
         self.action_clearImage = None
+        self.action_exportPlan = None
 
         # Connect UI modules
         self.connectAll()
@@ -45,6 +47,9 @@ class MainWindow(QMainWindow):
         loadMenu = QMenu()
         loadMenu.addAction("From File...", self.load_image_file_clicked)
         loadMenu.addAction("From URL...", self.load_image_URL_clicked)
+        loadMenu.addAction("Painting plan...", self.import_plan_clicked)
+        self.action_exportPlan = loadMenu.addAction("Export painting plan...", self.export_plan_clicked)
+        self.action_exportPlan.setEnabled(False)
         self.action_clearImage = loadMenu.addAction(
             "Clear image", self.clear_image_clicked
         )
@@ -56,9 +61,17 @@ class MainWindow(QMainWindow):
         identifyMenu.addAction("Manually", self.locate_ctrl_manually_clicked)
         identifyMenu.addAction("Automatically", self.locate_ctrl_automatically_clicked)
         identifyMenu.addSeparator()
+        identifyMenu.addAction("Calibrate blending...", self.calibrate_blending_clicked)
+        identifyMenu.addAction("Calibrate blending from capture...", self.calibrate_capture_clicked)
         self.ui.identify_ctrl_PushButton.setMenu(identifyMenu)
 
+        # A click paints the image, the other painting jobs are in the right click menu
         self.ui.paint_image_PushButton.clicked.connect(self.paint_image_clicked)
+        self.ui.paint_image_PushButton.setContextMenuPolicy(Qt.ContextMenuPolicy.ActionsContextMenu)
+        action_paintMosaic = QAction("Paint mosaic (grid of signs)...", self.ui.paint_image_PushButton)
+        action_paintMosaic.triggered.connect(self.paint_mosaic_clicked)
+        self.ui.paint_image_PushButton.addAction(action_paintMosaic)
+        self.ui.paint_image_PushButton.setToolTip("Paint the Image (right click to paint a mosaic)")
         self.ui.settings_PushButton.clicked.connect(self.settings_clicked)
 
         self.ui.preview_PushButton.clicked.connect(self.preview_clicked)
@@ -69,6 +82,7 @@ class MainWindow(QMainWindow):
         if self.rustDaVinci.org_img is not None:
             self.action_clearImage.setEnabled(True)
             self.ui.preview_PushButton.setEnabled(True)
+        self.update_export_action()
         if self.is_expanded:
             self.label.hide()
             self.expand_window()
@@ -83,6 +97,22 @@ class MainWindow(QMainWindow):
         if self.rustDaVinci.org_img is not None:
             self.action_clearImage.setEnabled(True)
             self.ui.preview_PushButton.setEnabled(True)
+        self.update_export_action()
+        if self.is_expanded:
+            self.label.hide()
+            self.expand_window()
+        # Ensure window height is maintained
+        if self.height() < self.normal_height:
+            self.setMinimumHeight(self.normal_height)
+            self.resize(self.width(), self.normal_height)
+
+    def import_plan_clicked(self):
+        """Load a painting plan exported from another solve"""
+        self.rustDaVinci.import_painting_plan()
+        if self.rustDaVinci.org_img is not None:
+            self.action_clearImage.setEnabled(True)
+            self.ui.preview_PushButton.setEnabled(True)
+        self.update_export_action()
         if self.is_expanded:
             self.label.hide()
             self.expand_window()
@@ -95,6 +125,7 @@ class MainWindow(QMainWindow):
         """Clear the current image"""
         self.rustDaVinci.clear_image()
         self.action_clearImage.setEnabled(False)
+        self.action_exportPlan.setEnabled(False)
         self.ui.preview_PushButton.setEnabled(False)
         self.ui.paint_image_PushButton.setEnabled(False)
         self.is_expanded = True
@@ -108,9 +139,31 @@ class MainWindow(QMainWindow):
         """Locate the control area coordinates automatically"""
         self.rustDaVinci.locate_control_area_automatically()
 
+    def calibrate_blending_clicked(self):
+        """Paint and measure test swatches to calibrate the blend opacities"""
+        self.rustDaVinci.calibrate_blending()
+
+    def calibrate_capture_clicked(self):
+        """Calibrate the blend opacities from a saved swatch capture"""
+        self.rustDaVinci.calibrate_blending_from_capture()
+
     def paint_image_clicked(self):
         """Start the painting process"""
         self.rustDaVinci.start_painting()
+        self.update_export_action()
+
+    def paint_mosaic_clicked(self):
+        """Paint the image over a grid of signs"""
+        self.rustDaVinci.start_mosaic_painting()
+        self.update_export_action()
+
+    def update_export_action(self):
+        """Enable exporting the painting plan while there is a converted image"""
+        self.action_exportPlan.setEnabled(self.rustDaVinci.color_calculation_cache['layered_colors_map'] is not None)
+
+    def export_plan_clicked(self):
+        """Export the solved image as a painting plan"""
+        self.rustDaVinci.export_painting_plan()
 
     def settings_clicked(self):
         """Create an instance of a settings window"""